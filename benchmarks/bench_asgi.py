@@ -0,0 +1,175 @@
+"""Concurrent submissions judged inside the request: WSGI (gunicorn) versus ASGI (uvicorn).
+
+    python -m benchmarks.bench_asgi
+    python -m benchmarks.bench_asgi --concurrency 4 16 64 256 --latency 0.5 --workers 2
+
+Starts a fake Piston API (see ``fake_piston.py``) with ``--latency`` seconds
+per call, then serves the project twice on the same throwaway SQLite
+database (unless ``DATABASE_URL`` is set): with gunicorn sync workers and
+the sync ``question_detail``, and with uvicorn and the async view
+(``ASYNC_VIEWS``). ``JUDGE_ASYNC`` is off, so every POST judges its
+submission's ``--cases`` test cases before it answers. Admission limits and
+the per-process cap on judge calls (``JUDGE_MAX_CONCURRENCY``) are lifted so
+nothing is turned away and only the deployment limits concurrency.
+
+At each ``--concurrency`` level that many logged-in users submit in a loop
+for ``--seconds``. Reported: submissions answered per second, p50 and p99
+latency, failed requests and the server's CPU time per submission (from
+/proc, so Linux only). A sync worker holds its thread for the whole
+judge round trip, so WSGI capacity is about workers x threads / latency;
+under ASGI the judge calls are awaited and capacity is bound by CPU.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import free_port, http_request, percentile, wait_for
+
+
+def _cpu_seconds(pid):
+    """CPU time of process ``pid`` and its children, the server's workers (from /proc, so Linux only)."""
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # exited meanwhile
+        if int(entry) == pid or int(fields[1]) == pid:
+            total += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return total
+
+
+async def _user(port, path, cookie, tag, deadline, latencies, errors):
+    connection = [None]
+    csrf = cookie.split("csrftoken=")[1]
+    submission = 0
+    while time.monotonic() < deadline:
+        # A new solution each time so the result cache never answers for the judge
+        submission += 1
+        body = f"language=python&code=x+%3D+%22{tag}.{submission}%22%0Aprint(input())".encode()
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\nX-CSRFToken: {csrf}\r\n"
+            f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode()
+        begin = time.perf_counter()
+        try:
+            status = await http_request(port, connection, head + body)
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append(None)
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - begin)
+        else:
+            errors.append(status)
+    if connection[0]:
+        connection[0][1].close()
+
+
+async def _load(port, path, cookies, seconds):
+    latencies, errors = [], []
+    deadline = time.monotonic() + seconds
+    begin = time.perf_counter()
+    await asyncio.gather(*(
+        _user(port, path, cookie, f"{len(cookies)}.{number}", deadline, latencies, errors)
+        for number, cookie in enumerate(cookies)
+    ))
+    return latencies, errors, time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64, 128])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each load level.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the fake judge takes per call.")
+    parser.add_argument("--cases", type=int, default=5, help="Test cases per submission.")
+    parser.add_argument("--workers", type=int, default=2, help="Server processes, for both deployments.")
+    parser.add_argument("--threads", type=int, default=1, help="Threads per gunicorn worker (gthread above 1).")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-asgi-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from django.urls import reverse
+    from codingapp.models import Module, Question, TestCase
+
+    call_command("migrate", verbosity=0)
+    module = Module.objects.create(title="Benchmark")
+    question = Question.objects.create(title="Echo", description="", module=module)
+    TestCase.objects.bulk_create(
+        TestCase.from_dict(question, position, {"input": str(position), "expected_output": str(position)})
+        for position in range(args.cases)
+    )
+    cookies = []
+    for i in range(max(args.concurrency)):
+        client = Client()
+        client.force_login(User.objects.create_user(username=f"user{i}"))
+        # The CSRF middleware accepts a cookie secret sent back as the header token
+        cookies.append(f"sessionid={client.cookies['sessionid'].value}; csrftoken={f'{i:032d}'}")
+    path = reverse("question_detail", args=[question.pk])
+
+    judge_port = free_port()
+    judge = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_piston", "--port", str(judge_port), "--latency", str(args.latency)],
+        stdout=subprocess.DEVNULL,
+    )
+    env = {
+        **os.environ, "DEBUG": "False", "SECURE_SSL_REDIRECT": "False", "JUDGE_ASYNC": "False",
+        "JUDGE_EXECUTOR": "piston", "JUDGE_FALLBACK_EXECUTOR": "", "JUDGE_PARALLEL": "True",
+        "PISTON_API_URL": f"http://127.0.0.1:{judge_port}/api/v2/piston/execute",
+        "RATELIMIT_ENABLED": "False", "JUDGE_MAX_IN_FLIGHT": "100000", "JUDGE_MAX_CONCURRENCY": "1000",
+    }
+    deployments = [
+        ("wsgi", {"ASYNC_VIEWS": "False"}, [
+            "gunicorn", "codingplatform.wsgi:application", "--workers", str(args.workers),
+            "--threads", str(args.threads), "--backlog", "4096", "--log-level", "warning",
+        ]),
+        ("asgi", {"ASYNC_VIEWS": "True"}, [
+            "uvicorn", "codingplatform.asgi:application", "--workers", str(args.workers),
+            "--backlog", "4096", "--log-level", "warning",
+        ]),
+    ]
+    try:
+        wait_for(judge_port)
+        for name, extra_env, command in deployments:
+            port = free_port()
+            bind = ["--bind", f"127.0.0.1:{port}"] if name == "wsgi" else ["--port", str(port)]
+            cache_dir = tempfile.mkdtemp(prefix=f"bench-asgi-{name}-")  # Both runs send the same solutions
+            server = subprocess.Popen(
+                [sys.executable, "-m", *command, *bind],
+                env={**env, **extra_env, "JUDGE_RESULT_CACHE_DIR": cache_dir},
+            )
+            try:
+                wait_for(port)
+                for concurrency in args.concurrency:
+                    cpu = _cpu_seconds(server.pid)
+                    latencies, errors, elapsed = asyncio.run(_load(port, path, cookies[:concurrency], args.seconds))
+                    cpu = _cpu_seconds(server.pid) - cpu
+                    label = f"{name}, {concurrency} concurrent"
+                    print(f"{label + ': submissions':<40} {len(latencies) / elapsed:9.1f} /s")
+                    print(f"{label + ': p50 latency':<40} {percentile(latencies, 50) * 1000:9.1f} ms")
+                    print(f"{label + ': p99 latency':<40} {percentile(latencies, 99) * 1000:9.1f} ms")
+                    print(f"{label + ': failed requests':<40} {len(errors):9d}")
+                    print(f"{label + ': CPU per submission':<40} {cpu / max(len(latencies), 1) * 1000:9.1f} ms")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        judge.terminate()
+        judge.wait()
+
+
+if __name__ == "__main__":
+    main()
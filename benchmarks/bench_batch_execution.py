@@ -0,0 +1,52 @@
+"""Compare per-case and batched execution on the local executor.
+
+    python -m benchmarks.bench_batch_execution --cases 10 50 200
+
+Per-case mode starts a fresh sandbox for every test case (sequentially and
+fanned out over the judge pool); batch mode hands all inputs to one
+``run_batch`` call. The result cache is cleared before every run.
+"""
+import argparse
+
+from benchmarks.common import setup_django, timer
+
+PROGRAMS = {
+    "python": "import sys\nprint(sum(map(int, sys.stdin.read().split())))",
+    "c": '#include <stdio.h>\nint main(){long s=0,x;while(scanf("%ld",&x)==1)s+=x;printf("%ld\\n",s);return 0;}',
+    "javascript": 'const t=require("fs").readFileSync(0,"utf8").split(/\\s+/).filter(Boolean);console.log(t.reduce((a,b)=>a+Number(b),0))',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cases", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--languages", nargs="+", default=list(PROGRAMS))
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    settings.JUDGE_EXECUTOR = "local"
+    settings.JUDGE_RESULT_CACHE_ALIAS = "default"
+
+    from django.core.cache import caches
+    from codingapp.judge import execute_code, verdict_for
+    from codingapp.result_cache import get_result_cache
+
+    modes = [("per_case", False), ("per_case", True), ("batch", False)]
+    for language in args.languages:
+        # Compile (and cache) outside the timings
+        execute_code(PROGRAMS[language], language, [{"input": "1", "expected_output": "1"}])
+        for n in args.cases:
+            test_cases = [{"input": f"{i} {i}", "expected_output": str(2 * i)} for i in range(n)]
+            for mode, parallel in modes:
+                settings.JUDGE_EXECUTION_MODE = mode
+                get_result_cache().clear()
+                caches["default"].clear()
+                label = f"{language:<10} {n:>4} cases {mode}{' parallel' if parallel else ''}"
+                with timer(label):
+                    results, _ = execute_code(PROGRAMS[language], language, test_cases, parallel=parallel)
+                assert verdict_for(results) == "Accepted", results[:1]
+
+
+if __name__ == "__main__":
+    main()
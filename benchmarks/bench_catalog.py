@@ -0,0 +1,80 @@
+"""Requests per second on the catalog pages with and without the catalog cache.
+
+    python -m benchmarks.bench_catalog
+    python -m benchmarks.bench_catalog --modules 50 --questions 2000 --seconds 5
+
+Drives ``module_list``, ``module_detail`` and ``question_list`` through the
+full middleware stack with Django's test client as a logged-in student, one
+request after another, for ``--seconds`` per page and configuration:
+
+* uncached: ``CATALOG_CACHE_ENABLED = False``, every request queries and renders;
+* cached: fragments and lookups served from the catalog cache;
+* revalidated: the browser sends back the ETag it got and receives a 304.
+
+Without ``DATABASE_URL`` a throwaway SQLite database is used.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Load duration per page and configuration.")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-catalog-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from django.urls import reverse
+    from codingapp.models import Module, Question
+
+    settings.SECURE_SSL_REDIRECT = False
+    call_command("migrate", verbosity=0)
+    modules = Module.objects.bulk_create(Module(title=f"Module {i}", slug=f"module-{i}") for i in range(args.modules))
+    Question.objects.bulk_create(
+        Question(title=f"Question {i}", description="", module=modules[i % len(modules)])
+        for i in range(args.questions)
+    )
+    user = User.objects.create_user(username="bench-catalog")
+    client = Client(HTTP_HOST="localhost")
+    client.force_login(user)
+
+    pages = [
+        ("module_list", reverse("module_list")),
+        ("module_detail", reverse("module_detail", args=[modules[0].pk])),
+        ("question_list", reverse("question_list")),
+    ]
+    for name, url in pages:
+        rates = {}
+        for label, enabled, revalidate in (
+            ("uncached", False, False), ("cached", True, False), ("revalidated", True, True),
+        ):
+            settings.CATALOG_CACHE_ENABLED = enabled
+            client.get(url)  # warm up: CSRF cookie, fragments, compiled templates
+            headers = {"HTTP_IF_NONE_MATCH": client.get(url)["ETag"]} if revalidate else {}
+            expected = 304 if revalidate else 200
+            count = 0
+            deadline = time.perf_counter() + args.seconds
+            start = time.perf_counter()
+            while time.perf_counter() < deadline:
+                response = client.get(url, **headers)
+                assert response.status_code == expected, response.status_code
+                count += 1
+            rates[label] = count / (time.perf_counter() - start)
+            print(f"{name + ', ' + label:<40} {rates[label]:9.1f} req/s")
+        print(f"{name + ', cached speedup':<40} {rates['cached'] / rates['uncached']:9.1f} x")
+
+
+if __name__ == "__main__":
+    main()
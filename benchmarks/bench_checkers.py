@@ -0,0 +1,94 @@
+"""Time and peak memory of the output checkers on large outputs.
+
+    python -m benchmarks.bench_checkers --megabytes 1 16
+
+For each size, the expected output is stored as a test data file and the
+program output written to another file, once identical and once differing
+in the first token. The "naive" row is what the judge used to do: read
+both outputs into strings and compare ``.split()`` lists. Each comparison
+is timed, then repeated under ``tracemalloc`` to measure its peak memory.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import setup_django
+
+
+def write_output(path, megabytes, kind, first=None):
+    """Write about ``megabytes`` MB of integers or floats, eight per line."""
+    rng = random.Random(1)
+    target = megabytes * 1024 * 1024
+    written = 0
+    with open(path, "w") as f:
+        if first is not None:
+            f.write(first + " ")
+            rng.random() if kind == "floats" else rng.randrange(10 ** 9)  # skip the replaced token
+        while written < target:
+            if kind == "floats":
+                line = " ".join(f"{rng.random() * 1000:.6f}" for _ in range(8))
+            else:
+                line = " ".join(str(rng.randrange(10 ** 9)) for _ in range(8))
+            f.write(line + "\n")
+            written += len(line) + 1
+
+
+def naive(actual_path, expected_path):
+    with open(actual_path) as actual, open(expected_path) as expected:
+        return actual.read().split() == expected.read().split()
+
+
+def measure(check):
+    start = time.perf_counter()
+    result = check()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()  # tracing slows allocation down, so it gets a run of its own
+    check()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from codingapp.checkers import ExactChecker, FloatChecker, Source, TokenChecker, UnorderedLinesChecker
+    from codingapp.testdata import blob_path, store_blob
+
+    checkers = [
+        ("exact", "ints", ExactChecker()),
+        ("tokens", "ints", TokenChecker()),
+        ("float", "floats", FloatChecker(1e-6, 1e-6)),
+        ("unordered_lines", "ints", UnorderedLinesChecker()),
+        ("naive split", "ints", None),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.JUDGE_TESTDATA_DIR = os.path.join(tmp, "testdata")
+        actual_path = os.path.join(tmp, "actual")
+        print(f"{'checker':<28} {'ms':>9} {'MB/s':>9} {'peak KiB':>9}")
+        for megabytes in args.megabytes:
+            for label, kind, checker in checkers:
+                write_output(actual_path, megabytes, kind)
+                with open(actual_path, "rb") as f:
+                    digest, _ = store_blob(f)
+                test = {"input": "", "expected_output": "", "expected_output_file": digest}
+                for case, first in (("match", None), ("mismatch", "x")):
+                    write_output(actual_path, megabytes, kind, first)
+                    if checker is None:
+                        matched, elapsed, peak = measure(lambda: naive(actual_path, blob_path(digest)))
+                    else:
+                        matched, elapsed, peak = measure(lambda: checker.check(test, Source(path=actual_path))[0])
+                    assert matched == (first is None), (label, case)
+                    print(f"{f'{label} {megabytes}MB {case}':<28} {elapsed * 1000:9.1f} "
+                          f"{megabytes / elapsed:9.1f} {peak / 1024:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
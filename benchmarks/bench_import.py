@@ -0,0 +1,77 @@
+"""Problem bank import and export: a 10k-test-case bank in bulk.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --problems 2000 --cases 20 --batch-size 200
+
+Writes a bank of ``--problems`` problems with ``--cases`` test cases each
+(see ``codingapp/problems.py`` for the layout) to a temporary directory and,
+on a throwaway SQLite database unless ``DATABASE_URL`` is set, times
+validating it, importing it, importing it again (every problem unchanged),
+exporting it to a zip and importing that zip over the same questions.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+
+def _write_bank(root, problems, cases, modules):
+    for number in range(problems):
+        path = os.path.join(root, f"module-{number % modules}", f"problem-{number}")
+        os.makedirs(os.path.join(path, "tests"))
+        with open(os.path.join(path, "statement.md"), "w") as f:
+            f.write(f"Problem {number}: print the input back.\n")
+        with open(os.path.join(path, "problem.json"), "w") as f:
+            json.dump({"title": f"Problem {number}", "checker": "tokens"}, f)
+        for case in range(cases):
+            name = f"sample{case}" if case < 2 else str(case)
+            for ext in (".in", ".out"):
+                with open(os.path.join(path, "tests", name + ext), "w") as f:
+                    f.write(f"{number} {case}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=500)
+    parser.add_argument("--cases", type=int, default=20, help="Test cases per problem.")
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=100, help="Problems per transaction.")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-import-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("JUDGE_TESTDATA_DIR", tempfile.mkdtemp(prefix="bench-import-data-"))
+
+    from benchmarks.common import setup_django, timer
+    setup_django()
+    from django.core.management import call_command
+    from codingapp import problems
+    from codingapp.models import Question
+
+    call_command("migrate", verbosity=0)
+    bank = tempfile.mkdtemp(prefix="bench-import-bank-")
+    total = args.problems * args.cases
+    with timer(f"write bank of {total} test cases"):
+        _write_bank(bank, args.problems, args.cases, args.modules)
+
+    with timer("validate"):
+        problems.validate_bank(bank)
+    with timer(f"import {total} test cases"):
+        result = problems.import_bank(bank, batch_size=args.batch_size)
+    assert result.test_cases == total, result
+    with timer("import again, unchanged"):
+        result = problems.import_bank(bank, batch_size=args.batch_size)
+    assert result.unchanged == args.problems, result
+    archive = os.path.join(bank, "export.zip")
+    with timer("export to zip"):
+        with open(archive, "wb") as output:
+            problems.export_bank(Question.objects.all(), output)
+    print(f"{'zip size':<40} {os.path.getsize(archive) / 1024:9.1f} KiB")
+    with timer("import exported zip, unchanged"):
+        result = problems.import_bank(archive, batch_size=args.batch_size)
+    assert result.unchanged == args.problems, result
+
+
+if __name__ == "__main__":
+    main()
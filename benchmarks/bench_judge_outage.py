@@ -0,0 +1,54 @@
+"""Cost of judge calls while the Piston API is down, with and without the circuit breaker.
+
+    python -m benchmarks.bench_judge_outage
+
+A local fake Piston API answers slower than ``JUDGE_TIMEOUT``, so every call
+times out. Without the breaker each call waits the full timeout; with it, the
+first ``JUDGE_BREAKER_THRESHOLD`` calls time out and the rest are turned away
+at once. The breaker cache is the in-process default unless ``REDIS_URL`` is
+set.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import setup_django
+from benchmarks.fake_piston import FakePistonServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50, help="Judge calls during the outage.")
+    parser.add_argument("--timeout", type=float, default=0.5, help="JUDGE_TIMEOUT for the run, in seconds.")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import caches
+    from codingapp.executors import ExecutorError, PistonExecutor
+
+    settings.JUDGE_TIMEOUT = args.timeout
+    settings.JUDGE_API_RETRIES = 0
+    with FakePistonServer(latency=args.timeout * 4) as server:
+        settings.PISTON_API_URL = server.url
+        for label, threshold in (("breaker off", 10 ** 9), ("breaker on", 5)):
+            settings.JUDGE_BREAKER_THRESHOLD = threshold
+            caches[settings.JUDGE_BREAKER_CACHE_ALIAS].clear()
+            executor = PistonExecutor()
+            program = executor.prepare("print(input())", "python")
+            requests_before = server.request_count
+            samples = []
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                try:
+                    executor.run_program(program, "x\n")
+                except ExecutorError:
+                    pass
+                samples.append(time.perf_counter() - start)
+            print(f"{label + ', total':<40} {sum(samples):9.2f} s")
+            print(f"{label + ', median call':<40} {statistics.median(samples) * 1000:9.2f} ms")
+            print(f"{label + ', requests sent':<40} {server.request_count - requests_before:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Count executor calls per judging policy on a realistic pass/fail mix.
+
+    python -m benchmarks.bench_judge_policy --submissions 200 --cases 50 --latency 0.001
+
+Submissions are simulated: each one is accepted, fails a sample case, or
+fails a hidden case (later cases fail more often, like large stress tests).
+An in-process executor counts the runs, so no judge server is needed.
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import setup_django, timer
+
+from codingapp.executors import BaseExecutor
+
+
+class CountingExecutor(BaseExecutor):
+    """Echo stdin, except from the test case index encoded in the code onwards."""
+    name = "counting"
+    latency = 0.0
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, code, language, stdin):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        fail_at = int(code.split(":")[1])
+        wrong = fail_at >= 0 and int(stdin) >= fail_at
+        return {"stdout": "wrong" if wrong else stdin, "stderr": "", "code": 0, "signal": None}
+
+
+def make_mix(submissions, cases, samples, rng):
+    """Return the first failing test case index per submission (-1 = accepted)."""
+    mix = []
+    for _ in range(submissions):
+        roll = rng.random()
+        if roll < 0.40:
+            mix.append(-1)
+        elif roll < 0.65:
+            mix.append(rng.randrange(samples))
+        else:
+            mix.append(samples + int((cases - samples) * rng.betavariate(3, 1.5)))
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.001, help="simulated seconds per executor call")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    settings.JUDGE_EXECUTOR = "benchmarks.bench_judge_policy.CountingExecutor"
+    settings.JUDGE_RESULT_CACHE_ALIAS = "default"  # keep benchmark results out of the shared cache
+
+    from codingapp.executors import get_executor
+    from codingapp.judge import JudgePolicy, execute_code
+
+    test_cases = [
+        {"input": str(i), "expected_output": str(i), "sample": i < args.samples}
+        for i in range(args.cases)
+    ]
+    mix = make_mix(args.submissions, args.cases, args.samples, random.Random(args.seed))
+    executor = get_executor()
+    executor.latency = args.latency
+    print(f"{args.submissions} submissions x {args.cases} test cases, "
+          f"{mix.count(-1) / len(mix):.0%} accepted")
+
+    for parallel in (False, True):
+        baseline = None
+        for policy in JudgePolicy:
+            executor.calls = 0
+            with timer(f"{policy.value:<14} {'parallel' if parallel else 'sequential'}"):
+                for n, fail_at in enumerate(mix):
+                    code = f"{parallel}{policy}{n}:{fail_at}"  # unique code: no result cache hits
+                    execute_code(code, "python", test_cases, parallel=parallel, policy=policy)
+            baseline = baseline or executor.calls
+            print(f"{'':<14} executor calls {executor.calls:>7} ({executor.calls / baseline:.0%} of run-all)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""End-to-end load test of the user-facing pages, with a machine-readable report.
+
+    python -m benchmarks.bench_load > before.json
+    python -m benchmarks.bench_load --compare before.json > after.json
+    python -m benchmarks.bench_load --server wsgi --concurrency 32 --scenarios submit dashboard
+
+Fills a throwaway SQLite database (unless ``DATABASE_URL`` is set) with
+``datagen.generate`` (``--reuse`` keeps the data an earlier run or
+``python -m benchmarks.datagen`` left there), starts a fake Piston API with
+``--latency`` seconds per call (see ``fake_piston.py``) and serves the
+project with uvicorn or gunicorn (``--server``). ``JUDGE_ASYNC`` is off, so
+a submission is judged before its POST is answered; rate and admission
+limits are lifted.
+
+Each scenario is a script of requests one user repeats:
+
+- ``browse``: a page of the question list, the module list and a module
+- ``question``: open a question
+- ``submit``: submit a new solution to a question (never in the result cache)
+- ``dashboard``: open the dashboard with the user's submission history
+
+For ``--seconds`` per scenario, ``--concurrency`` logged-in users run it in a
+loop. Reported per scenario: requests per second, p50/p95/p99 latency, failed
+requests and the database queries each step makes (counted in-process, after
+one warm-up pass, with the same settings). The summary goes to stderr and the
+JSON report to stdout (or ``--output``); ``--compare`` prints the change
+against an earlier report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote_plus
+
+from benchmarks import datagen
+from benchmarks.common import free_port, http_request, percentile, wait_for
+
+
+def _steps(data, questions_per_page):
+    """``{scenario: [(step, request)]}`` where ``request(rng, tag)`` returns ``(method, path, body)``."""
+    from django.urls import reverse
+
+    pages = max(1, -(-len(data.question_ids) // questions_per_page))
+
+    def get(name, *args, query=lambda rng: ""):
+        return lambda rng, tag: ("GET", reverse(name, args=[arg(rng) for arg in args]) + query(rng), "")
+
+    def submit(rng, tag):
+        # A new solution each time so the result cache never answers for the judge
+        code = f"x = '{tag}'\nprint(input())"
+        return "POST", reverse("question_detail", args=[question(rng)]), f"language=python&code={quote_plus(code)}"
+
+    def question(rng):
+        return rng.choice(data.question_ids)
+
+    def module(rng):
+        return rng.choice(data.module_ids)
+
+    return {
+        "browse": [
+            ("question_list", get("question_list", query=lambda rng: f"?page={rng.randint(1, pages)}")),
+            ("module_list", get("module_list")),
+            ("module_detail", get("module_detail", module)),
+        ],
+        "question": [("question_detail", get("question_detail", question))],
+        "submit": [("submit", submit)],
+        "dashboard": [("dashboard", get("dashboard"))],
+    }
+
+
+def _count_queries(steps, user_id):
+    """Queries per step of one pass through the scenario, after a warm-up pass."""
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(HTTP_HOST="localhost")
+    client.force_login(User.objects.get(pk=user_id))
+    rng = random.Random(0)
+    counts = {}
+    for counted in (False, True):
+        for number, (step, request) in enumerate(steps):
+            method, path, body = request(rng, f"queries.{counted}.{number}")
+            with CaptureQueriesContext(connection) as queries:
+                if method == "GET":
+                    response = client.get(path)
+                else:
+                    response = client.post(path, body, content_type="application/x-www-form-urlencoded")
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path} answered {response.status_code}")
+            if counted:
+                counts[step] = len(queries)
+    return counts
+
+
+async def _user(port, steps, cookie, rng, tag, deadline, latencies, errors):
+    connection = [None]
+    csrf = cookie.split("csrftoken=")[1]
+    iteration = 0
+    while time.monotonic() < deadline:
+        iteration += 1
+        for _, request in steps:
+            method, path, body = request(rng, f"{tag}.{iteration}")
+            head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\n"
+            if method == "POST":
+                head += (
+                    f"X-CSRFToken: {csrf}\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                    f"Content-Length: {len(body.encode())}\r\n"
+                )
+            begin = time.perf_counter()
+            try:
+                status = await http_request(port, connection, (head + "\r\n" + body).encode())
+            except (OSError, asyncio.IncompleteReadError):
+                errors.append(None)
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - begin)
+            else:
+                errors.append(status)
+    if connection[0]:
+        connection[0][1].close()
+
+
+async def _load(port, steps, cookies, seconds, name):
+    latencies, errors = [], []
+    deadline = time.monotonic() + seconds
+    begin = time.perf_counter()
+    await asyncio.gather(*(
+        _user(port, steps, cookie, random.Random(number), f"{name}.{number}.{time.time_ns()}", deadline, latencies, errors)
+        for number, cookie in enumerate(cookies)
+    ))
+    return latencies, errors, time.perf_counter() - begin
+
+
+def _commit():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return revision, dirty
+
+
+def _compare(report, baseline):
+    print(f"\nchange against {baseline.get('commit') or 'baseline'}:", file=sys.stderr)
+    for name, now in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for key, unit in (("requests_per_second", "/s"), ("p50_ms", "ms"), ("p95_ms", "ms"), ("p99_ms", "ms"),
+                          ("queries_per_iteration", "queries")):
+            change = (now[key] - before[key]) / before[key] * 100 if before[key] else float("nan")
+            print(f"{f'{name}: {key}':<40} {before[key]:9.1f} -> {now[key]:9.1f} {unit:<8} {change:+7.1f} %",
+                  file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=["browse", "question", "submit", "dashboard"],
+                        default=["browse", "question", "submit", "dashboard"])
+    parser.add_argument("--concurrency", type=int, default=16, help="Users running each scenario at once.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each scenario.")
+    parser.add_argument("--server", choices=["asgi", "wsgi"], default="asgi")
+    parser.add_argument("--workers", type=int, default=2, help="Server processes.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the fake judge takes per call.")
+    parser.add_argument("--reuse", action="store_true", help="Use the data already in DATABASE_URL.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--compare", help="An earlier JSON report to compare against.")
+    datagen.add_arguments(parser)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        if args.reuse:
+            parser.error("--reuse needs DATABASE_URL")
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-load-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    judge_port = free_port()
+    settings_env = {
+        "DEBUG": "False", "SECURE_SSL_REDIRECT": "False", "JUDGE_ASYNC": "False",
+        "ASYNC_VIEWS": str(args.server == "asgi"), "JUDGE_EXECUTOR": "piston", "JUDGE_FALLBACK_EXECUTOR": "",
+        "PISTON_API_URL": f"http://127.0.0.1:{judge_port}/api/v2/piston/execute",
+        "RATELIMIT_ENABLED": "False", "JUDGE_MAX_IN_FLIGHT": "100000", "JUDGE_MAX_CONCURRENCY": "1000",
+        "JUDGE_RESULT_CACHE_DIR": tempfile.mkdtemp(prefix="bench-load-cache-"),
+        "SLOW_REQUEST_SECONDS": "0",  # Overloaded on purpose; the log would drown the summary
+    }
+    os.environ.update(settings_env)  # The in-process query counts run with the server's settings
+
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from codingapp.views import QUESTIONS_PER_PAGE
+
+    call_command("migrate", verbosity=0)
+    if args.reuse:
+        data = datagen.existing()
+        if not data.question_ids or not data.user_ids:
+            parser.error("No benchmark data in DATABASE_URL; run python -m benchmarks.datagen first")
+    else:
+        data = datagen.generate(args.modules, args.questions, args.cases, args.users, args.submissions, args.seed)
+    users = User.objects.in_bulk(data.user_ids[:args.concurrency])
+    cookies = []
+    for i, user in enumerate(users.values()):
+        client = Client()
+        client.force_login(user)
+        # The CSRF middleware accepts a cookie secret sent back as the header token
+        cookies.append(f"sessionid={client.cookies['sessionid'].value}; csrftoken={f'{i:032d}'}")
+    scenarios = _steps(data, QUESTIONS_PER_PAGE)
+
+    judge = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_piston", "--port", str(judge_port), "--latency", str(args.latency)],
+        stdout=subprocess.DEVNULL,
+    )
+    port = free_port()
+    if args.server == "asgi":
+        command = ["uvicorn", "codingplatform.asgi:application", "--port", str(port)]
+    else:
+        command = ["gunicorn", "codingplatform.wsgi:application", "--bind", f"127.0.0.1:{port}"]
+    server = subprocess.Popen(
+        [sys.executable, "-m", *command, "--workers", str(args.workers), "--backlog", "4096", "--log-level", "warning"],
+        env=os.environ,
+    )
+    revision, dirty = _commit()
+    report = {
+        "commit": revision,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {
+            "server": args.server, "workers": args.workers, "concurrency": args.concurrency,
+            "seconds": args.seconds, "judge_latency": args.latency,
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        },
+        "data": {
+            "modules": len(data.module_ids), "questions": len(data.question_ids),
+            "users": len(data.user_ids), "submissions": data.submissions,
+        },
+        "scenarios": {},
+    }
+    try:
+        wait_for(judge_port)
+        wait_for(port)
+        for name in args.scenarios:
+            steps = scenarios[name]
+            queries = _count_queries(steps, data.user_ids[0])
+            latencies, errors, elapsed = asyncio.run(_load(port, steps, cookies, args.seconds, name))
+            result = report["scenarios"][name] = {
+                "requests": len(latencies),
+                "errors": len(errors),
+                "requests_per_second": round(len(latencies) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "queries": queries,
+                "queries_per_iteration": sum(queries.values()),
+            }
+            print(f"{name + ': requests':<40} {result['requests_per_second']:9.1f} /s", file=sys.stderr)
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                print(f"{f'{name}: {key[:3]} latency':<40} {result[key]:9.1f} ms", file=sys.stderr)
+            print(f"{name + ': failed requests':<40} {result['errors']:9d}", file=sys.stderr)
+            print(f"{name + ': queries per iteration':<40} {result['queries_per_iteration']:9d}", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+        judge.terminate()
+        judge.wait()
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            _compare(report, json.load(baseline))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+            output.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
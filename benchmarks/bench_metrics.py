@@ -0,0 +1,114 @@
+"""Cost of the judge metrics and request tracing on the hot path.
+
+    python -m benchmarks.bench_metrics
+    python -m benchmarks.bench_metrics --requests 500 --cases 10
+
+Judges submissions in-process against a fake Piston API with no latency (see
+``fake_piston.py``), on a throwaway SQLite database unless ``DATABASE_URL``
+is set, once with ``METRICS_ENABLED`` and ``SLOW_REQUEST_SECONDS`` (so
+``RequestTimingMiddleware``, the query timer, every span and histogram are
+active) and once with both off. Each POST sends a new solution so the judge
+calls the executor for every test case. Reported: time per submission both
+ways and the difference, then the cost of single ``observe``, ``inc`` and
+``span`` calls and of a ``/metrics`` scrape.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def _per_call(function, calls):
+    begin = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - begin) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Submissions per configuration and round.")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--cases", type=int, default=5, help="Test cases per submission.")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-metrics-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("JUDGE_RESULT_CACHE_DIR", tempfile.mkdtemp(prefix="bench-metrics-cache-"))
+
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from benchmarks.fake_piston import FakePistonServer
+    from codingapp import metrics, tracing
+    from codingapp.models import Module, Question, TestCase
+
+    call_command("migrate", verbosity=0)
+    module = Module.objects.create(title="Benchmark")
+    question = Question.objects.create(title="Echo", description="", module=module)
+    TestCase.objects.bulk_create(
+        TestCase.from_dict(question, position, {"input": str(position), "expected_output": str(position)})
+        for position in range(args.cases)
+    )
+    user = User.objects.create_user(username="bench")
+    path = reverse("question_detail", args=[question.pk])
+
+    server = FakePistonServer(latency=0).start()
+    common = dict(
+        SECURE_SSL_REDIRECT=False, JUDGE_ASYNC=False, JUDGE_EXECUTOR="piston", JUDGE_FALLBACK_EXECUTOR="",
+        RATELIMIT_ENABLED=False, PISTON_API_URL=server.url, ALLOWED_HOSTS=["*"],
+        METRICS_FLUSH_INTERVAL=3600,  # Flushing is a background cost; the scrape below times it
+    )
+    configurations = [
+        ("instrumented", dict(METRICS_ENABLED=True, SLOW_REQUEST_SECONDS=60)),
+        ("bare", dict(METRICS_ENABLED=False, SLOW_REQUEST_SECONDS=0)),
+    ]
+    samples = {name: [] for name, _ in configurations}
+    submission = 0
+    try:
+        for _ in range(args.rounds):  # Alternate so drift in the machine hits both alike
+            for name, extra in configurations:
+                with override_settings(**common, **extra):
+                    client = Client()  # Loads the middleware under these settings
+                    client.force_login(user)
+                    begin = time.perf_counter()
+                    for _ in range(args.requests):
+                        submission += 1
+                        response = client.post(path, {"language": "python", "code": f"x = {submission}\nprint(input())"})
+                        assert response.status_code == 200, response.status_code
+                    samples[name].append((time.perf_counter() - begin) / args.requests)
+    finally:
+        server.stop()
+
+    instrumented, bare = (statistics.median(samples[name]) for name, _ in configurations)
+    print(f"{'submission, instrumented':<40} {instrumented * 1000:9.2f} ms")
+    print(f"{'submission, bare':<40} {bare * 1000:9.2f} ms")
+    print(f"{'overhead per submission':<40} {(instrumented - bare) * 1e6:9.1f} us")
+    print(f"{'overhead':<40} {(instrumented - bare) / bare * 100:9.1f} %")
+
+    with override_settings(METRICS_ENABLED=True):
+        observe = _per_call(lambda: metrics.EXECUTOR_SECONDS.observe(0.01, executor="piston", call="run"), 100_000)
+        inc = _per_call(lambda: metrics.JUDGE_TEST_CASES.inc(language="python", source="cache"), 100_000)
+        token = tracing._current.set(tracing.Trace())
+
+        def traced():
+            with tracing.span("bench"):
+                pass
+
+        span = _per_call(traced, 100_000)
+        tracing._current.reset(token)
+        scrape = _per_call(metrics.exposition, 50)
+    print(f"{'Histogram.observe':<40} {observe * 1e6:9.2f} us")
+    print(f"{'Counter.inc':<40} {inc * 1e6:9.2f} us")
+    print(f"{'span':<40} {span * 1e6:9.2f} us")
+    print(f"{'/metrics scrape':<40} {scrape * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Compare sequential and parallel judging against a local fake Piston server.
+
+    python -m benchmarks.bench_parallel_judge --latency 0.05
+
+Sequential judging costs about ``n * RTT``; parallel judging should stay close
+to one RTT until the per-process concurrency cap is reached.
+"""
+import argparse
+
+from benchmarks.common import setup_django, timer
+from benchmarks.fake_piston import FakePistonServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--cases", type=int, nargs="+", default=[1, 5, 20])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from codingapp.judge import execute_code
+
+    with FakePistonServer(latency=args.latency) as server:
+        settings.PISTON_API_URL = server.url
+        print(f"RTT ~{args.latency * 1000:.0f} ms, JUDGE_MAX_CONCURRENCY={settings.JUDGE_MAX_CONCURRENCY}")
+        execute_code("print(1)", "python", [{"input": "1", "expected_output": "1"}])  # warm the pool
+        for n in args.cases:
+            test_cases = [{"input": str(i), "expected_output": str(i)} for i in range(n)]
+            with timer(f"{n:>4} cases sequential"):
+                execute_code("", "python", test_cases, parallel=False)
+            with timer(f"{n:>4} cases parallel"):
+                results, _ = execute_code("", "python", test_cases, parallel=True)
+            assert [r["input"] for r in results] == [t["input"] for t in test_cases]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Overhead of the submission rate limiter and admission checks.
+
+    python -m benchmarks.bench_ratelimit
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_ratelimit
+
+First times ``ratelimit.take`` on the user, IP and global buckets alone,
+then a full submission POST to ``question_detail`` (queued for background
+judging) with the limiter on and off. The limits are set high enough that
+nothing is turned away. Without ``DATABASE_URL`` a throwaway SQLite database
+is used.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=20000, help="Limiter calls to time.")
+    parser.add_argument("--requests", type=int, default=500, help="Submission POSTs per configuration.")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-ratelimit-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    for name in ("RATELIMIT_USER", "RATELIMIT_IP", "RATELIMIT_GLOBAL"):
+        os.environ[name] = "1000000/second"
+
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from django.urls import reverse
+    from codingapp import ratelimit
+    from codingapp.admission import submission_buckets
+    from codingapp.models import Module, Question
+
+    settings.JUDGE_ASYNC = True
+    settings.JUDGE_MAX_QUEUE = 10 ** 9  # no worker drains the queue here
+    settings.SECURE_SSL_REDIRECT = False
+    call_command("migrate", verbosity=0)
+    user, _ = User.objects.get_or_create(username="bench-ratelimit")
+    module, _ = Module.objects.get_or_create(title="Benchmark")
+    question, _ = Question.objects.get_or_create(title="Echo", module=module, defaults={"description": ""})
+    backend = settings.CACHES[settings.RATELIMIT_CACHE_ALIAS]["BACKEND"].rsplit(".", 1)[-1]
+
+    class FakeRequest:
+        META = {"REMOTE_ADDR": "203.0.113.7"}
+    request = FakeRequest()
+    request.user = user
+    buckets = submission_buckets(request)
+    start = time.perf_counter()
+    for _ in range(args.checks):
+        assert ratelimit.take(buckets) == 0
+    per_check = (time.perf_counter() - start) / args.checks
+    print(f"{'limiter check, 3 buckets (' + backend + ')':<40} {per_check * 1e6:9.1f} us")
+
+    client = Client(HTTP_HOST="localhost")
+    client.force_login(user)
+    url = reverse("question_detail", args=[question.pk])
+    timings = {}
+    for enabled in (False, True, False, True):  # interleaved to spread out drift
+        settings.RATELIMIT_ENABLED = enabled
+        samples = timings.setdefault(enabled, [])
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            response = client.post(url, {"code": "print(input())", "language": "python"})
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+    for enabled, label in ((False, "submission POST, limiter off"), (True, "submission POST, limiter on")):
+        print(f"{label:<40} {statistics.median(timings[enabled]) * 1000:9.2f} ms (median)")
+    overhead = statistics.median(timings[True]) - statistics.median(timings[False])
+    print(f"{'overhead per submission':<40} {overhead * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cold start against warm sandboxes on the local executor.
+
+    python -m benchmarks.bench_sandbox_pool
+    python -m benchmarks.bench_sandbox_pool --runs 500 --cases 1 10 50
+
+Times ``--runs`` single runs (``run_program``) and, for each ``--cases``,
+batches of that many test cases (``run_batch``) of a short Python solution,
+first with pooling off (a new interpreter per run, or per batch through the
+batch harness), then with ``JUDGE_POOL_SIZE_PER_CORE`` warm sandboxes, and
+prints per-run latency percentiles, the pool hit rate and the lease wait.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import percentile, setup_django, timer
+
+PROGRAM = "import sys, collections\nprint(sum(map(int, sys.stdin.read().split())))"
+
+
+def _measure(executor, program, runs):
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        run = executor.run_program(program, f"{i} {i}")
+        samples.append(time.perf_counter() - started)
+        assert run["stdout"] == f"{2 * i}\n", run
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--cases", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--size-per-core", type=float, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from codingapp import sandbox_pool
+    from codingapp.executors import LocalExecutor
+
+    executor = LocalExecutor()
+    program = executor.prepare(PROGRAM, "python")
+    for mode, size in (("cold", 0), ("warm", args.size_per_core)):
+        settings.JUDGE_POOL_SIZE_PER_CORE = size
+        sandbox_pool.close_pools()
+        if size:
+            pool = executor._pool("python")
+            while pool.stats()["idle"] < pool.size:
+                time.sleep(0.01)
+        samples = _measure(executor, program, args.runs)
+        for label, percent in (("p50", 50), ("p95", 95), ("p99", 99)):
+            print(f"{f'{mode} run_program {label}':<40} {percentile(samples, percent) * 1000:9.1f} ms")
+        print(f"{f'{mode} run_program mean':<40} {statistics.mean(samples) * 1000:9.1f} ms")
+        for n in args.cases:
+            stdins = [f"{i} {i}" for i in range(n)]
+            with timer(f"{mode} run_batch {n} cases"):
+                runs = executor.run_batch(program, stdins)
+            assert [run["stdout"] for run in runs] == [f"{2 * i}\n" for i in range(n)], runs[:1]
+        if size:
+            stats = pool.stats()
+            print(f"{'hit rate':<40} {stats['hit_rate'] * 100:9.1f} %")
+            print(f"{'sandboxes retired':<40} {stats['retired']:9d}")
+
+    # Lease wait under contention: every lease is held by a competing judge
+    settings.JUDGE_POOL_LEASE_TIMEOUT = 0
+    held = [pool.lease() for _ in range(pool.size)]
+    for lease in held:
+        lease.__enter__()
+    started = time.perf_counter()
+    run = executor.run_program(program, "1 1")
+    print(f"{'exhausted pool, cold fallback':<40} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    assert run["stdout"] == "2\n", run
+    for lease in held:
+        lease.__exit__(None, None, None)
+    sandbox_pool.close_pools()
+
+
+if __name__ == "__main__":
+    main()
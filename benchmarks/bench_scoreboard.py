@@ -0,0 +1,186 @@
+"""Contest scoreboard: snapshot build cost and fan-out to many streaming viewers.
+
+    python -m benchmarks.bench_scoreboard
+    python -m benchmarks.bench_scoreboard --viewers 5000 --participants 2000 --seconds 20
+
+Fills a throwaway SQLite database (unless ``DATABASE_URL`` is set) with a
+running contest, times building one scoreboard snapshot, then starts the
+ASGI app under uvicorn and opens ``--viewers`` Server-Sent Events streams to
+it while verdicts keep arriving. Reported: how long until every viewer has
+the board, then over ``--seconds`` of steady streaming the scoreboard events
+each viewer received per second (one per tick when every tick brings a
+change) and the server's CPU time (from /proc, so Linux only). Rebuilding the
+board for every viewer on every tick would instead cost viewers x build time
+per tick.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+EVENT = b"\nevent: scoreboard\n"
+
+
+async def _viewer(port, path, stats, stop):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    stats["connected"] += 1
+    tail = b""
+    try:
+        while not stop.is_set():
+            # Count events in raw chunks: parsing lines would cost the client more than the server
+            chunk = await reader.read(1 << 20)
+            if not chunk:
+                break
+            stats["events"] += (tail + chunk).count(EVENT)
+            tail = chunk[-len(EVENT) + 1:]
+    finally:
+        writer.close()
+
+
+async def _watch(port, path, viewers, seconds, stats, server_pid):
+    """Connect all viewers, wait until each has the board, then measure ``seconds`` of steady streaming."""
+    stop = asyncio.Event()
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(_viewer(port, path, stats, stop)) for _ in range(viewers)]
+    while stats["events"] < viewers and time.perf_counter() - started < 120:
+        await asyncio.sleep(0.05)
+    stats["connect_seconds"] = time.perf_counter() - started
+    events, cpu, begin = stats["events"], _cpu_seconds(server_pid), time.perf_counter()
+    await asyncio.sleep(seconds)
+    stats["steady_events"] = stats["events"] - events
+    stats["steady_cpu"] = _cpu_seconds(server_pid) - cpu
+    stats["steady_seconds"] = time.perf_counter() - begin
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=12)
+    parser.add_argument("--submissions", type=int, default=20_000)
+    parser.add_argument("--viewers", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of the streaming load.")
+    parser.add_argument("--verdicts-per-second", type=float, default=5.0)
+    parser.add_argument("--tick", type=float, default=1.0, help="CONTEST_SCOREBOARD_TICK for the server.")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-scoreboard-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from benchmarks.common import setup_django, timer
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.urls import reverse
+    from django.utils import timezone
+    from codingapp import contests
+    from codingapp.judge import record_verdict
+    from codingapp.models import Contest, Module, Question, Submission
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(0)
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(args.participants))
+    module = Module.objects.create(title="Benchmark")
+    questions = Question.objects.bulk_create(
+        Question(title=f"Question {i}", description="", module=module) for i in range(args.questions)
+    )
+    now = timezone.now()
+    contest = Contest.objects.create(title="Benchmark", start_at=now - timedelta(hours=2), end_at=now + timedelta(hours=1))
+    contest.questions.set(questions)
+    statuses = ["Accepted", "Rejected", "Rejected", "Time Limit Exceeded", "Compile Error"]
+    Submission.objects.bulk_create(
+        (
+            Submission(
+                user=rng.choice(users), question=rng.choice(questions), code="", status=rng.choice(statuses),
+                submitted_at=contest.start_at + timedelta(seconds=rng.uniform(0, 7000)),
+            )
+            for _ in range(args.submissions)
+        ),
+        batch_size=5000,
+    )
+    with timer(f"rebuild {args.submissions} submissions"):
+        results = contests.rebuild(contest)
+    print(f"{'contest results':<40} {results:9d} rows")
+
+    samples = []
+    for _ in range(20):
+        begin = time.perf_counter()
+        snapshot = contests.build_snapshot(contest.pk, contests.PUBLIC, contests.version(contest.pk))
+        samples.append(time.perf_counter() - begin)
+    build = statistics.median(samples)
+    print(f"{'build one snapshot':<40} {build * 1000:9.1f} ms")
+    print(f"{'snapshot event size':<40} {len(snapshot.frame) / 1024:9.1f} KiB")
+    print(f"{'rebuild per viewer, per tick':<40} {build * args.viewers:9.1f} s")
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = {
+        **os.environ, "SECURE_SSL_REDIRECT": "False", "CONTEST_SCOREBOARD_TICK": str(args.tick),
+        "CONTEST_STREAM_SECONDS": str(int(args.seconds * 10)),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "codingplatform.asgi:application", "--port", str(port),
+         "--log-level", "warning", "--backlog", str(args.viewers * 2)],
+        env=env,
+    )
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        stopped = threading.Event()
+
+        def judge():
+            while not stopped.wait(1 / args.verdicts_per_second):
+                submission = Submission.objects.create(user=rng.choice(users), question=rng.choice(questions), code="")
+                record_verdict(submission, [{"status": rng.choice(statuses), "actual_output": ""}], None)
+
+        stats = {"connected": 0, "events": 0}
+        path = reverse("contest_scoreboard_stream", args=[contest.pk])
+        judge_thread = threading.Thread(target=judge, daemon=True)
+        judge_thread.start()
+        asyncio.run(_watch(port, path, args.viewers, args.seconds, stats, server.pid))
+        stopped.set()
+        judge_thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    elapsed = stats["steady_seconds"]
+    print(f"{'viewers connected':<40} {stats['connected']:9d}")
+    print(f"{'all viewers have the board after':<40} {stats['connect_seconds']:9.1f} s")
+    print(f"{'events per viewer per second':<40} {stats['steady_events'] / args.viewers / elapsed:9.2f}")
+    print(f"{'server CPU':<40} {stats['steady_cpu'] / elapsed * 100:9.1f} %")
+    print(f"{'server CPU per viewer':<40} {stats['steady_cpu'] / elapsed / args.viewers * 1e6:9.1f} us/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Leaderboard reads from the aggregate tables versus a live GROUP BY over submissions.
+
+    python -m benchmarks.bench_stats
+    python -m benchmarks.bench_stats --submissions 1000000 --users 20000
+
+Fills a throwaway SQLite database (unless ``DATABASE_URL`` is set) with
+judged submissions, builds the aggregates with ``stats.rebuild`` and then
+times the top-100 query both ways, plus the extra cost ``record_verdict``
+pays to keep the aggregates current.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=300_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-stats-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from benchmarks.common import setup_django, timer
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.db.models import Count, Q
+    from django.utils import timezone
+    from codingapp import stats
+    from codingapp.judge import record_verdict
+    from codingapp.models import Module, Question, Submission
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(0)
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(args.users))
+    module = Module.objects.create(title="Benchmark")
+    questions = Question.objects.bulk_create(
+        Question(title=f"Question {i}", description="", module=module) for i in range(args.questions)
+    )
+    statuses = ["Accepted", "Rejected", "Rejected", "Time Limit Exceeded", "Compile Error"]
+    start = timezone.now() - timedelta(days=30)
+    with timer(f"insert {args.submissions} submissions"):
+        for offset in range(0, args.submissions, 10_000):
+            Submission.objects.bulk_create(
+                Submission(
+                    user=rng.choice(users), question=rng.choice(questions), code="",
+                    status=rng.choice(statuses), submitted_at=start + timedelta(seconds=offset + i),
+                )
+                for i in range(min(10_000, args.submissions - offset))
+            )
+    with timer("stats.rebuild"):
+        stats.rebuild()
+
+    def live_top():
+        return list(
+            Submission.objects.filter(status="Accepted")
+            .values("user_id")
+            .annotate(solved=Count("question_id", distinct=True), accepted=Count("id", filter=Q(status="Accepted")))
+            .order_by("-solved")[:100]
+        )
+
+    def aggregate_top():
+        cache.clear()
+        return stats.leaderboard(100)
+
+    for label, read in (("top 100, live GROUP BY", live_top), ("top 100, aggregate table", aggregate_top),
+                        ("top 100, cached", lambda: stats.leaderboard(100))):
+        samples = []
+        for _ in range(args.repeat):
+            begin = time.perf_counter()
+            read()
+            samples.append(time.perf_counter() - begin)
+        print(f"{label:<40} {statistics.median(samples) * 1000:9.2f} ms")
+
+    samples = []
+    for i in range(200):
+        submission = Submission.objects.create(user=rng.choice(users), question=rng.choice(questions), code="")
+        begin = time.perf_counter()
+        record_verdict(submission, [{"status": rng.choice(statuses), "actual_output": ""}], None)
+        samples.append(time.perf_counter() - begin)
+    print(f"{'record_verdict with stats':<40} {statistics.median(samples) * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
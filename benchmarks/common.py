@@ -0,0 +1,75 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Run any benchmark from the project root, e.g. ``python -m benchmarks.bench_parallel_judge``.
+"""
+import asyncio
+import os
+import socket
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'codingplatform.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def timer(label, samples=None):
+    """Print (and optionally collect) the wall time of the wrapped block."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    if samples is not None:
+        samples.append(elapsed)
+    print(f"{label:<40} {elapsed * 1000:9.1f} ms")
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for(port, seconds=30):
+    """Block until something accepts connections on ``port``."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else float("nan")
+
+
+async def http_request(port, connection, request):
+    """Send raw ``request`` bytes on a keep-alive ``connection`` and return the response status.
+
+    ``connection`` is a one-item list holding the reader and writer, opened
+    on first use and reopened after the server closed it.
+    """
+    if connection[0] is None:
+        connection[0] = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = connection[0]
+    try:
+        writer.write(request)
+        await writer.drain()
+        headers = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        writer.close()
+        connection[0] = None
+        raise
+    status = int(headers.split(" ", 2)[1])
+    length = int(headers.split("content-length:", 1)[1].split("\r\n", 1)[0]) if "content-length:" in headers else 0
+    await reader.readexactly(length)
+    if "connection: close" in headers:
+        writer.close()
+        connection[0] = None
+    return status
@@ -0,0 +1,115 @@
+"""Synthetic catalog, users and submission history for benchmarks.
+
+    python -m benchmarks.datagen
+    python -m benchmarks.datagen --submissions 2000000 --users 20000 --questions 50
+
+Creates ``--modules`` modules of ``--questions`` questions each, every
+question with ``--cases`` echo test cases (``expected_output`` equals
+``input``, which is what ``fake_piston.py`` answers), ``--users`` users named
+``bench<n>`` and ``--submissions`` judged submissions spread over them, then
+rebuilds the leaderboard aggregates. Everything is written with
+``bulk_create`` in batches, so millions of submissions take minutes, not
+hours. Without ``DATABASE_URL`` a throwaway SQLite database is created and
+its URL printed, to point ``bench_load --reuse`` at.
+"""
+import argparse
+import os
+import random
+import tempfile
+from collections import namedtuple
+
+USERNAME_PREFIX = "bench"
+STATUSES = ["Accepted", "Accepted", "Rejected", "Rejected", "Time Limit Exceeded", "Compile Error"]
+
+Dataset = namedtuple("Dataset", "module_ids question_ids user_ids submissions")
+
+
+def generate(modules=5, questions=20, cases=5, users=1000, submissions=100_000, seed=0, batch_size=10_000):
+    """Write the data set and return its ids as a ``Dataset``."""
+    from benchmarks.common import timer
+    from django.contrib.auth.models import User
+    from codingapp import catalog, stats
+    from codingapp.models import Module, Question, Submission, TestCase
+
+    rng = random.Random(seed)
+    with timer(f"insert {modules * questions} questions"):
+        module_rows = Module.objects.bulk_create(
+            Module(title=f"Benchmark module {i}", slug=f"benchmark-module-{i}", description="") for i in range(modules)
+        )
+        question_rows = Question.objects.bulk_create(
+            Question(title=f"Question {m}.{q}", description="Print the input back.", module=module)
+            for m, module in enumerate(module_rows) for q in range(questions)
+        )
+    with timer(f"insert {len(question_rows) * cases} test cases"):
+        TestCase.objects.bulk_create(
+            (
+                TestCase.from_dict(question, position, {"input": str(position), "expected_output": str(position)})
+                for question in question_rows for position in range(cases)
+            ),
+            batch_size=batch_size,
+        )
+    with timer(f"insert {users} users"):
+        user_ids = [
+            user.pk for user in User.objects.bulk_create(
+                (User(username=f"{USERNAME_PREFIX}{i}") for i in range(users)), batch_size=batch_size,
+            )
+        ]
+    question_ids = [question.pk for question in question_rows]
+    with timer(f"insert {submissions} submissions"):
+        for offset in range(0, submissions, batch_size):
+            Submission.objects.bulk_create(
+                Submission(
+                    user_id=rng.choice(user_ids), question_id=rng.choice(question_ids),
+                    code=f"print(input())  # {offset + i}", language="python", status=rng.choice(STATUSES),
+                )
+                for i in range(min(batch_size, submissions - offset))
+            )
+    with timer("stats.rebuild"):
+        stats.rebuild()
+    catalog.bump_generation()  # bulk_create sends no post_save
+    return Dataset([module.pk for module in module_rows], question_ids, user_ids, submissions)
+
+
+def existing():
+    """The ``Dataset`` an earlier ``generate`` left in the database."""
+    from django.contrib.auth.models import User
+    from codingapp.models import Module, Question, Submission
+
+    module_ids = list(Module.objects.filter(slug__startswith="benchmark-module-").values_list("pk", flat=True))
+    return Dataset(
+        module_ids,
+        list(Question.objects.filter(module_id__in=module_ids).values_list("pk", flat=True)),
+        list(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list("pk", flat=True)),
+        Submission.objects.count(),
+    )
+
+
+def add_arguments(parser):
+    parser.add_argument("--modules", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=20, help="Questions per module.")
+    parser.add_argument("--cases", type=int, default=5, help="Test cases per question.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--submissions", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-data-"), "db.sqlite3")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        print(f"DATABASE_URL={os.environ['DATABASE_URL']}")
+
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    generate(args.modules, args.questions, args.cases, args.users, args.submissions, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""A local, Piston-compatible HTTP server for benchmarks and tests.
+
+The server echoes ``stdin`` back as ``stdout`` so a test case passes when its
+``expected_output`` equals its ``input``. Latency and error rate are
+configurable to simulate a slow or flaky judge.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with server.stats_lock:
+            server.request_count += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.error_rate and random.random() < server.error_rate:
+            body = json.dumps({"message": "injected failure"}).encode()
+            self.send_response(server.error_status)
+        else:
+            stdin = payload.get("stdin", "")
+            body = json.dumps({
+                "language": payload.get("language"),
+                "version": "0.0.0",
+                "run": {"stdout": stdin, "stderr": "", "code": 0, "signal": None, "output": stdin},
+            }).encode()
+            self.send_response(200)
+        try:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client timed out and hung up
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePistonServer:
+    """Run a fake Piston API on a background thread.
+
+    Use as a context manager; ``url`` is the execute endpoint to point
+    ``settings.PISTON_API_URL`` at.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.error_rate = error_rate
+        self.httpd.error_status = error_status
+        self.httpd.request_count = 0
+        self.httpd.stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v2/piston/execute"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    def configure(self, **options):
+        """Change ``latency``, ``error_rate`` or ``error_status`` while running."""
+        for name, value in options.items():
+            setattr(self.httpd, name, value)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakePistonServer(latency=args.latency, error_rate=args.error_rate, port=args.port)
+    print(f"Fake Piston listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,7 +1,22 @@
-from django.contrib import admin
+import logging
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.contrib import admin, messages
 from django import forms
+from django.core.exceptions import PermissionDenied
+from django.db.models import Avg, Count, Max, Q, Sum
 from django.forms import formset_factory
-from .models import Module, Question, Submission
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect, render
+from django.urls import path, reverse
+from django.utils import timezone
+from . import contests, problems
+from .models import Contest, Module, Question, Submission, TestCaseResult
+from .testdata import read_zip
+
+logger = logging.getLogger(__name__)
 
 # Default Test Case Values (for pre-filling)
 DEFAULT_TEST_CASE_INPUT = "Enter input here"
@@ -10,19 +25,48 @@ DEFAULT_TEST_CASE_OUTPUT = "Enter expected output here"
 # Custom Form for Individual Test Case
 class TestCaseForm(forms.Form):
     input = forms.CharField(
-        max_length=200,
         required=False,
         initial=DEFAULT_TEST_CASE_INPUT,
         widget=forms.Textarea(attrs={'rows': 2, 'cols': 40}),
         help_text="Enter the input for this test case (leave blank if no input is needed)."
     )
     expected_output = forms.CharField(
-        max_length=200,
-        required=True,
+        required=False,
         initial=DEFAULT_TEST_CASE_OUTPUT,
         widget=forms.Textarea(attrs={'rows': 2, 'cols': 40}),
         help_text="Enter the expected output for this test case."
     )
+    sample = forms.BooleanField(
+        required=False,
+        help_text="Public sample, run first under the 'samples first' judging policy."
+    )
+    weight = forms.IntegerField(
+        min_value=1,
+        required=False,
+        initial=1,
+        help_text="Relative weight of this test case."
+    )
+    # Digests of file-backed data (uploaded as a zip); carried through unchanged
+    input_file = forms.CharField(required=False, widget=forms.HiddenInput())
+    expected_output_file = forms.CharField(required=False, widget=forms.HiddenInput())
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('expected_output') and not cleaned_data.get('expected_output_file'):
+            self.add_error('expected_output', "This field is required.")
+        return cleaned_data
+
+class TestDataUploadForm(forms.Form):
+    archive = forms.FileField(
+        help_text="A zip of N.in / N.out pairs. Pairs named sample*.in / sample*.out are marked as samples. "
+                  "Replaces all existing test cases."
+    )
+
+class ProblemBankUploadForm(forms.Form):
+    archive = forms.FileField(
+        help_text="A zip of module directories, each holding problem directories with statement.md, "
+                  "an optional problem.json and tests/N.in / N.out pairs. Unchanged problems are skipped."
+    )
 
 # Create a Formset for Test Cases using formset_factory
 TestCaseFormSet = formset_factory(
@@ -39,7 +83,6 @@ class QuestionForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['test_cases'].widget = forms.HiddenInput()
         initial_test_cases = []
         if self.instance.pk:
             try:
@@ -57,27 +100,39 @@ class QuestionForm(forms.ModelForm):
         prefix = self.prefix + '-test_cases' if self.prefix else f"question_form-{self.instance.pk}-test_cases" if self.instance.pk else 'test_cases'
         self.test_case_formset = TestCaseFormSet(
             data=self.data if self.is_bound else None,
-            initial=[{'input': tc.get('input', DEFAULT_TEST_CASE_INPUT), 'expected_output': tc.get('expected_output', DEFAULT_TEST_CASE_OUTPUT)} for tc in initial_test_cases],
+            initial=[{'input': tc.get('input', DEFAULT_TEST_CASE_INPUT), 'expected_output': tc.get('expected_output', DEFAULT_TEST_CASE_OUTPUT), 'sample': tc.get('sample', False), 'weight': tc.get('weight', 1), 'input_file': tc.get('input_file', ''), 'expected_output_file': tc.get('expected_output_file', '')} for tc in initial_test_cases],
             prefix=prefix
         )
-        print(f"QuestionForm initialized with prefix: {prefix}, bound: {self.test_case_formset.is_bound}, instance pk: {self.instance.pk}")  # Debug
+        logger.debug(
+            "QuestionForm initialized with prefix %s, bound: %s, instance pk: %s",
+            prefix, self.test_case_formset.is_bound, self.instance.pk,
+        )
 
     def is_valid(self):
         is_valid = super().is_valid()
         formset_is_valid = self.test_case_formset.is_valid()
-        print(f"Form valid: {is_valid}, Formset valid: {formset_is_valid}, Formset errors: {self.test_case_formset.errors}")  # Debug
+        logger.debug(
+            "Form valid: %s, formset valid: %s, formset errors: %s",
+            is_valid, formset_is_valid, self.test_case_formset.errors,
+        )
         return is_valid and formset_is_valid
 
     def save(self, commit=True):
         instance = super().save(commit=False)
         if self.test_case_formset.is_valid():
             test_cases_data = [
-                {"input": form.cleaned_data.get('input', ''), "expected_output": form.cleaned_data['expected_output']}
+                {
+                    "input": form.cleaned_data.get('input', ''),
+                    "expected_output": form.cleaned_data.get('expected_output', ''),
+                    "sample": form.cleaned_data.get('sample', False),
+                    "weight": form.cleaned_data.get('weight') or 1,
+                    **{key: form.cleaned_data[key] for key in ('input_file', 'expected_output_file') if form.cleaned_data.get(key)},
+                }
                 for form in self.test_case_formset.forms
                 if form.cleaned_data and not form.cleaned_data.get('DELETE', False)
             ]
             instance.test_cases = test_cases_data
-            print(f"Saved test cases to database: {test_cases_data}")  # Debug
+            logger.debug("Saving %d test cases for question %s", len(test_cases_data), instance.pk)
         if commit:
             instance.save()
         return instance
@@ -90,7 +145,7 @@ class QuestionInline(admin.StackedInline):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        print(f"QuestionInline get_context_data called, context: {context.get('inline_admin_formset')}, forms count: {len(context['inline_admin_formset'].forms)}")  # Debug
+        logger.debug("QuestionInline context with %d forms", len(context['inline_admin_formset'].forms))
         return context
 
 # Custom Admin for Module with Question Inline
@@ -104,14 +159,14 @@ class ModuleAdmin(admin.ModelAdmin):
 
     def get_inline_instances(self, request, obj=None):
         inlines = super().get_inline_instances(request, obj)
-        print(f"ModuleAdmin get_inline_instances called, inlines: {[type(inline) for inline in inlines]}")  # Debug
+        logger.debug("ModuleAdmin inlines: %s", [type(inline).__name__ for inline in inlines])
         return inlines
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
-        print(f"ModuleAdmin change_view called with object_id: {object_id}")  # Debug
+        logger.debug("ModuleAdmin change_view for module %s", object_id)
         extra_context = extra_context or {}
         response = super().change_view(request, object_id, form_url, extra_context)
-        print(f"ModuleAdmin change_view context inline_admin_formsets: {len(extra_context.get('inline_admin_formsets', []))}")  # Debug
+        logger.debug("ModuleAdmin change_view with %d inline formsets", len(extra_context.get('inline_admin_formsets', [])))
         return response
 
 # Custom Admin for Question (standalone)
@@ -119,9 +174,11 @@ class ModuleAdmin(admin.ModelAdmin):
 class QuestionAdmin(admin.ModelAdmin):
     form = QuestionForm
     change_form_template = 'admin/codingapp/question/change_form.html'
-    list_display = ('title', 'module')
+    change_list_template = 'admin/codingapp/question/change_list.html'
+    list_display = ('title', 'module', 'judge_policy', 'checker')
     search_fields = ('title',)
-    list_filter = ('module',)
+    list_filter = ('module', 'judge_policy', 'checker')
+    actions = ['export_problems']
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
         extra_context = extra_context or {}
@@ -145,8 +202,171 @@ class QuestionAdmin(admin.ModelAdmin):
             extra_context['test_case_formset'] = form.test_case_formset
         return super().add_view(request, form_url, extra_context=extra_context)
 
+    def get_urls(self):
+        return [
+            path(
+                '<path:object_id>/upload-tests/',
+                self.admin_site.admin_view(self.upload_tests_view),
+                name='codingapp_question_upload_tests',
+            ),
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_problems_view),
+                name='codingapp_question_import_problems',
+            ),
+            path(
+                'judge-cost/',
+                self.admin_site.admin_view(self.judge_cost_view),
+                name='codingapp_question_judge_cost',
+            ),
+        ] + super().get_urls()
+
+    def upload_tests_view(self, request, object_id):
+        """Replace a question's test cases with the N.in / N.out pairs of a zip upload."""
+        question = self.get_object(request, object_id)
+        if question is None:
+            raise Http404("Question not found.")
+        if not self.has_change_permission(request, question):
+            raise PermissionDenied
+
+        if request.method == 'POST':
+            form = TestDataUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    count = question.replace_test_cases(read_zip(form.cleaned_data['archive']))
+                except (ValueError, zipfile.BadZipFile) as e:
+                    form.add_error('archive', str(e))
+                else:
+                    self.message_user(request, f"Imported {count} test cases.", messages.SUCCESS)
+                    return redirect(reverse('admin:codingapp_question_change', args=[question.pk]))
+        else:
+            form = TestDataUploadForm()
+        return render(request, 'admin/codingapp/question/upload_tests.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'original': question,
+            'title': f"Upload test cases for {question}",
+            'form': form,
+        })
+
+    def import_problems_view(self, request):
+        """Create or update questions from an uploaded problem bank zip (see ``problems.py``)."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+
+        if request.method == 'POST':
+            form = ProblemBankUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    result = problems.import_bank(form.cleaned_data['archive'])
+                except problems.ProblemBankError as e:
+                    for error in e.errors[:problems.MAX_ERRORS]:
+                        form.add_error('archive', error)
+                except (ValueError, zipfile.BadZipFile) as e:
+                    form.add_error('archive', str(e))
+                else:
+                    self.message_user(
+                        request,
+                        f"Imported {result.created} new and {result.updated} changed problems "
+                        f"({result.test_cases} test cases); {result.unchanged} unchanged.",
+                        messages.SUCCESS,
+                    )
+                    return redirect(reverse('admin:codingapp_question_changelist'))
+        else:
+            form = ProblemBankUploadForm()
+        return render(request, 'admin/codingapp/question/import_problems.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import problems",
+            'form': form,
+        })
+
+    @admin.action(description="Export selected questions as a problem bank zip")
+    def export_problems(self, request, queryset):
+        output = tempfile.TemporaryFile()  # Closed by the response
+        problems.export_bank(queryset, output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename="problems.zip")
+
+    def judge_cost_view(self, request):
+        """Questions and test cases ranked by the judge time their runs took."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = max(int(request.GET.get('days', 7)), 1)
+        except ValueError:
+            days = 7
+        runs = TestCaseResult.objects.filter(
+            cached=False, submission__submitted_at__gte=timezone.now() - timedelta(days=days)
+        )
+        cost = {
+            'runs': Count('id'),
+            'total_time': Sum('wall_time'),
+            'average_time': Avg('wall_time'),
+            'max_time': Max('wall_time'),
+            'cpu_time': Sum('cpu_time'),
+            'peak_memory_kb': Max('memory_kb'),
+            'output_bytes': Sum('output_bytes'),
+            'time_limit': Count('id', filter=Q(status=Submission.Status.TIME_LIMIT_EXCEEDED)),
+            'memory_limit': Count('id', filter=Q(status=Submission.Status.MEMORY_LIMIT_EXCEEDED)),
+        }
+        questions = (
+            runs.values('submission__question_id', 'submission__question__title')
+            .annotate(**cost)
+            .order_by('-total_time')[:50]
+        )
+        test_cases = (
+            runs.filter(test_case__isnull=False)
+            .values('test_case_id', 'test_case__position', 'test_case__question_id', 'test_case__question__title')
+            .annotate(**cost)
+            .order_by('-total_time')[:50]
+        )
+        return render(request, 'admin/codingapp/question/judge_cost.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"Judge cost, last {days} days",
+            'days': days,
+            'questions': questions,
+            'test_cases': test_cases,
+        })
+
+class TestCaseResultInline(admin.TabularInline):
+    model = TestCaseResult
+    fields = ('position', 'test_case', 'status', 'wall_time', 'cpu_time', 'memory_kb', 'exit_code', 'signal',
+              'output_bytes', 'cached')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ('user', 'question', 'status', 'submitted_at')
     search_fields = ('user__username', 'question__title')
-    list_filter = ('status', 'language', 'submitted_at')
\ No newline at end of file
+    list_filter = ('status', 'language', 'submitted_at')
+    inlines = [TestCaseResultInline]
+
+
+@admin.register(Contest)
+class ContestAdmin(admin.ModelAdmin):
+    list_display = ('title', 'start_at', 'end_at', 'freeze_at', 'unfrozen')
+    list_filter = ('unfrozen',)
+    search_fields = ('title',)
+    filter_horizontal = ('questions',)
+    actions = ['recount_results']
+
+    # Changing these changes which attempts count and how
+    RECOUNT_FIELDS = {'questions', 'start_at', 'end_at', 'freeze_at', 'compile_error_penalty'}
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change and self.RECOUNT_FIELDS.intersection(form.changed_data):
+            contests.rebuild(form.instance)
+
+    @admin.action(description="Recount results from the submissions")
+    def recount_results(self, request, queryset):
+        for contest in queryset:
+            count = contests.rebuild(contest)
+            self.message_user(request, f"{contest}: {count} results recounted.", messages.SUCCESS)
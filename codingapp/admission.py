@@ -0,0 +1,123 @@
+"""Admission control for judge submissions.
+
+Before a submission is accepted it has to pass, in order:
+
+* load shedding: with background judging, the judge queue must be shorter
+  than ``JUDGE_MAX_QUEUE``; with judging inside the request, the process must
+  have fewer than ``JUDGE_MAX_IN_FLIGHT`` submissions being judged;
+* rate limits: token buckets per user, per client IP and for the whole site
+  (``RATELIMIT_USER``, ``RATELIMIT_IP``, ``RATELIMIT_GLOBAL``).
+
+``aadmit`` makes the same checks for async views.
+
+A submission that fails either is turned away at once with a "retry in N s"
+message instead of tying up a request worker or the executor quota.
+"""
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import ratelimit
+from .judge_queue import queue_depth
+
+_in_flight = None
+_lock = threading.Lock()
+
+
+class JudgeBusy(Exception):
+    """A submission was turned away; ``retry_after`` is in whole seconds."""
+
+    def __init__(self, message, retry_after, status):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+def client_ip(request):
+    """The client address, taken from ``X-Forwarded-For`` behind ``RATELIMIT_PROXY_COUNT`` proxies."""
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        # Each trusted proxy appended one address; anything further left is client-supplied
+        return hops[-proxies] if len(hops) >= proxies else hops[0]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def submission_buckets(request):
+    return [
+        ratelimit.Bucket.from_rate(f"rl:user:{request.user.pk}", settings.RATELIMIT_USER),
+        ratelimit.Bucket.from_rate(f"rl:ip:{client_ip(request)}", settings.RATELIMIT_IP),
+        ratelimit.Bucket.from_rate("rl:global", settings.RATELIMIT_GLOBAL),
+    ]
+
+
+def check_rate_limits(request):
+    """Take a submission token for ``request`` or raise ``JudgeBusy`` (HTTP 429)."""
+    if not settings.RATELIMIT_ENABLED:
+        return
+    wait = ratelimit.take(submission_buckets(request))
+    if wait:
+        retry_after = ratelimit.retry_seconds(wait)
+        raise JudgeBusy(f"Too many submissions, please retry in {retry_after} s.", retry_after, 429)
+
+
+def check_queue():
+    """Raise ``JudgeBusy`` (HTTP 503) while the background judge queue is full."""
+    if queue_depth() >= settings.JUDGE_MAX_QUEUE:
+        retry_after = settings.JUDGE_BUSY_RETRY_AFTER
+        raise JudgeBusy(f"The judge is busy, please retry in {retry_after} s.", retry_after, 503)
+
+
+def _slots():
+    global _in_flight
+    if _in_flight is None:
+        with _lock:
+            if _in_flight is None:
+                _in_flight = threading.BoundedSemaphore(settings.JUDGE_MAX_IN_FLIGHT)
+    return _in_flight
+
+
+@contextmanager
+def judge_slot():
+    """Hold one of this process's ``JUDGE_MAX_IN_FLIGHT`` judging slots, or raise ``JudgeBusy`` (HTTP 503)."""
+    slots = _slots()
+    if not slots.acquire(blocking=False):
+        retry_after = settings.JUDGE_BUSY_RETRY_AFTER
+        raise JudgeBusy(f"The judge is busy, please retry in {retry_after} s.", retry_after, 503)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+@contextmanager
+def admit(request):
+    """Admit one submission of ``request`` for judging inside the ``with`` block.
+
+    Raises ``JudgeBusy`` when the judge is overloaded or the request is over
+    a rate limit. Load is checked first, so a shed request costs no tokens.
+    """
+    if settings.JUDGE_ASYNC:
+        check_queue()
+        check_rate_limits(request)
+        yield
+    else:
+        with judge_slot():
+            check_rate_limits(request)
+            yield
+
+
+@asynccontextmanager
+async def aadmit(request):
+    """``admit`` for async views: the queue and rate limit checks run on a thread."""
+    if settings.JUDGE_ASYNC:
+        await sync_to_async(check_queue)()
+        await sync_to_async(check_rate_limits)(request)
+        yield
+    else:
+        with judge_slot():  # Never blocks, so safe to take on the event loop
+            await sync_to_async(check_rate_limits)(request)
+            yield
@@ -4,3 +4,23 @@ from django.apps import AppConfig
 class CodingappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'codingapp'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+
+        from .catalog import bump_generation
+        from .contests import questions_changed
+        from .models import Contest, Module, Question
+        from .tracing import install_query_timer
+
+        # Any change to a module or question invalidates the cached catalog pages
+        for model in (Module, Question):
+            post_save.connect(bump_generation, sender=model, dispatch_uid=f"catalog-save-{model.__name__}")
+            post_delete.connect(bump_generation, sender=model, dispatch_uid=f"catalog-delete-{model.__name__}")
+
+        # A new question set changes the scoreboards
+        m2m_changed.connect(questions_changed, sender=Contest.questions.through, dispatch_uid="contest-questions")
+
+        # Time every query of a traced request (see tracing.py)
+        connection_created.connect(install_query_timer, dispatch_uid="tracing-query-timer")
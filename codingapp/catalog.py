@@ -0,0 +1,141 @@
+"""Caching for the read-mostly catalog pages: the module and question lists.
+
+Everything cached for the catalog is keyed by the catalog *generation*, a
+number kept in the ``CATALOG_CACHE_ALIAS`` cache (Redis when ``REDIS_URL`` is
+set) that ``bump_generation`` moves forward whenever a ``Module`` or
+``Question`` is saved or deleted. Entries of older generations are never read
+again and simply expire, so nothing has to be deleted on a change.
+
+The generation is the time of the last change in milliseconds, which also
+makes it the pages' ``Last-Modified`` and part of their ``ETag``. Rendered
+fragments and looked-up objects live in the per-process default cache.
+
+Without Redis the generation cache is per process too, so a change only
+bumps the generation of the process that saved it. There the generation
+expires after ``CATALOG_CACHE_TIMEOUT`` like the fragments, and every other
+process starts a new one: its pages, and its 304 answers, are at most that
+stale.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+GENERATION_KEY = "catalog:generation"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _generation_timeout(shared):
+    """Forever in a cache every process reads; else only as long as the fragments, so other processes catch up."""
+    return settings.CATALOG_CACHE_TIMEOUT if isinstance(shared, LocMemCache) else None
+
+
+def generation():
+    """The current catalog generation."""
+    shared = caches[settings.CATALOG_CACHE_ALIAS]
+    value = shared.get(GENERATION_KEY)
+    if value is None:  # first use, expired or evicted: any cached entries are now unreachable
+        value = _now_ms()
+        if not shared.add(GENERATION_KEY, value, _generation_timeout(shared)):
+            value = shared.get(GENERATION_KEY, value)
+    return value
+
+
+def bump_generation(**kwargs):
+    """Start a new catalog generation; connected to ``post_save``/``post_delete`` of ``Module`` and ``Question``.
+
+    Bulk operations (``bulk_create``, ``update``) send no signals and must call
+    this themselves.
+    """
+    shared = caches[settings.CATALOG_CACHE_ALIAS]
+    value = max(_now_ms(), (shared.get(GENERATION_KEY) or 0) + 1)
+    shared.set(GENERATION_KEY, value, _generation_timeout(shared))
+
+
+def _request_generation(request):
+    # Read once per request: the ETag, Last-Modified and fragments must agree
+    if not hasattr(request, "_catalog_generation"):
+        request._catalog_generation = generation()
+    return request._catalog_generation
+
+
+def _session_digest(request):
+    """Identifies the visitor's user and CSRF secret, the only per-visitor parts of catalog pages."""
+    secret = request.META.get("CSRF_COOKIE", "")
+    return hashlib.blake2b(f"{request.user.pk}:{secret}".encode(), digest_size=8).hexdigest()
+
+
+def version(request):
+    """The key under which this request may share cached catalog fragments.
+
+    Staff fragments contain edit forms with CSRF tokens, so they are only
+    shared within one staff session.
+    """
+    current = _request_generation(request)
+    if request.user.is_staff:
+        return f"{current}-{_session_digest(request)}"
+    return str(current)
+
+
+def context(request):
+    """Template context for ``{% cache catalog_timeout <name> catalog_version %}`` blocks."""
+    if not settings.CATALOG_CACHE_ENABLED:
+        return {"catalog_timeout": 0, "catalog_version": ""}
+    return {"catalog_timeout": settings.CATALOG_CACHE_TIMEOUT, "catalog_version": version(request)}
+
+
+def cached(request, name, compute):
+    """``compute()``, cached for the current catalog generation under ``name``."""
+    if not settings.CATALOG_CACHE_ENABLED:
+        return compute()
+    key = f"catalog:{_request_generation(request)}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+class CatalogPaginator(Paginator):
+    """A paginator over a catalog queryset whose ``COUNT`` is cached with the catalog."""
+
+    def __init__(self, request, name, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.request = request
+        self.name = name
+
+    @cached_property
+    def count(self):
+        return cached(self.request, f"{self.name}:count", self.object_list.count)
+
+
+def _etag(request, *args, **kwargs):
+    if not settings.CATALOG_CACHE_ENABLED:
+        return None
+    return f"{_request_generation(request)}-{_session_digest(request)}"
+
+
+def _last_modified(request, *args, **kwargs):
+    if not settings.CATALOG_CACHE_ENABLED:
+        return None
+    return datetime.fromtimestamp(_request_generation(request) / 1000, tz=timezone.utc)
+
+
+def catalog_page(view):
+    """Answer repeat visits to a catalog page with 304 Not Modified until the catalog changes.
+
+    The ETag also covers the visitor's user and CSRF secret, which the page
+    embeds; browsers are told to revalidate on every visit.
+    """
+    view = condition(etag_func=_etag, last_modified_func=_last_modified)(view)
+    return cache_control(private=True, no_cache=True)(view)
@@ -0,0 +1,332 @@
+"""Output checkers: decide whether a program's output answers a test case.
+
+Each ``Question`` picks a checker (``Question.Checker``). The built-in ones
+read both outputs as streams of byte chunks and tokenize them incrementally,
+so they stop at the first difference and use constant memory however large
+the outputs are. A custom checker is a program supplied with the question,
+run in the sandbox like a submission.
+
+A checker's ``check(test, actual)`` returns ``(accepted, message)``; the
+``actual`` output is a ``Source`` over the program's stdout string or file.
+"""
+import hashlib
+import math
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+from .executors import get_executor
+from .testdata import blob_path, files_match
+
+CHUNK_SIZE = 64 * 1024
+
+
+class CheckerError(Exception):
+    """The checker itself failed, so the test case has no verdict."""
+
+
+class Source:
+    """Output held either in memory (``text``) or in a file (``path``)."""
+
+    def __init__(self, text=None, path=None):
+        self.text = text
+        self.path = path
+
+    @classmethod
+    def expected(cls, test):
+        digest = test.get("expected_output_file")
+        if digest:
+            return cls(path=blob_path(digest))
+        return cls(text=test.get("expected_output", ""))
+
+    def chunks(self):
+        """Yield the output as bytes, at most ``CHUNK_SIZE`` at a time."""
+        if self.path is None:
+            data = self.text.encode("utf-8")
+            for start in range(0, len(data), CHUNK_SIZE):
+                yield data[start:start + CHUNK_SIZE]
+            return
+        with open(self.path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+
+
+def iter_token_batches(chunks):
+    """Yield lists of whitespace-separated tokens from byte chunks, one list per chunk.
+
+    A token split across two chunks is joined and reported with the later one.
+    """
+    carry = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts = chunk.split()
+        if carry:
+            if parts and not chunk[:1].isspace():
+                parts[0] = carry + parts[0]
+            else:
+                parts.insert(0, carry)
+            carry = b""
+        if parts and not chunk[-1:].isspace():
+            carry = parts.pop()
+        if parts:
+            yield parts
+    if carry:
+        yield [carry]
+
+
+def iter_line_batches(chunks):
+    """Yield lists of lines (without the ``\\n``) from byte chunks, one list per chunk."""
+    carry = b""
+    for chunk in chunks:
+        lines = chunk.split(b"\n")
+        lines[0] = carry + lines[0]
+        carry = lines.pop()
+        if lines:
+            yield lines
+    if carry:
+        yield [carry]
+
+
+def _line_digest(line):
+    return hashlib.blake2b(b" ".join(line.split()), digest_size=16).digest()
+
+
+def _strip_surrounding_whitespace(chunks):
+    """Yield the bytes of ``chunks`` without leading and trailing whitespace."""
+    started = False
+    pending = b""  # whitespace that only counts if more output follows
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if body:
+            yield pending + body
+            pending = chunk[len(body):]
+        else:
+            pending += chunk
+
+
+def _next_nonempty(chunks):
+    for chunk in chunks:
+        if chunk:
+            return chunk
+    return None
+
+
+def streams_equal(left, right):
+    """Compare two byte chunk iterables whose chunk boundaries may differ."""
+    left, right = iter(left), iter(right)
+    a = b = b""
+    while True:
+        a = a or _next_nonempty(left)
+        b = b or _next_nonempty(right)
+        if a is None or b is None:
+            return a is None and b is None
+        n = min(len(a), len(b))
+        if a[:n] != b[:n]:
+            return False
+        a, b = a[n:], b[n:]
+
+
+def _first_difference(actual_batches, expected_batches, same):
+    """Compare token batch streams; return ``None`` if they match or a message for the first mismatch.
+
+    Aligned runs of tokens are compared as lists first, so ``same`` is only
+    called token by token where the bytes differ.
+    """
+    position = 0
+    got = want = []
+    while True:
+        if not got:
+            got = next(actual_batches, None)
+        if not want:
+            want = next(expected_batches, None)
+        if got is None or want is None:
+            break
+        n = min(len(got), len(want))
+        if got[:n] != want[:n]:
+            for a, b in zip(got[:n], want[:n]):
+                position += 1
+                if not same(a, b):
+                    return f"Token {position} differs: expected {_show(b)}, got {_show(a)}"
+        else:
+            position += n
+        got, want = got[n:], want[n:]
+    if want is not None:
+        return f"Output ended after {position} tokens, expected {_show(want[0])} next"
+    if got is not None:
+        return f"Extra output after {position} tokens: {_show(got[0])}"
+    return None
+
+
+def _show(token, limit=40):
+    text = token.decode("utf-8", errors="replace")
+    return repr(text if len(text) <= limit else text[:limit] + "…")
+
+
+class Checker:
+    name = None
+
+    def cache_key(self):
+        """Identifies the checker configuration in result cache keys."""
+        return self.name
+
+    def check(self, test, actual):
+        raise NotImplementedError
+
+
+class ExactChecker(Checker):
+    """Byte-for-byte equality, ignoring whitespace at the start and end of the output."""
+    name = "exact"
+
+    def check(self, test, actual):
+        expected = Source.expected(test)
+        if actual.path and expected.path:
+            matched = files_match(actual.path, expected.path)
+        else:
+            matched = streams_equal(
+                _strip_surrounding_whitespace(actual.chunks()),
+                _strip_surrounding_whitespace(expected.chunks()),
+            )
+        return matched, ""
+
+
+class TokenChecker(Checker):
+    """Same whitespace-separated tokens; spacing and blank lines do not matter."""
+    name = "tokens"
+
+    def same(self, got, want):
+        return got == want
+
+    def check(self, test, actual):
+        mismatch = _first_difference(
+            iter_token_batches(actual.chunks()), iter_token_batches(Source.expected(test).chunks()), self.same,
+        )
+        return mismatch is None, mismatch or ""
+
+
+class FloatChecker(TokenChecker):
+    """Tokens, where numbers match within an absolute or relative tolerance."""
+    name = "float"
+
+    def __init__(self, abs_tolerance, rel_tolerance):
+        self.abs_tolerance = abs_tolerance
+        self.rel_tolerance = rel_tolerance
+
+    def cache_key(self):
+        return f"{self.name}:{self.abs_tolerance!r}:{self.rel_tolerance!r}"
+
+    def same(self, got, want):
+        if got == want:
+            return True
+        try:
+            a, b = float(got), float(want)
+        except ValueError:
+            return False
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        return abs(a - b) <= self.abs_tolerance or abs(a - b) <= self.rel_tolerance * abs(b)
+
+
+class UnorderedLinesChecker(Checker):
+    """Same lines in any order; each line is compared token-wise and blank lines are ignored.
+
+    Lines are counted by digest, so memory grows with the number of distinct
+    lines rather than with the size of the output.
+    """
+    name = "unordered_lines"
+
+    def _line_counts(self, source):
+        counts = Counter()
+        for lines in iter_line_batches(source.chunks()):
+            counts.update(map(_line_digest, filter(bytes.strip, lines)))
+        return counts
+
+    def check(self, test, actual):
+        expected = self._line_counts(Source.expected(test))
+        got = self._line_counts(actual)
+        if got == expected:
+            return True, ""
+        missing = sum((expected - got).values())
+        extra = sum((got - expected).values())
+        return False, f"{missing} expected lines missing, {extra} unexpected lines"
+
+
+class CustomChecker(Checker):
+    """A checker program supplied with the question, run in the sandbox.
+
+    The checker's stdin holds three sections, each a line with its length in
+    bytes followed by that many bytes: the test input, the expected output
+    and the program's output. Exit code 0 accepts, 1 rejects (stdout is shown
+    as the reason). Any other exit, or output on stderr (a crashed Python
+    checker also exits with 1), is a checker failure.
+    """
+    name = "custom"
+
+    def __init__(self, code, language, executor):
+        self.code = code
+        self.language = language
+        self.executor = executor
+        self._program = None
+
+    def cache_key(self):
+        digest = hashlib.sha256(f"{self.language}\0{self.code}".encode("utf-8")).hexdigest()
+        return f"{self.name}:{digest}"
+
+    def program(self):
+        if self._program is None:
+            self._program = self.executor.prepare(self.code, self.language)
+            if self._program.compile_error is not None:
+                raise CheckerError(f"Checker does not compile: {self._program.compile_error.strip()}")
+        return self._program
+
+    def _write_section(self, out, source):
+        size = os.path.getsize(source.path) if source.path else len(source.text.encode("utf-8"))
+        out.write(f"{size}\n".encode())
+        for chunk in source.chunks():
+            out.write(chunk)
+
+    def check(self, test, actual):
+        program = self.program()
+        test_input = Source(path=blob_path(test["input_file"])) if test.get("input_file") else Source(text=test.get("input", ""))
+        fd, stdin_path = tempfile.mkstemp(prefix="checker-", dir=settings.JUDGE_SANDBOX_ROOT)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for source in (test_input, Source.expected(test), actual):
+                    self._write_section(out, source)
+            run = self.executor.run_program(program, Path(stdin_path))
+        finally:
+            os.remove(stdin_path)
+        message = (run.get("stdout") or "").strip()
+        stderr = (run.get("stderr") or "").strip()
+        if run.get("code") == 0 and not stderr:
+            return True, message
+        if run.get("code") == 1 and not stderr:
+            return False, message or "Rejected by checker"
+        raise CheckerError(f"Checker failed ({run.get('signal') or run.get('code')}): {stderr}")
+
+
+def get_checker(question=None, executor=None):
+    """Return the checker configured on ``question`` (exact matching without one).
+
+    A custom checker runs on ``executor``, the configured executor by default.
+    """
+    if question is None:
+        return ExactChecker()
+    kind = question.checker
+    if kind == "tokens":
+        return TokenChecker()
+    if kind == "float":
+        return FloatChecker(question.float_abs_tolerance, question.float_rel_tolerance)
+    if kind == "unordered_lines":
+        return UnorderedLinesChecker()
+    if kind == "custom":
+        return CustomChecker(question.checker_code, question.checker_language, executor or get_executor())
+    return ExactChecker()
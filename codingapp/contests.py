@@ -0,0 +1,330 @@
+"""Contests: ICPC-style results and the live scoreboard.
+
+A participant's result on a contest question is one ``ContestResult`` row,
+recounted from their submissions to it during the contest whenever one of
+them gets its first verdict (``record_submission``, called by
+``judge.record_verdict`` inside the verdict's transaction). Verdicts may
+arrive in any order; attempts are placed by submission time. The same
+transaction bumps ``Contest.revision``, so the revision and the contest's
+``updated_at`` together version its scoreboards.
+
+Ranking: most questions solved, then least penalty, then earliest last
+solve. A solve's penalty is the whole minutes from the contest start to it,
+plus ``penalty_minutes`` for each failed attempt before it. From
+``freeze_at`` on, the public scoreboard shows attempts made after the freeze
+only as pending, until the contest is unfrozen; staff see the full board.
+
+Each process looks at a scoreboard at most once per
+``CONTEST_SCOREBOARD_TICK`` seconds per contest and view, whatever the
+number of viewers: it reads the version and, only if that moved or the
+contest started, froze or ended since, takes the snapshot another process
+left in the ``CONTEST_CACHE_ALIAS`` cache or builds a new one from the result
+rows. A snapshot carries its Server-Sent Events frame already encoded.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+import weakref
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Contest, ContestResult, Submission
+from .stats import WRONG_STATUSES, counted
+
+Status = Submission.Status
+PUBLIC, STAFF = "public", "staff"
+HEARTBEAT = b": keep-alive\n\n"
+SNAPSHOT_TIMEOUT = 24 * 60 * 60  # Seconds a shared snapshot is kept; staleness is checked separately
+REBUILD_LOCK_TIMEOUT = 30  # Seconds, in case a process dies while rebuilding
+
+
+def version(contest_id):
+    """The current version of a contest's scoreboards, or None if it no longer exists."""
+    return Contest.objects.filter(pk=contest_id).values_list("revision", "updated_at").first()
+
+
+def bump_revision(contest_id):
+    Contest.objects.filter(pk=contest_id).update(revision=F("revision") + 1)
+
+
+def questions_changed(instance=None, action="", reverse=False, pk_set=None, **kwargs):
+    """Connected to ``m2m_changed`` of ``Contest.questions``."""
+    if action.startswith("post_"):
+        for contest_id in (pk_set or ()) if reverse else [instance.pk]:
+            bump_revision(contest_id)
+
+
+def _tally(contest, attempts):
+    """``ContestResult`` fields for ``(status, submitted_at)`` attempts in submission order."""
+    fields = {"wrong_attempts": 0, "wrong_before_freeze": 0, "frozen_attempts": 0, "solved_at": None}
+    for status, submitted_at in attempts:
+        accepted = status == Status.ACCEPTED
+        if not accepted and status not in WRONG_STATUSES:
+            if status != Status.COMPILE_ERROR or not contest.compile_error_penalty:
+                continue
+        frozen = contest.freeze_at is not None and submitted_at >= contest.freeze_at
+        fields["frozen_attempts"] += frozen
+        if accepted:
+            fields["solved_at"] = submitted_at
+            break
+        fields["wrong_attempts"] += 1
+        fields["wrong_before_freeze"] += not frozen
+    return fields
+
+
+def _in_window(contest, queryset):
+    return queryset.filter(submitted_at__gte=contest.start_at, submitted_at__lt=contest.end_at)
+
+
+def record_submission(submission):
+    """Recount the submitter's results in running contests on the question; call inside the verdict's transaction."""
+    contests = Contest.objects.filter(
+        questions=submission.question_id,
+        start_at__lte=submission.submitted_at,
+        end_at__gt=submission.submitted_at,
+    )
+    for contest in contests:
+        attempts = _in_window(contest, counted()).filter(
+            user_id=submission.user_id, question_id=submission.question_id,
+        ).order_by("submitted_at", "id").values_list("status", "submitted_at")
+        ContestResult.objects.update_or_create(
+            contest=contest, user_id=submission.user_id, question_id=submission.question_id,
+            defaults=_tally(contest, attempts),
+        )
+        bump_revision(contest.pk)
+
+
+def rebuild(contest):
+    """Recount every result of a contest from the submission history, e.g. after its times changed."""
+    rows = (
+        _in_window(contest, counted())
+        .filter(question__in=contest.questions.all())
+        .order_by("user_id", "question_id", "submitted_at", "id")
+        .values_list("user_id", "question_id", "status", "submitted_at")
+        .iterator(chunk_size=2000)
+    )
+    results = [
+        ContestResult(contest=contest, user_id=user_id, question_id=question_id,
+                      **_tally(contest, ((status, at) for _, _, status, at in group)))
+        for (user_id, question_id), group in itertools.groupby(rows, key=lambda row: (row[0], row[1]))
+    ]
+    with transaction.atomic():
+        contest.results.all().delete()
+        ContestResult.objects.bulk_create(results, batch_size=1000)
+        bump_revision(contest.pk)
+    return len(results)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A scoreboard as built at one moment; ``frame`` is its ``scoreboard`` event."""
+    version: tuple
+    changes_at: float | None  # Epoch seconds of the next start, freeze or end, which changes the board by itself
+    data: dict
+    frame: bytes
+
+    @property
+    def event_id(self):
+        return self.data["id"]
+
+
+def board_view(user):
+    return STAFF if user.is_staff else PUBLIC
+
+
+def _status(contest, now):
+    if now < contest.start_at:
+        return "upcoming"
+    return "finished" if now >= contest.end_at else "running"
+
+
+def build_snapshot(contest_id, view, current_version):
+    """The scoreboard of a contest for ``view`` (``PUBLIC`` or ``STAFF``), read from its result rows.
+
+    Rows are ``[rank, username, solved, penalty, cells]`` with a cell per
+    problem: ``null``, ``["solved", attempts, minutes]``, ``["failed",
+    attempts]`` or ``["pending", attempts before the freeze, attempts after]``.
+    Arrays rather than objects keep the event a few times smaller, and it is
+    sent to every viewer.
+    """
+    contest = Contest.objects.get(pk=contest_id)
+    now = timezone.now()
+    hide = view == PUBLIC and contest.is_frozen(now)
+    problems = list(contest.questions.order_by("pk").values_list("pk", "title"))
+    column = {pk: index for index, (pk, _) in enumerate(problems)}
+    rows = {}
+    results = contest.results.order_by().values_list(
+        "user_id", "user__username", "question_id",
+        "wrong_attempts", "wrong_before_freeze", "frozen_attempts", "solved_at",
+    )
+    for user_id, username, question_id, wrong, wrong_before_freeze, frozen, solved_at in results:
+        if question_id not in column:  # removed from the contest
+            continue
+        row = rows.setdefault(user_id, {
+            "user": username, "solved": 0, "penalty": 0, "last": 0, "cells": [None] * len(problems),
+        })
+        if solved_at and not (hide and solved_at >= contest.freeze_at):
+            minutes = int((solved_at - contest.start_at).total_seconds()) // 60
+            row["solved"] += 1
+            row["penalty"] += minutes + wrong * contest.penalty_minutes
+            row["last"] = max(row["last"], minutes)
+            cell = ["solved", wrong + 1, minutes]
+        elif hide and frozen:
+            cell = ["pending", wrong_before_freeze, frozen]
+        elif wrong:
+            cell = ["failed", wrong_before_freeze if hide else wrong]
+        else:
+            continue
+        row["cells"][column[question_id]] = cell
+
+    ranked = []
+    previous, rank = None, 0
+    for position, row in enumerate(
+        sorted(rows.values(), key=lambda row: (-row["solved"], row["penalty"], row["last"], row["user"])), 1
+    ):
+        key = (row["solved"], row["penalty"], row["last"])
+        rank = rank if key == previous else position
+        previous = key
+        ranked.append([rank, row["user"], row["solved"], row["penalty"], row["cells"]])
+
+    revision, updated_at = current_version
+    status = _status(contest, now)
+    data = {
+        # The same on every process; the status and freeze change the board without a new version
+        "id": f"{revision}.{int(updated_at.timestamp() * 1000)}.{status}{'.frozen' if hide else ''}",
+        "contest": contest.pk,
+        "status": status,
+        "frozen": hide,
+        "generated_at": now.isoformat(),
+        "problems": [
+            {"label": _label(index), "question": pk, "title": title} for index, (pk, title) in enumerate(problems)
+        ],
+        "rows": ranked,
+    }
+    encoded = json.dumps(data, separators=(",", ":"))
+    upcoming = [moment for moment in (contest.start_at, contest.freeze_at, contest.end_at) if moment and moment > now]
+    return Snapshot(
+        version=current_version,
+        changes_at=min(upcoming).timestamp() if upcoming else None,
+        data=data,
+        frame=f"id: {data['id']}\nevent: scoreboard\ndata: {encoded}\n\n".encode(),
+    )
+
+
+def _label(index):
+    """Problem letters: A..Z, then AA, AB, ..."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _stale(snapshot, current_version):
+    if snapshot.changes_at is not None and time.time() >= snapshot.changes_at:
+        return True
+    return snapshot.version != current_version
+
+
+def _shared_snapshot(contest_id, view, current_version):
+    shared = caches[settings.CONTEST_CACHE_ALIAS]
+    key = f"contest:{contest_id}:scoreboard:{view}"
+    snapshot = shared.get(key)
+    if snapshot is not None:
+        if not _stale(snapshot, current_version):
+            return snapshot
+        # Somebody else is rebuilding it: the old one is at most a tick late
+        if not shared.add(f"{key}:lock", 1, REBUILD_LOCK_TIMEOUT):
+            return snapshot
+    try:
+        snapshot = build_snapshot(contest_id, view, current_version)
+        shared.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    finally:
+        shared.delete(f"{key}:lock")
+    return snapshot
+
+
+# (contest id, view) -> (time.monotonic() when fetched, snapshot)
+_local = {}
+# Event loop -> (contest id, view) -> lock held while fetching
+_fetching = weakref.WeakKeyDictionary()
+
+
+def _local_snapshot(key):
+    hit = _local.get(key)
+    if hit and time.monotonic() - hit[0] < settings.CONTEST_SCOREBOARD_TICK:
+        return hit[1]
+    return None
+
+
+def scoreboard(contest_id, view):
+    """The current scoreboard snapshot of a contest for ``view``; raises ``Contest.DoesNotExist``."""
+    key = (contest_id, view)
+    snapshot = _local_snapshot(key)
+    if snapshot is None:
+        current_version = version(contest_id)
+        if current_version is None:
+            raise Contest.DoesNotExist
+        hit = _local.get(key)
+        if hit and not _stale(hit[1], current_version):
+            snapshot = hit[1]
+        else:
+            snapshot = _shared_snapshot(contest_id, view, current_version)
+        _local[key] = (time.monotonic(), snapshot)
+    return snapshot
+
+
+async def ascoreboard(contest_id, view):
+    """``scoreboard`` for async code; concurrent callers in a process share one fetch."""
+    key = (contest_id, view)
+    snapshot = _local_snapshot(key)
+    if snapshot is None:
+        locks = _fetching.setdefault(asyncio.get_running_loop(), {})
+        lock = locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            snapshot = _local_snapshot(key) or await sync_to_async(scoreboard)(contest_id, view)
+    return snapshot
+
+
+def retry_frame():
+    """Tells EventSource clients to reconnect a tick after a stream ends."""
+    return f"retry: {int(settings.CONTEST_SCOREBOARD_TICK * 1000)}\n\n".encode()
+
+
+async def stream(contest_id, view, last_event_id=None):
+    """Server-Sent Events for a scoreboard: each new snapshot once, and a heartbeat while nothing changes.
+
+    The stream ends after about ``CONTEST_STREAM_SECONDS`` (jittered, so
+    viewers that came together don't all reconnect together) and the client
+    reconnects with ``Last-Event-ID``, which spares it an unchanged board.
+    """
+    tick = settings.CONTEST_SCOREBOARD_TICK
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.CONTEST_STREAM_SECONDS * random.uniform(0.75, 1)
+    quiet = 0
+    yield retry_frame()
+    while True:
+        try:
+            snapshot = await ascoreboard(contest_id, view)
+        except Contest.DoesNotExist:
+            return
+        if snapshot.event_id != last_event_id:
+            last_event_id = snapshot.event_id
+            yield snapshot.frame
+            quiet = 0
+        elif quiet >= settings.CONTEST_HEARTBEAT:
+            yield HEARTBEAT
+            quiet = 0
+        if loop.time() >= deadline:
+            return
+        await asyncio.sleep(tick)
+        quiet += tick
@@ -0,0 +1,865 @@
+"""Execution backends that run submitted code against a single stdin.
+
+``settings.JUDGE_EXECUTOR`` picks the backend for a deployment: ``"piston"``
+sends code to the Piston API, ``"local"`` runs it in a resource-limited
+subprocess on this machine. A dotted path to a ``BaseExecutor`` subclass also
+works.
+
+Every backend returns a dict shaped like Piston's ``run`` stage:
+``{"stdout": str, "stderr": str, "code": int | None, "signal": str | None}``.
+A run that failed to compile also carries ``"compile_error": True``. Where
+the backend measures them, runs also report resource use: ``wall_time`` and
+``cpu_time`` in seconds, peak ``memory_kb``, ``output_bytes`` written, and
+``limit_exceeded`` (``"time"`` or ``"memory"``) when the program was stopped
+by a limit.
+
+To judge many test cases, ``prepare`` a ``Program`` once and pass it to
+``run_program`` for every stdin: compiled languages are built only once.
+Executors with ``supports_batch`` also take all stdins in one
+``run_batch`` call and run them inside a single sandbox session.
+
+Async callers (the async views) use ``aprepare`` and ``arun_program``: the
+Piston backend awaits its HTTP calls, others run on a worker thread.
+
+A stdin is a string or an ``os.PathLike`` pointing at a file to feed the
+program. With ``stdout_path`` the complete output is also written to that
+file (capped at ``JUDGE_FILE_OUTPUT_LIMIT_MB``) so large outputs can be
+compared without loading them.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from . import sandbox_pool
+from .resilience import CircuitBreaker, CircuitOpen, LatencyTracker, backoff_delay
+from .sandbox_pool import SandboxError
+
+logger = logging.getLogger(__name__)
+
+class ExecutorError(Exception):
+    """The execution backend failed, as opposed to the submitted program."""
+
+
+# What runtimes print when an allocation fails under the memory limit
+OUT_OF_MEMORY_MARKERS = (
+    "MemoryError",
+    "std::bad_alloc",
+    "java.lang.OutOfMemoryError",
+    "JavaScript heap out of memory",
+)
+
+
+def ran_out_of_memory(run):
+    """True if a failed run's stderr shows it died for lack of memory."""
+    if run.get("code") == 0 and not run.get("signal"):
+        return False
+    stderr = run.get("stderr") or ""
+    return any(marker in stderr for marker in OUT_OF_MEMORY_MARKERS)
+
+
+class Program:
+    """Submitted code made ready to run against many inputs.
+
+    ``compile_error`` holds the compiler output when the code did not build.
+    """
+
+    def __init__(self, code, language, compile_error=None, artifact_dir=None, values=None):
+        self.code = code
+        self.language = language
+        self.compile_error = compile_error
+        self.artifact_dir = artifact_dir
+        self.values = values or {}
+
+
+def read_stdin(stdin):
+    """Return ``stdin`` as a string, reading it from disk if it is a path."""
+    if isinstance(stdin, os.PathLike):
+        with open(stdin, encoding="utf-8", errors="replace") as f:
+            return f.read()
+    return stdin or ""
+
+
+class BaseExecutor:
+    """Interface implemented by every execution backend."""
+    name = None
+    supports_batch = False  # run_batch is cheaper than one run_program per stdin
+
+    def prepare(self, code, language):
+        """Compile ``code`` once (when the backend can) and return a ``Program``."""
+        return Program(code, language)
+
+    def run_program(self, program, stdin, stdout_path=None):
+        """Run a prepared ``program`` with ``stdin`` and return its run result.
+
+        Backends that can only take stdin inline read file-backed input into
+        memory here.
+        """
+        run = self.run(program.code, program.language, read_stdin(stdin))
+        if stdout_path:
+            with open(stdout_path, "w", encoding="utf-8") as f:
+                f.write(run.get("stdout") or "")
+        return run
+
+    def run_batch(self, program, stdins, stdout_paths=None):
+        """Run a prepared ``program`` once per stdin and return the run results in order."""
+        stdout_paths = stdout_paths or [None] * len(stdins)
+        return [self.run_program(program, stdin, path) for stdin, path in zip(stdins, stdout_paths)]
+
+    def run(self, code, language, stdin):
+        """Run ``code`` written in ``language`` with ``stdin`` and return its run result."""
+        raise NotImplementedError
+
+    async def aprepare(self, code, language):
+        """``prepare`` for async callers, on a worker thread unless the backend overrides it."""
+        return await sync_to_async(self.prepare, thread_sensitive=False)(code, language)
+
+    async def arun_program(self, program, stdin, stdout_path=None):
+        """``run_program`` for async callers, on a worker thread unless the backend overrides it."""
+        return await sync_to_async(self.run_program, thread_sensitive=False)(program, stdin, stdout_path)
+
+
+class JudgeUnavailable(ExecutorError):
+    """The remote judge's circuit breaker is open; ``retry_after`` is in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Piston answers these while overloaded or restarting; worth another try
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+CONNECT_TIMEOUT = 3.05
+
+
+class PistonExecutor(BaseExecutor):
+    """Run code through the Piston API over a shared keep-alive session.
+
+    Piston compiles on every call, so ``prepare`` cannot build ahead of time;
+    a failed ``compile`` stage is reported as a compile error instead. The API
+    takes one inline stdin per call, so there is no batch mode and file-backed
+    inputs are read into the request body.
+
+    Calls go through a circuit breaker shared by all processes (see
+    ``resilience.py``). While it is open, calls fail at once with
+    ``JudgeUnavailable``, or ``run_program`` falls back to the
+    ``JUDGE_FALLBACK_EXECUTOR``. The read timeout follows recent latency
+    instead of always waiting ``JUDGE_TIMEOUT``, and connection errors and
+    429/5xx answers are retried with jittered backoff. Running code is
+    idempotent, so a retry can only cost time.
+    """
+    name = "piston"
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.JUDGE_MAX_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latency = LatencyTracker()
+        self._fallback_lock = threading.Lock()
+        self._aclients = weakref.WeakKeyDictionary()  # Event loop -> httpx.AsyncClient
+
+    def breaker(self):
+        return CircuitBreaker(
+            f"cb:piston:{settings.PISTON_API_URL}",
+            threshold=settings.JUDGE_BREAKER_THRESHOLD,
+            ratio=settings.JUDGE_BREAKER_FAILURE_RATIO,
+            window=settings.JUDGE_BREAKER_WINDOW,
+            cooldown=settings.JUDGE_BREAKER_COOLDOWN,
+            probe_timeout=settings.JUDGE_TIMEOUT + CONNECT_TIMEOUT,
+        )
+
+    def timeout(self):
+        """Read timeout for the next call: a multiple of recent latency within ``[JUDGE_TIMEOUT_MIN, JUDGE_TIMEOUT]``."""
+        observed = self.latency.percentile(settings.JUDGE_TIMEOUT_PERCENTILE)
+        if observed is None:
+            return settings.JUDGE_TIMEOUT
+        return min(settings.JUDGE_TIMEOUT, max(settings.JUDGE_TIMEOUT_MIN, observed * settings.JUDGE_TIMEOUT_MULTIPLIER))
+
+    def _acquire(self, breaker):
+        """Let a call through the breaker; returns whether it is the half-open probe."""
+        try:
+            return breaker.acquire(time.time())
+        except CircuitOpen as e:
+            raise JudgeUnavailable(f"Judge unavailable ({e})", e.retry_after) from e
+
+    def _answered(self, breaker, probe, started, status_code, reason, parse):
+        """The API's JSON answer if the judge answered (even if it refused the request), else ``None``."""
+        if status_code >= 500 or status_code == 429:
+            return None
+        breaker.record_success(time.time(), probe)
+        self.latency.record(time.perf_counter() - started)
+        if status_code >= 400:
+            raise ExecutorError(f"{status_code} {reason} from {settings.PISTON_API_URL}")
+        try:
+            return parse()
+        except ValueError as e:
+            raise ExecutorError(str(e)) from e
+
+    def _failed(self, breaker, probe, error, retryable, attempt):
+        """Record a failed attempt; returns the delay before the next one, or raises ``error`` when out of tries."""
+        if breaker.record_failure(time.time(), probe):
+            logger.warning("Judge circuit breaker opened after: %s", error)
+        if not retryable or attempt > settings.JUDGE_API_RETRIES:
+            if isinstance(error, ExecutorError):
+                raise error
+            raise ExecutorError(str(error)) from error
+        return backoff_delay(attempt, settings.JUDGE_API_RETRY_DELAY, settings.JUDGE_API_RETRY_DELAY_MAX)
+
+    def _post(self, payload):
+        breaker = self.breaker()
+        attempt = 0
+        while True:
+            probe = self._acquire(breaker)
+            timeout = self.timeout()
+            started = time.perf_counter()
+            try:
+                response = self.session.post(
+                    settings.PISTON_API_URL, json=payload, timeout=(min(CONNECT_TIMEOUT, timeout), timeout)
+                )
+            except requests.exceptions.RequestException as e:
+                # A read timeout is not retried: the judge is slow, not gone
+                error, retryable = e, isinstance(e, requests.exceptions.ConnectionError)
+            else:
+                answer = self._answered(breaker, probe, started, response.status_code, response.reason, response.json)
+                if answer is not None:
+                    return answer
+                error = ExecutorError(f"{response.status_code} {response.reason} from {settings.PISTON_API_URL}")
+                retryable = response.status_code in RETRYABLE_STATUSES
+            attempt += 1
+            time.sleep(self._failed(breaker, probe, error, retryable, attempt))
+
+    def aclient(self):
+        """This event loop's HTTP client; connections are kept alive like the sync session's."""
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = self._aclients[loop] = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.JUDGE_MAX_IN_FLIGHT * settings.JUDGE_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.JUDGE_MAX_CONCURRENCY,
+                ),
+            )
+        return client
+
+    async def _apost(self, payload):
+        """``_post`` on the event loop: the same breaker, timeouts and retries."""
+        breaker = self.breaker()
+        attempt = 0
+        while True:
+            probe = self._acquire(breaker)
+            timeout = self.timeout()
+            started = time.perf_counter()
+            try:
+                response = await self.aclient().post(
+                    settings.PISTON_API_URL, json=payload,
+                    timeout=httpx.Timeout(timeout, connect=min(CONNECT_TIMEOUT, timeout)),
+                )
+            except httpx.HTTPError as e:
+                # As with requests, only failures to connect or to get an answer at all are retried
+                error = e
+                retryable = isinstance(e, (httpx.NetworkError, httpx.ConnectTimeout, httpx.RemoteProtocolError))
+            else:
+                answer = self._answered(
+                    breaker, probe, started, response.status_code, response.reason_phrase, response.json,
+                )
+                if answer is not None:
+                    return answer
+                error = ExecutorError(f"{response.status_code} {response.reason_phrase} from {settings.PISTON_API_URL}")
+                retryable = response.status_code in RETRYABLE_STATUSES
+            attempt += 1
+            await asyncio.sleep(self._failed(breaker, probe, error, retryable, attempt))
+
+    def _payload(self, code, language, stdin):
+        return {
+            "language": language,
+            "version": "*",
+            "files": [{"name": "solution", "content": code}],
+            "stdin": stdin
+        }
+
+    def _run_result(self, result_data):
+        compile_stage = result_data.get("compile") or {}
+        if compile_stage.get("code") not in (None, 0):
+            return {
+                "stdout": "",
+                "stderr": compile_stage.get("stderr") or compile_stage.get("output") or "Compilation failed",
+                "code": compile_stage.get("code"),
+                "signal": compile_stage.get("signal"),
+                "compile_error": True,
+            }
+        return self._with_usage(result_data.get("run", {}))
+
+    def run(self, code, language, stdin):
+        return self._run_result(self._post(self._payload(code, language, stdin)))
+
+    def run_program(self, program, stdin, stdout_path=None):
+        try:
+            return super().run_program(program, stdin, stdout_path)
+        except JudgeUnavailable:
+            if not settings.JUDGE_FALLBACK_EXECUTOR:
+                raise
+            fallback = get_executor(settings.JUDGE_FALLBACK_EXECUTOR)
+            return fallback.run_program(self._fallback_program(fallback, program), stdin, stdout_path)
+
+    async def aprepare(self, code, language):
+        return self.prepare(code, language)  # Nothing to do ahead of the call
+
+    async def arun_program(self, program, stdin, stdout_path=None):
+        if isinstance(stdin, os.PathLike) or stdout_path:
+            # File-backed data: keep the disk I/O off the event loop
+            return await super().arun_program(program, stdin, stdout_path)
+        try:
+            return self._run_result(await self._apost(self._payload(program.code, program.language, stdin or "")))
+        except JudgeUnavailable:
+            if not settings.JUDGE_FALLBACK_EXECUTOR:
+                raise
+            fallback = get_executor(settings.JUDGE_FALLBACK_EXECUTOR)
+            fallback_program = await sync_to_async(self._fallback_program, thread_sensitive=False)(fallback, program)
+            return await fallback.arun_program(fallback_program, stdin, stdout_path)
+
+    def _fallback_program(self, fallback, program):
+        """``program`` prepared by ``fallback``, once per program however many cases need it."""
+        with self._fallback_lock:
+            if getattr(program, "fallback_program", None) is None:
+                program.fallback_program = fallback.prepare(program.code, program.language)
+            return program.fallback_program
+
+    def _with_usage(self, run):
+        """Translate the resource fields of newer Piston versions (milliseconds, bytes)."""
+        if run.get("wall_time") is not None:
+            run["wall_time"] = run["wall_time"] / 1000
+        if run.get("cpu_time") is not None:
+            run["cpu_time"] = run["cpu_time"] / 1000
+        if run.get("memory") is not None:
+            run["memory_kb"] = run["memory"] // 1024
+        if run.get("status") == "TO":
+            run["limit_exceeded"] = "time"
+        elif ran_out_of_memory(run):
+            run["limit_exceeded"] = "memory"
+        return run
+
+
+# Compilers write object files and binaries, so they get a larger file size cap
+COMPILE_FILE_LIMIT = 256 * 1024 * 1024
+
+
+PYTHON_BATCH_HARNESS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness", "python_batch.py")
+LAUNCHER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness", "launch.c")
+RLIMIT_EXEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness", "rlimit_exec.py")
+
+# Commands that identify the toolchain; part of the compile cache key
+TOOLCHAIN_VERSION_COMMANDS = {
+    "c": ["gcc", "-dumpfullversion"],
+    "cpp": ["g++", "-dumpfullversion"],
+    "java": ["javac", "-version"],
+    "javascript": ["node", "--version"],
+}
+
+# Cache entries used this recently are never evicted, so a run cannot lose its binary
+CACHE_EVICTION_GRACE = 300
+
+
+def _java_class_name(code):
+    match = re.search(r"public\s+(?:final\s+)?class\s+(\w+)", code)
+    return match.group(1) if match else "Main"
+
+
+@functools.lru_cache(maxsize=None)
+def toolchain_version(language):
+    """Return a string identifying the compiler or runtime used for ``language``."""
+    if language == "python":
+        return sys.version
+    try:
+        completed = subprocess.run(
+            TOOLCHAIN_VERSION_COMMANDS[language], capture_output=True, text=True, timeout=30
+        )
+    except (KeyError, OSError, subprocess.TimeoutExpired):
+        return "unavailable"
+    return (completed.stdout + completed.stderr).strip()
+
+
+class LocalExecutor(BaseExecutor):
+    """Run code in a throwaway temp dir with CPU, memory, process, wall-clock and output limits.
+
+    Limits are applied with ``setrlimit`` in the child before ``exec``, by the
+    launcher below rather than by this (threaded) process. JVM and V8 reserve
+    far more address space than they use, so for ``java`` and ``javascript``
+    the memory limit is passed to the runtime instead. ``JUDGE_PROCESS_LIMIT``
+    caps ``RLIMIT_NPROC``, which counts every process of the judge's OS user
+    and does not apply to root.
+
+    There is no network or filesystem isolation: programs run as the judge's
+    user, can read whatever it can read and can open network connections.
+    Run the judge as a dedicated unprivileged user in a container or VM
+    without network access when it takes untrusted code.
+
+    ``prepare`` builds each program into ``JUDGE_COMPILE_CACHE_DIR``, keyed by
+    a hash of (language, toolchain version, source), so resubmitting the same
+    code skips compilation. The least recently used entries are evicted once
+    the cache holds more than ``JUDGE_COMPILE_CACHE_SIZE`` programs.
+
+    ``run_batch`` runs all stdins in one temp dir. Python solutions are
+    compiled once by a harness interpreter that forks a child per test case,
+    so interpreter startup is paid once per batch instead of once per case.
+    Languages with a ``zygote`` command run in a warm sandbox leased from
+    ``sandbox_pool`` when one is free, for single runs and batches alike, and
+    pay no interpreter startup at all; otherwise they start cold as above.
+
+    Programs are started through ``harness/launch.c``, built into the compile
+    cache on first use, which reports their peak memory and CPU time. Without
+    a C compiler they are started through ``harness/rlimit_exec.py`` and their
+    memory is unknown.
+    """
+    name = "local"
+    supports_batch = True
+
+    LANGUAGES = {
+        "python": {
+            "source": "solution.py",
+            "run": [sys.executable, "-I", "-S", "{artifact_dir}/solution.py"],
+            "zygote": [sys.executable, "-I", "-S", PYTHON_BATCH_HARNESS, "--serve", "--preload", "{preload}"],
+        },
+        "c": {
+            "source": "solution.c",
+            "compile": ["gcc", "-O2", "-std=gnu17", "-o", "solution", "solution.c", "-lm"],
+            "run": ["{artifact_dir}/solution"],
+        },
+        "cpp": {
+            "source": "solution.cpp",
+            "compile": ["g++", "-O2", "-std=gnu++17", "-o", "solution", "solution.cpp"],
+            "run": ["{artifact_dir}/solution"],
+        },
+        "java": {
+            "source": "{class_name}.java",
+            "compile": ["javac", "-encoding", "UTF-8", "{class_name}.java"],
+            "run": ["java", "-Xmx{memory_mb}m", "-Xss64m", "-XX:+UseSerialGC", "-cp", "{artifact_dir}", "{class_name}"],
+            "runtime_memory_limit": True,
+        },
+        "javascript": {
+            "source": "solution.js",
+            "run": ["node", "--max-old-space-size={memory_mb}", "{artifact_dir}/solution.js"],
+            "runtime_memory_limit": True,
+        },
+    }
+
+    def __init__(self):
+        self.cpu_limit = settings.JUDGE_CPU_LIMIT
+        self.memory_mb = settings.JUDGE_MEMORY_LIMIT_MB
+        self.output_limit = settings.JUDGE_OUTPUT_LIMIT_KB * 1024
+        self.file_output_limit = settings.JUDGE_FILE_OUTPUT_LIMIT_MB * 1024 * 1024
+        self.process_limit = settings.JUDGE_PROCESS_LIMIT
+        self.wall_limit = settings.JUDGE_TIMEOUT
+        self.compile_timeout = settings.JUDGE_COMPILE_TIMEOUT
+        self.cache_dir = settings.JUDGE_COMPILE_CACHE_DIR
+        self.cache_size = settings.JUDGE_COMPILE_CACHE_SIZE
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._launcher_path = None
+        self._launcher_lock = threading.Lock()
+
+    def launcher(self):
+        """Path of the compiled ``launch.c``, or ``None`` if it cannot be built."""
+        if self._launcher_path is None:
+            with self._launcher_lock:
+                if self._launcher_path is None:
+                    self._launcher_path = self._build_launcher() or ""
+        return self._launcher_path or None
+
+    def _build_launcher(self):
+        with open(LAUNCHER_SOURCE, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        path = os.path.join(self.cache_dir, f"launch-{digest}")
+        if os.path.exists(path):
+            return path
+        fd, temp_path = tempfile.mkstemp(prefix="launch-", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            subprocess.run(
+                ["gcc", "-O2", "-o", temp_path, LAUNCHER_SOURCE],
+                capture_output=True, check=True, timeout=self.compile_timeout,
+            )
+            os.chmod(temp_path, 0o755)
+            os.replace(temp_path, path)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning("Cannot build the sandbox launcher, peak memory will not be measured: %s", e)
+            os.remove(temp_path)
+            return None
+        return path
+
+    def _wait(self, process, wall_limit):
+        """Reap ``process``, killing its group after ``wall_limit`` seconds.
+
+        Polls like ``Popen.wait(timeout)`` does, but through ``wait4`` so the
+        child's resource usage comes back with its exit status. Returns
+        ``(returncode, rusage, timed_out)``.
+        """
+        deadline = time.monotonic() + wall_limit
+        delay = 0.0005
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                timed_out = False
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                os.killpg(process.pid, signal.SIGKILL)
+                _, status, usage = os.wait4(process.pid, 0)
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, usage, timed_out
+
+    def _spawn(self, argv, workdir, stdin_path, wall_limit, cpu_limit, memory_bytes, file_limit,
+               stdout_path=None, stderr_path=None):
+        """Run ``argv`` in ``workdir`` and return its run result, including resource use."""
+        stdout_path = stdout_path or os.path.join(workdir, ".stdout")
+        stderr_path = stderr_path or os.path.join(workdir, ".stderr")
+        env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": workdir, "LANG": "C.UTF-8"}
+        limits = [str(cpu_limit), str(memory_bytes or 0), str(file_limit), str(self.process_limit)]
+        launcher = self.launcher()
+        report_fds = os.pipe() if launcher else None
+        if launcher:
+            command = [launcher, str(report_fds[1]), *limits, *argv]
+        elif shutil.which(argv[0]):
+            command = [sys.executable, "-I", "-S", RLIMIT_EXEC, *limits, *argv]
+        else:
+            raise ExecutorError(f"Cannot start {argv[0]}: not found")
+        try:
+            with open(stdin_path, "rb") as stdin, open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+                try:
+                    process = subprocess.Popen(
+                        command,
+                        cwd=workdir,
+                        env=env,
+                        stdin=stdin,
+                        stdout=stdout,
+                        stderr=stderr,
+                        start_new_session=True,
+                        pass_fds=report_fds[1:] if report_fds else (),
+                    )
+                except OSError as e:
+                    raise ExecutorError(f"Cannot start {argv[0]}: {e}") from e
+                finally:
+                    if report_fds:
+                        os.close(report_fds[1])
+                started = time.monotonic()
+                returncode, usage, timed_out = self._wait(process, wall_limit)
+            report = self._read_report(report_fds[0]) if report_fds else None
+        finally:
+            if report_fds:
+                os.close(report_fds[0])
+
+        if report and report[0] == "exec":
+            raise ExecutorError(f"Cannot start {argv[0]}: {os.strerror(int(report[1]))}")
+        if launcher:
+            # No report when the launcher was killed at the wall-clock limit
+            memory_kb, cpu_time = (int(report[-2]), float(report[-1])) if report else (None, None)
+        else:
+            memory_kb, cpu_time = None, usage.ru_utime + usage.ru_stime
+        run = {
+            "stdout": self._read_capped(stdout_path),
+            "stderr": self._read_capped(stderr_path),
+            "code": returncode if returncode >= 0 else None,
+            "signal": signal.Signals(-returncode).name if returncode < 0 else None,
+            "wall_time": time.monotonic() - started,
+            "cpu_time": cpu_time,
+            "memory_kb": memory_kb,
+            "output_bytes": os.path.getsize(stdout_path),
+        }
+        if timed_out:
+            run["stderr"] = (run["stderr"] + "\n" if run["stderr"] else "") + f"Time limit exceeded ({wall_limit:g}s)"
+        return self._check_limits(run, timed_out, cpu_limit, memory_bytes)
+
+    def _read_report(self, fd):
+        """Words of the launcher's report, ``[]`` if it wrote none."""
+        os.set_blocking(fd, False)  # never wait on a writer that survived the kill
+        try:
+            return os.read(fd, 4096).decode("ascii", errors="replace").split()
+        except BlockingIOError:
+            return []
+
+    def _check_limits(self, run, timed_out, cpu_limit, memory_bytes):
+        """Mark ``run`` with the limit that stopped it, if any.
+
+        A C or C++ program that crashes on a failed ``malloc`` rather than
+        reporting it cannot be told apart from any other crash, so it stays a
+        runtime error.
+        """
+        cpu_time, memory_kb = run["cpu_time"] or 0, run["memory_kb"] or 0
+        if timed_out or run["signal"] == "SIGXCPU" or (run["signal"] and cpu_time >= cpu_limit):
+            run["limit_exceeded"] = "time"
+        elif ran_out_of_memory(run) or (memory_bytes and run["signal"] and memory_kb * 1024 >= memory_bytes):
+            run["limit_exceeded"] = "memory"
+        return run
+
+    def _read_capped(self, path):
+        with open(path, "rb") as f:
+            data = f.read(self.output_limit + 1)
+        text = data[:self.output_limit].decode("utf-8", errors="replace")
+        if len(data) > self.output_limit:
+            text += "\n[output truncated]"
+        return text
+
+    def _format(self, argv, **values):
+        return [part.format(**values) for part in argv]
+
+    def cache_key(self, code, language):
+        digest = hashlib.sha256()
+        for part in (language, toolchain_version(language), code):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _build(self, spec, code, values, build_dir):
+        """Write the source into ``build_dir`` and compile it; return the compiler output on failure."""
+        with open(os.path.join(build_dir, spec["source"].format(**values)), "w", encoding="utf-8") as f:
+            f.write(code)
+        if "compile" not in spec:
+            return None
+        run = self._spawn(
+            self._format(spec["compile"], **values), build_dir, os.devnull,
+            self.compile_timeout, int(self.compile_timeout), None, COMPILE_FILE_LIMIT,
+        )
+        for name in (".stdout", ".stderr"):
+            os.remove(os.path.join(build_dir, name))
+        if run["code"] != 0:
+            return run["stderr"] or f"Compilation failed ({run['signal'] or run['code']})"
+        return None
+
+    def prepare(self, code, language):
+        spec = self.LANGUAGES.get(language)
+        if spec is None:
+            raise ExecutorError(f"Language {language!r} is not supported by the local executor")
+
+        values = {"class_name": _java_class_name(code), "memory_mb": self.memory_mb}
+        artifact_dir = os.path.join(self.cache_dir, self.cache_key(code, language))
+        error_path = os.path.join(artifact_dir, ".compile_error")
+
+        if os.path.isdir(artifact_dir):
+            os.utime(artifact_dir)  # mark as recently used
+        else:
+            build_dir = tempfile.mkdtemp(prefix="build-", dir=self.cache_dir)
+            try:
+                compile_error = self._build(spec, code, values, build_dir)
+                if compile_error is not None:
+                    with open(os.path.join(build_dir, ".compile_error"), "w", encoding="utf-8") as f:
+                        f.write(compile_error)
+                os.chmod(build_dir, 0o755)
+                os.rename(build_dir, artifact_dir)
+            except OSError:
+                # Another worker published the same program first; use theirs.
+                shutil.rmtree(build_dir, ignore_errors=True)
+                if not os.path.isdir(artifact_dir):
+                    raise
+            self._evict()
+
+        compile_error = None
+        if os.path.exists(error_path):
+            with open(error_path, encoding="utf-8") as f:
+                compile_error = f.read()
+        values["artifact_dir"] = artifact_dir
+        return Program(code, language, compile_error=compile_error, artifact_dir=artifact_dir, values=values)
+
+    def _evict(self):
+        """Drop least recently used programs beyond ``JUDGE_COMPILE_CACHE_SIZE``."""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_dir() and len(entry.name) == 64]
+        except OSError:
+            return
+        excess = len(entries) - self.cache_size
+        if excess <= 0:
+            return
+        cutoff = time.time() - CACHE_EVICTION_GRACE
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:excess]:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _compile_error_run(self, program):
+        return {"stdout": "", "stderr": program.compile_error, "code": 1, "signal": None, "compile_error": True}
+
+    def _memory_bytes(self, spec):
+        return None if spec.get("runtime_memory_limit") else self.memory_mb * 1024 * 1024
+
+    def _stdin_path(self, stdin, path):
+        """Path of a file holding ``stdin``; file-backed input is used in place, not copied."""
+        if isinstance(stdin, os.PathLike):
+            return os.fspath(stdin)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(stdin or "")
+        return path
+
+    def _pool(self, language):
+        """This process's pool of warm sandboxes for ``language``, or ``None``."""
+        spec = self.LANGUAGES[language]
+        if "zygote" not in spec:
+            return None
+        argv = self._format(spec["zygote"], preload=",".join(settings.JUDGE_POOL_PYTHON_PRELOAD))
+        return sandbox_pool.get_pool(language, argv, settings.JUDGE_SANDBOX_ROOT or tempfile.gettempdir())
+
+    def _run_warm(self, program, cases, file_limit):
+        """Run ``cases`` in one leased sandbox; ``None`` if none was free or it failed, to run them cold."""
+        pool = self._pool(program.language)
+        if pool is None:
+            return None
+        source = os.path.join(program.artifact_dir, self.LANGUAGES[program.language]["source"])
+        limits = self._harness_limits(file_limit)
+        try:
+            with pool.lease() as sandbox:
+                if sandbox is None:
+                    return None
+                return [
+                    self._harness_run(
+                        sandbox.request({"source": source, "case": case, "limits": limits}, self.wall_limit + 5), case,
+                    )
+                    for case in cases
+                ]
+        except SandboxError as e:
+            logger.warning("Warm %s sandbox failed, running cold: %s", program.language, e)
+            return None
+
+    def run_program(self, program, stdin, stdout_path=None):
+        if program.compile_error is not None:
+            return self._compile_error_run(program)
+
+        spec = self.LANGUAGES[program.language]
+        workdir = tempfile.mkdtemp(prefix="judge-", dir=settings.JUDGE_SANDBOX_ROOT)
+        try:
+            stdin_path = self._stdin_path(stdin, os.path.join(workdir, ".stdin"))
+            file_limit = self.file_output_limit if stdout_path else self.output_limit
+            case = {
+                "stdin": stdin_path, "stdout": stdout_path or os.path.join(workdir, ".stdout"),
+                "stderr": os.path.join(workdir, ".stderr"), "cwd": workdir,
+            }
+            runs = self._run_warm(program, [case], file_limit)
+            if runs is not None:
+                return runs[0]
+            return self._spawn(
+                self._format(spec["run"], **program.values), workdir, stdin_path,
+                self.wall_limit, self.cpu_limit, self._memory_bytes(spec), file_limit, stdout_path,
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_batch(self, program, stdins, stdout_paths=None):
+        if program.compile_error is not None:
+            return [self._compile_error_run(program) for _ in stdins]
+
+        spec = self.LANGUAGES[program.language]
+        stdout_paths = stdout_paths or [None] * len(stdins)
+        file_limit = self.file_output_limit if any(stdout_paths) else self.output_limit
+        workdir = tempfile.mkdtemp(prefix="judge-", dir=settings.JUDGE_SANDBOX_ROOT)
+        try:
+            cases = []
+            for index, (stdin, stdout_path) in enumerate(zip(stdins, stdout_paths)):
+                case = {name: os.path.join(workdir, f"case{index}.{name}") for name in ("stdin", "stdout", "stderr")}
+                case["stdin"] = self._stdin_path(stdin, case["stdin"])
+                case["stdout"] = stdout_path or case["stdout"]
+                case["cwd"] = workdir
+                cases.append(case)
+
+            runs = self._run_warm(program, cases, file_limit)
+            if runs is not None:
+                return runs
+            if program.language == "python":
+                return self._run_python_batch(program, workdir, cases, file_limit)
+
+            argv = self._format(spec["run"], **program.values)
+            return [
+                self._spawn(
+                    argv, workdir, case["stdin"], self.wall_limit, self.cpu_limit,
+                    self._memory_bytes(spec), file_limit, case["stdout"], case["stderr"],
+                )
+                for case in cases
+            ]
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _harness_limits(self, file_limit):
+        return {
+            "cpu": self.cpu_limit, "memory": self.memory_mb * 1024 * 1024, "output": file_limit,
+            "processes": self.process_limit, "wall": self.wall_limit,
+        }
+
+    def _harness_run(self, record, case):
+        """The run result for one case's report from the Python harness."""
+        # SIGALRM is the child's own wall-clock alarm, SIGKILL the harness's backstop
+        timed_out = record["signal"] == "SIGALRM" or (
+            record["signal"] == "SIGKILL" and record["wall_time"] >= self.wall_limit
+        )
+        stderr = self._read_capped(case["stderr"])
+        if timed_out:
+            stderr = (stderr + "\n" if stderr else "") + f"Time limit exceeded ({self.wall_limit:g}s)"
+        return self._check_limits({
+            "stdout": self._read_capped(case["stdout"]),
+            "stderr": stderr,
+            "code": record["code"],
+            "signal": record["signal"],
+            "wall_time": record["wall_time"],
+            "cpu_time": record["cpu_time"],
+            "memory_kb": record["memory_kb"],
+            "output_bytes": os.path.getsize(case["stdout"]),
+        }, timed_out, self.cpu_limit, self.memory_mb * 1024 * 1024)
+
+    def _run_python_batch(self, program, workdir, cases, file_limit):
+        manifest_path = os.path.join(workdir, "manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"cases": cases, "limits": self._harness_limits(file_limit)}, f)
+
+        # The harness itself only needs room for every case's wall time.
+        batch_wall = self.wall_limit * len(cases) + self.compile_timeout
+        harness = self._spawn(
+            [sys.executable, "-I", "-S", PYTHON_BATCH_HARNESS,
+             os.path.join(program.artifact_dir, "solution.py"), manifest_path],
+            workdir, os.devnull, batch_wall, int(batch_wall), None, file_limit,
+        )
+        lines = harness["stdout"].splitlines()
+        if harness["code"] != 0 or len(lines) != len(cases):
+            raise ExecutorError(
+                f"Python batch harness failed ({harness['signal'] or harness['code']}): {harness['stderr'].strip()}"
+            )
+
+        return [self._harness_run(json.loads(line), case) for case, line in zip(cases, lines)]
+
+    def run(self, code, language, stdin):
+        return self.run_program(self.prepare(code, language), stdin)
+
+
+EXECUTORS = {
+    PistonExecutor.name: PistonExecutor,
+    LocalExecutor.name: LocalExecutor,
+}
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(name=None):
+    """Return the (process-wide) executor configured by ``settings.JUDGE_EXECUTOR``."""
+    name = name or settings.JUDGE_EXECUTOR
+    if name not in _executors:
+        with _lock:
+            if name not in _executors:
+                executor_class = EXECUTORS.get(name) or import_string(name)
+                _executors[name] = executor_class()
+    return _executors[name]
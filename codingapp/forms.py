@@ -1,5 +1,5 @@
 from django import forms
-from .models import Module, Question
+from .models import Module, Question, validate_test_cases
 import json
 
 class ModuleForm(forms.ModelForm):
@@ -24,17 +24,26 @@ class QuestionForm(forms.ModelForm):
             "rows": 4,
             "placeholder": '[{"input": "1 2", "expected_output": "3"}, {"input": "2 3", "expected_output": "5"}]',
         }),
-        help_text="Enter test cases in JSON format (e.g., [{'input': '1 2', 'expected_output': '3'}]).",
+        help_text="Enter test cases in JSON format (e.g., [{'input': '1 2', 'expected_output': '3'}]). Add \"sample\": true to mark public samples.",
         required=False,  # Allow empty test cases to match model default
     )
 
     class Meta:
         model = Question
-        fields = ['title', 'description', 'module', 'test_cases']
+        fields = [
+            'title', 'description', 'module', 'test_cases', 'judge_policy',
+            'checker', 'float_abs_tolerance', 'float_rel_tolerance', 'checker_language', 'checker_code',
+        ]
         widgets = {
             "title": forms.TextInput(attrs={"class": "form-control"}),
             "description": forms.Textarea(attrs={"class": "form-control", "rows": 3}),
             "module": forms.Select(attrs={"class": "form-control"}),
+            "judge_policy": forms.Select(attrs={"class": "form-control"}),
+            "checker": forms.Select(attrs={"class": "form-control"}),
+            "float_abs_tolerance": forms.NumberInput(attrs={"class": "form-control", "step": "any"}),
+            "float_rel_tolerance": forms.NumberInput(attrs={"class": "form-control", "step": "any"}),
+            "checker_language": forms.Select(attrs={"class": "form-control"}),
+            "checker_code": forms.Textarea(attrs={"class": "form-control font-monospace", "rows": 6}),
         }
 
     def clean_test_cases(self):
@@ -46,13 +55,21 @@ class QuestionForm(forms.ModelForm):
         try:
             test_cases = json.loads(data)
             # Delegate detailed validation to the model’s validator
-            Question._meta.get_field('test_cases').run_validators(test_cases)
+            validate_test_cases(test_cases)
             return test_cases
         except json.JSONDecodeError as e:
             raise forms.ValidationError(f"Invalid JSON format: {str(e)}")
         except forms.ValidationError as e:
             raise forms.ValidationError(f"Test cases validation failed: {str(e)}")
 
+    def save(self, commit=True):
+        """Assign the test cases; they are written to the TestCase table when the question is saved."""
+        instance = super().save(commit=False)
+        instance.test_cases = self.cleaned_data['test_cases']
+        if commit:
+            instance.save()
+        return instance
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Pre-populate test_cases with JSON string if editing an existing instance
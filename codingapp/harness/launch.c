@@ -0,0 +1,96 @@
+/* Run one program and report its resource use.
+ *
+ * Used by LocalExecutor::
+ *
+ *     launch REPORT_FD CPU_SECONDS MEMORY_BYTES FILE_BYTES PROCESSES program [args...]
+ *
+ * The program is forked from this small process instead of from the Django
+ * worker because Linux folds the pre-exec image into ru_maxrss: a child of a
+ * 300 MB worker reports a 300 MB peak even if it only prints one line.
+ * The limits are set in the forked child before exec, where it is safe: the
+ * worker that starts the launcher has threads, so it cannot run code between
+ * its own fork and exec. A limit of 0 leaves that resource unlimited.
+ *
+ * Writes "maxrss_kb cpu_seconds" to REPORT_FD once the program exits,
+ * preceded by "exec ERRNO" if it could not be started, and then exits the
+ * same way the program did.
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+/* Lower a limit to soft/hard, never above the hard limit already in place */
+static int limit(int resource, rlim_t soft, rlim_t hard)
+{
+    struct rlimit current, value = {soft, hard};
+    if (!soft)
+        return 0;
+    if (getrlimit(resource, &current) == 0 && current.rlim_max != RLIM_INFINITY) {
+        if (value.rlim_max > current.rlim_max)
+            value.rlim_max = current.rlim_max;
+        if (value.rlim_cur > value.rlim_max)
+            value.rlim_cur = value.rlim_max;
+    }
+    return setrlimit(resource, &value);
+}
+
+int main(int argc, char **argv)
+{
+    if (argc < 7) {
+        fprintf(stderr, "usage: launch REPORT_FD CPU_SECONDS MEMORY_BYTES FILE_BYTES PROCESSES program [args...]\n");
+        return 125;
+    }
+    int report_fd = atoi(argv[1]);
+    rlim_t cpu_seconds = strtoull(argv[2], NULL, 10);
+    rlim_t memory = strtoull(argv[3], NULL, 10);
+    rlim_t file_size = strtoull(argv[4], NULL, 10);
+    rlim_t processes = strtoull(argv[5], NULL, 10);
+
+    pid_t pid = fork();
+    if (pid < 0) {
+        dprintf(report_fd, "exec %d\n", errno);
+        return 125;
+    }
+    if (pid == 0) {
+        fcntl(report_fd, F_SETFD, FD_CLOEXEC);  /* the program never sees the report pipe */
+        struct rlimit no_core = {0, 0};
+        if (limit(RLIMIT_CPU, cpu_seconds, cpu_seconds + 1) || limit(RLIMIT_AS, memory, memory)
+            || limit(RLIMIT_FSIZE, file_size, file_size) || limit(RLIMIT_NPROC, processes, processes)
+            || setrlimit(RLIMIT_CORE, &no_core)) {
+            dprintf(report_fd, "exec %d\n", errno);
+            _exit(127);
+        }
+        execvp(argv[6], argv + 6);
+        dprintf(report_fd, "exec %d\n", errno);
+        _exit(127);
+    }
+
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR)
+            return 125;
+    }
+    double cpu = usage.ru_utime.tv_sec + usage.ru_stime.tv_sec
+                 + (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) / 1e6;
+    dprintf(report_fd, "%ld %.6f\n", usage.ru_maxrss, cpu);
+    close(report_fd);
+
+    if (WIFSIGNALED(status)) {
+        int sig = WTERMSIG(status);
+        struct rlimit no_core = {0, 0};
+        sigset_t unblock;
+        setrlimit(RLIMIT_CORE, &no_core);
+        signal(sig, SIG_DFL);
+        sigemptyset(&unblock);
+        sigaddset(&unblock, sig);
+        sigprocmask(SIG_UNBLOCK, &unblock, NULL);
+        raise(sig);
+    }
+    return WIFEXITED(status) ? WEXITSTATUS(status) : 125;
+}
@@ -0,0 +1,215 @@
+"""Run one Python solution against many inputs from a single interpreter.
+
+Used by ``LocalExecutor.run_batch``::
+
+    python -I -S python_batch.py solution.py manifest.json
+
+The solution is compiled once; every test case runs in a child forked from
+this warm interpreter with its own stdin/stdout/stderr files and rlimits.
+One JSON line per case (exit code, signal, timings) is written to stdout.
+
+As a warm sandbox for ``sandbox_pool.py``::
+
+    python -I -S python_batch.py --serve [--preload json,math,...]
+
+the interpreter imports the ``--preload`` modules once, then reads one JSON
+request per line on stdin, ``{"source", "case", "limits"}``, runs the case
+in a forked child and answers with the same JSON line. ``{"ping": true}`` is
+answered with ``{"pong": true}``. The children never hand anything back, so
+the interpreter is as fresh for the next request as it was for the first.
+
+A forked child starts out with this interpreter's address space and
+resident pages: the preloaded modules, the compiled solution. So that a case
+is limited and measured as in a cold run, each child's ``RLIMIT_AS`` is
+raised by what the interpreter has grown since it started, and the resident
+pages it has grown are taken off the child's reported peak memory.
+"""
+import importlib
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+
+def address_space_kb():
+    """This process's address space in kB (``VmSize``), 0 where ``/proc`` does not have it."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def forked_rss_kb():
+    """Peak resident set of a child forked now that exits at once: the pages every case starts with."""
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    return os.wait4(pid, 0)[2].ru_maxrss
+
+
+def memory_baseline():
+    return address_space_kb(), forked_rss_kb()
+
+
+STARTUP_BASELINE = memory_baseline()  # Before any preload or solution: about what a cold interpreter starts with
+
+
+def inherited_memory():
+    """``(address space, resident set)`` in kB a child forked now inherits beyond ``STARTUP_BASELINE``."""
+    return tuple(max(now - then, 0) for now, then in zip(memory_baseline(), STARTUP_BASELINE))
+
+
+def run_case(code, source_path, case, limits, inherited_kb=0):
+    """Child side of the fork: never returns.
+
+    ``inherited_kb`` of address space came with the fork; the memory limit is on top of it.
+    """
+    status = 1
+    try:
+        os.setpgid(0, 0)  # Killed with anything it started if it outlives the wall limit
+        if "cwd" in case:
+            os.chdir(case["cwd"])
+            os.environ["HOME"] = case["cwd"]
+        for fd, path, flags in (
+            (0, case["stdin"], os.O_RDONLY),
+            (1, case["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+            (2, case["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        ):
+            opened = os.open(path, flags, 0o644)
+            os.dup2(opened, fd)
+            os.close(opened)
+        sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+        sys.stdout = open(1, "w", encoding="utf-8", closefd=False)
+        sys.stderr = open(2, "w", encoding="utf-8", closefd=False)
+
+        cpu = limits["cpu"]
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limits["output"], limits["output"]))
+        if limits["memory"]:
+            memory = limits["memory"] + inherited_kb * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        if limits.get("processes"):
+            resource.setrlimit(resource.RLIMIT_NPROC, (limits["processes"], limits["processes"]))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        signal.setitimer(signal.ITIMER_REAL, limits["wall"])  # SIGALRM ends the run
+        if "random" in sys.modules:
+            sys.modules["random"].seed()  # Preloaded by a warm sandbox: otherwise every child draws the same numbers
+
+        if isinstance(code, BaseException):
+            traceback.print_exception(type(code), code, None)  # the compile error, without harness frames
+        else:
+            sys.argv = [source_path]
+            exec(code, {"__name__": "__main__", "__file__": source_path, "__builtins__": __builtins__})
+            status = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        error_type, error, tb = sys.exc_info()
+        traceback.print_exception(error_type, error, tb.tb_next)  # hide this harness frame
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(status)
+
+
+def judge_case(code, source_path, case, limits, inherited=(0, 0)):
+    """Run one case in a forked child; returns its report.
+
+    ``inherited`` is ``inherited_memory()`` since the last preload or compile.
+    """
+    address_space, resident = inherited
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        run_case(code, source_path, case, limits, address_space)
+    # The child's SIGALRM ends it at the wall limit; kill it should it outlive that anyway
+    deadline = started + limits["wall"] + 1
+    if hasattr(os, "pidfd_open"):
+        pidfd = os.pidfd_open(pid)  # Readable once the child exits: no polling delay
+        try:
+            exited = select.select([pidfd], [], [], deadline - time.monotonic())[0]
+        finally:
+            os.close(pidfd)
+    else:
+        exited, delay = False, 0.0005
+        while not exited and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+            exited = os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+    if not exited:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    _, status, usage = os.wait4(pid, 0)
+    return {
+        "code": os.WEXITSTATUS(status) if os.WIFEXITED(status) else None,
+        "signal": signal.Signals(os.WTERMSIG(status)).name if os.WIFSIGNALED(status) else None,
+        "wall_time": time.monotonic() - started,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "memory_kb": max(usage.ru_maxrss - resident, 0),
+    }
+
+
+def compile_source(source_path):
+    with open(source_path, encoding="utf-8") as f:
+        source = f.read()
+    try:
+        return compile(source, source_path, "exec")
+    except (SyntaxError, ValueError) as e:
+        return e  # reported by every case, like a normal run would
+
+
+def serve(preload):
+    for name in filter(None, preload.split(",")):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    compiled = (None, None, None)  # The last program, since a submission's cases come in a row
+    out = sys.stdout
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("ping"):
+            reply = {"pong": True}
+        else:
+            if compiled[0] != request["source"]:
+                code = compile_source(request["source"])
+                compiled = (request["source"], code, inherited_memory())
+            reply = judge_case(compiled[1], request["source"], request["case"], request["limits"], compiled[2])
+        out.write(json.dumps(reply) + "\n")
+        out.flush()
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve(sys.argv[3] if sys.argv[2:3] == ["--preload"] else "")
+        return
+    source_path, manifest_path = sys.argv[1:3]
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    code = compile_source(source_path)
+    inherited = inherited_memory()
+    out = sys.stdout
+    for case in manifest["cases"]:
+        out.write(json.dumps(judge_case(code, source_path, case, manifest["limits"], inherited)) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    main()
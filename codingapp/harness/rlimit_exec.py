@@ -0,0 +1,38 @@
+"""Apply the run limits, then exec the program: ``launch.c`` for hosts without a C compiler.
+
+Used by ``LocalExecutor`` when the launcher cannot be built::
+
+    python -I -S rlimit_exec.py CPU_SECONDS MEMORY_BYTES FILE_BYTES PROCESSES program [args...]
+
+The limits cannot be set from the Django worker between fork and exec
+(``preexec_fn``) because the worker has threads. A limit of 0 leaves that
+resource unlimited.
+"""
+import os
+import resource
+import sys
+
+
+def limit(which, soft, hard):
+    """Lower a limit to ``soft``/``hard``, never above the hard limit already in place."""
+    if not soft:
+        return
+    _, current = resource.getrlimit(which)
+    if current != resource.RLIM_INFINITY:
+        hard = min(hard, current)
+        soft = min(soft, hard)
+    resource.setrlimit(which, (soft, hard))
+
+
+def main():
+    cpu, memory, file_size, processes = (int(value) for value in sys.argv[1:5])
+    limit(resource.RLIMIT_CPU, cpu, cpu + 1)
+    limit(resource.RLIMIT_AS, memory, memory)
+    limit(resource.RLIMIT_FSIZE, file_size, file_size)
+    limit(resource.RLIMIT_NPROC, processes, processes)
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    os.execvp(sys.argv[5], sys.argv[5:])
+
+
+if __name__ == "__main__":
+    main()
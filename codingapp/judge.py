@@ -0,0 +1,843 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, FIRST_EXCEPTION, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .executors import ExecutorError, JudgeUnavailable, get_executor
+from . import contests, metrics, stats, tracing
+from .models import Question, Submission, TestCase, TestCaseResult
+from .result_cache import code_hash, get_result_cache, test_case_hash
+from .checkers import CheckerError, ExactChecker, Source, get_checker
+from .testdata import blob_path, read_preview
+
+# Logger for debugging
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared thread pool that caps concurrent judge calls per process."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.JUDGE_MAX_CONCURRENCY,
+                    thread_name_prefix="judge",
+                )
+    return _pool
+
+
+_async_slots = weakref.WeakKeyDictionary()  # Event loop -> asyncio.Semaphore
+
+
+def _aslots():
+    """The running loop's cap on concurrent judge calls, the async counterpart of ``get_pool``."""
+    loop = asyncio.get_running_loop()
+    slots = _async_slots.get(loop)
+    if slots is None:
+        slots = _async_slots[loop] = asyncio.Semaphore(settings.JUDGE_MAX_CONCURRENCY)
+    return slots
+
+
+COMPILE_ERROR = "Compile Error"
+TIME_LIMIT_EXCEEDED = "Time Limit Exceeded"
+MEMORY_LIMIT_EXCEEDED = "Memory Limit Exceeded"
+LIMIT_STATUSES = {"time": TIME_LIMIT_EXCEEDED, "memory": MEMORY_LIMIT_EXCEEDED}
+JUDGE_ERROR_PREFIX = "Judge error: "  # Starts the error of a submission the executor failed on
+JudgePolicy = Question.JudgePolicy
+
+
+class CompileError(Exception):
+    """The submission failed to compile; judging stops after reporting it once."""
+
+
+@contextmanager
+def _executor_call(executor, call):
+    """Time an executor call (``prepare``, ``run`` or ``batch``) into the metrics and the request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    except ExecutorError as e:
+        metrics.EXECUTOR_ERRORS.inc(
+            executor=executor.name, kind="unavailable" if isinstance(e, JudgeUnavailable) else "error",
+        )
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.EXECUTOR_SECONDS.observe(seconds, executor=executor.name, call=call)
+        tracing.record(f"executor.{call}", seconds)
+
+
+def _stdin(test):
+    """The stdin to hand an executor: the stored file for file-backed input."""
+    if test.get("input_file"):
+        return Path(blob_path(test["input_file"]))
+    return test.get("input", "")
+
+
+def _shown(test, key):
+    """Text of ``test[key]`` for results; file-backed data is shown as a preview."""
+    digest = test.get(f"{key}_file")
+    return read_preview(blob_path(digest)) if digest else test.get(key, "")
+
+
+@contextmanager
+def _output_file():
+    """A scratch file the executor writes a file-backed case's full output to."""
+    fd, path = tempfile.mkstemp(prefix="stdout-", dir=settings.JUDGE_SANDBOX_ROOT)
+    os.close(fd)
+    try:
+        yield path
+    finally:
+        os.remove(path)
+
+
+def _usage(run, stdout_path=None):
+    """Resource use of a run, for results and ``TestCaseResult`` rows."""
+    output_bytes = run.get("output_bytes")
+    if output_bytes is None:
+        output_bytes = os.path.getsize(stdout_path) if stdout_path else len((run.get("stdout") or "").encode("utf-8"))
+    return {
+        "wall_time": run.get("wall_time"),
+        "cpu_time": run.get("cpu_time"),
+        "memory_kb": run.get("memory_kb"),
+        "exit_code": run.get("code"),
+        "signal": run.get("signal") or "",
+        "output_bytes": output_bytes,
+    }
+
+
+def result_from_run(test, run, checker, stdout_path=None):
+    """Turn an executor run result into ``(result, stderr)`` for ``test``.
+
+    ``checker`` compares the output with the expected output. For a
+    file-backed expected output it reads ``stdout_path``, the program's full
+    output, as a stream. A run stopped by the time or memory limit gets that
+    verdict without being checked.
+    """
+    if run.get("compile_error"):
+        raise CompileError(run.get("stderr") or "Compilation failed")
+
+    error_output = (run.get("stderr") or "").strip()
+    if stdout_path:
+        actual_output = read_preview(stdout_path)
+        actual = Source(path=stdout_path)
+    else:
+        actual_output = (run.get("stdout") or "").strip()
+        actual = Source(text=run.get("stdout") or "")
+
+    limit = LIMIT_STATUSES.get(run.get("limit_exceeded"))
+    if limit:
+        status, message = limit, ""
+    else:
+        try:
+            matched, message = checker.check(test, actual)
+        except CheckerError as e:
+            matched, message = False, ""
+            error_output = f"Checker error: {e}"
+        status = "Accepted" if matched else "Rejected" if not error_output else "Error"
+    return {
+        "input": _shown(test, "input"),
+        "expected_output": _shown(test, "expected_output"),
+        "actual_output": actual_output,
+        "status": status,
+        "error_message": message if status == "Rejected" else "" if status == "Accepted" else error_output,
+        **_usage(run, stdout_path),
+    }, error_output
+
+
+def run_test_case(executor, program, test, checker):
+    """Run a single test case of a prepared program and check its output.
+
+    Returns ``(result, stderr)``. Backend failures are raised as
+    ``ExecutorError`` and compile failures as ``CompileError`` so the caller
+    can stop judging.
+    """
+    if not test.get("expected_output_file"):
+        with _executor_call(executor, "run"):
+            run = executor.run_program(program, _stdin(test))
+        return result_from_run(test, run, checker)
+    with _output_file() as stdout_path:
+        with _executor_call(executor, "run"):
+            run = executor.run_program(program, _stdin(test), stdout_path)
+        return result_from_run(test, run, checker, stdout_path)
+
+
+def _api_error_result(test, exc):
+    error_output = f"{JUDGE_ERROR_PREFIX}{exc}"
+    result = {
+        "input": _shown(test, "input"),
+        "expected_output": _shown(test, "expected_output"),
+        "actual_output": "",
+        "status": "Error",
+        "error_message": error_output,
+        "api_error": True
+    }
+    if isinstance(exc, JudgeUnavailable):
+        result["retry_after"] = exc.retry_after
+    return result, error_output
+
+
+def _compile_error_result(message):
+    error_output = str(message).strip()
+    return {
+        "input": "",
+        "expected_output": "",
+        "actual_output": "",
+        "status": COMPILE_ERROR,
+        "error_message": error_output
+    }, error_output
+
+
+def _stop_result(test, exc):
+    """``(result, error_output)`` for the test case that stopped judging with ``exc``."""
+    if isinstance(exc, CompileError):
+        return _compile_error_result(exc)
+    return _api_error_result(test, exc)
+
+
+def _judge_case(executor, program, checker, code_key, test, tc_hash, cached):
+    """Serve a test case from the result cache, or run it and cache a deterministic verdict."""
+    if cached is not None:
+        result, error_output = cached
+        return dict(result), error_output
+    result, error_output = run_test_case(executor, program, test, checker)
+    get_result_cache().set_result(code_key, tc_hash, result, error_output)
+    return result, error_output
+
+
+def _checked(checker, code_key, test, tc_hash, run):
+    """Check an inline test case's run and cache its verdict."""
+    result, error_output = result_from_run(test, run, checker)
+    get_result_cache().set_result(code_key, tc_hash, result, error_output)
+    return result, error_output
+
+
+async def _ajudge_case(executor, program, checker, code_key, test, tc_hash, cached):
+    """``_judge_case`` on the event loop: the executor call is awaited, disk and checker work runs on a thread."""
+    if cached is not None:
+        result, error_output = cached
+        return dict(result), error_output
+    if test.get("input_file") or test.get("expected_output_file"):
+        return await sync_to_async(_judge_case, thread_sensitive=False)(
+            executor, program, checker, code_key, test, tc_hash, None,
+        )
+    with _executor_call(executor, "run"):
+        run = await executor.arun_program(program, _stdin(test))
+    return await sync_to_async(_checked, thread_sensitive=False)(checker, code_key, test, tc_hash, run)
+
+
+def _failed(result):
+    return result["status"] != "Accepted"
+
+
+def _annotate(index, result, cached):
+    """Label a test case's ``result`` with its index into ``test_case_hashes``."""
+    if result["status"] != COMPILE_ERROR and not result.get("api_error"):
+        result["case"] = index
+        result["cached"] = cached is not None
+    return result
+
+
+def _execute_sequential(judge_case, cases, fail_fast=False):
+    results = []
+    error_output = None
+
+    for index, test, tc_hash, cached in cases:
+        try:
+            result, error_output = judge_case(test, tc_hash, cached)
+        except (ExecutorError, CompileError) as e:
+            result, error_output = _stop_result(test, e)
+            results.append(result)
+            break
+        results.append(_annotate(index, result, cached))
+        if fail_fast and _failed(result):
+            break
+
+    return results, error_output
+
+
+def _indexed(judge_case, index, test, tc_hash, cached):
+    """Judge one case on a worker: ``(index, (result, error_output))``, the result labelled with its case."""
+    result, error_output = judge_case(test, tc_hash, cached)
+    return index, (_annotate(index, result, cached), error_output)
+
+
+def _execute_parallel(judge_case, cases, fail_fast=False):
+    cases = list(cases)
+    pool = get_pool()
+    # Each case gets a copy of the caller's context, so its spans land in the request's trace
+    futures = [pool.submit(contextvars.copy_context().run, _indexed, judge_case, *case) for case in cases]
+
+    # Stop on the first executor or compile failure (or, with fail_fast, the
+    # first failing test case): queued cases are cancelled and cases that are
+    # already in flight are left to finish in the background.
+    pending = set(futures)
+    stop = False
+    while pending and not stop:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED if fail_fast else FIRST_EXCEPTION)
+        stop = any(
+            future.exception() is not None or (fail_fast and _failed(future.result()[1][0]))
+            for future in done
+        )
+    for future in pending:
+        future.cancel()
+
+    results = []
+    error_output = None
+    for (_, test, _, _), future in zip(cases, futures):
+        if not future.done() or future.cancelled():
+            continue  # abandoned after an earlier failure
+        try:
+            _, (result, error_output) = future.result()
+        except (ExecutorError, CompileError) as e:
+            result, error_output = _stop_result(test, e)
+            results.append(result)
+            break
+        results.append(result)
+        if fail_fast and _failed(result):
+            break
+
+    return results, error_output
+
+
+async def _aexecute_sequential(judge_case, cases, fail_fast=False):
+    """``_execute_sequential`` for an async ``judge_case`` and an async iterable of cases."""
+    results = []
+    error_output = None
+
+    async for index, test, tc_hash, cached in cases:
+        try:
+            result, error_output = await judge_case(test, tc_hash, cached)
+        except (ExecutorError, CompileError) as e:
+            result, error_output = _stop_result(test, e)
+            results.append(result)
+            break
+        results.append(_annotate(index, result, cached))
+        if fail_fast and _failed(result):
+            break
+
+    return results, error_output
+
+
+async def _aexecute_parallel(judge_case, cases, fail_fast=False):
+    """``_execute_parallel`` on the event loop, capped by the loop's judge slots.
+
+    After a stopping failure the remaining cases are cancelled, including the
+    ones in flight.
+    """
+    cases = [case async for case in cases]
+    slots = _aslots()
+
+    async def limited(index, test, tc_hash, cached):
+        async with slots:
+            result, error_output = await judge_case(test, tc_hash, cached)
+        return index, (_annotate(index, result, cached), error_output)
+
+    tasks = [asyncio.create_task(limited(*case)) for case in cases]
+    pending = set(tasks)
+    stop = False
+    try:
+        while pending and not stop:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED if fail_fast else asyncio.FIRST_EXCEPTION,
+            )
+            # Every finished task's exception is read, not just the first: none goes unretrieved
+            for task in done:
+                if task.exception() is not None or (fail_fast and _failed(task.result()[1][0])):
+                    stop = True
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)  # Wait out the cancellations, swallowing late failures
+
+    results = []
+    error_output = None
+    for (_, test, _, _), task in zip(cases, tasks):
+        if task.cancelled():
+            continue  # abandoned after an earlier failure
+        try:
+            _, (result, error_output) = task.result()
+        except (ExecutorError, CompileError) as e:
+            result, error_output = _stop_result(test, e)
+            results.append(result)
+            break
+        results.append(result)
+        if fail_fast and _failed(result):
+            break
+
+    return results, error_output
+
+
+def _execute_batch(executor, program, checker, code_key, cases, fail_fast=False):
+    """Run the uncached cases in ``JUDGE_BATCH_SIZE`` chunks, one executor call per chunk."""
+    cache = get_result_cache()
+    results = []
+    error_output = None
+
+    cases = iter(cases)
+    while chunk := list(itertools.islice(cases, settings.JUDGE_BATCH_SIZE)):
+        misses = [test for _, test, _, cached in chunk if cached is None]
+        with tempfile.TemporaryDirectory(prefix="stdout-", dir=settings.JUDGE_SANDBOX_ROOT) as output_dir:
+            stdout_paths = [
+                os.path.join(output_dir, str(index)) if test.get("expected_output_file") else None
+                for index, test in enumerate(misses)
+            ]
+            try:
+                with _executor_call(executor, "batch"):
+                    runs = executor.run_batch(program, [_stdin(test) for test in misses], stdout_paths) if misses else []
+            except ExecutorError as e:
+                result, error_output = _api_error_result(misses[0], e)
+                results.append(result)
+                return results, error_output
+            runs = iter(zip(runs, stdout_paths))
+
+            for index, test, tc_hash, cached in chunk:
+                if cached is not None:
+                    result, error_output = dict(cached[0]), cached[1]
+                else:
+                    try:
+                        run, stdout_path = next(runs)
+                        result, error_output = result_from_run(test, run, checker, stdout_path)
+                    except CompileError as e:
+                        result, error_output = _compile_error_result(e)
+                        results.append(result)
+                        return results, error_output
+                    cache.set_result(code_key, tc_hash, result, error_output)
+                results.append(_annotate(index, result, cached))
+                if fail_fast and _failed(result):
+                    return results, error_output
+
+    return results, error_output
+
+
+def _run_cases(executor, program, checker, code_key, cases, parallel, fail_fast=False):
+    """Judge an iterable of ``(index, test, tc_hash, cached)``; ``test`` is ``None`` for cache hits.
+
+    Each result is labelled with its ``index`` (``case``) as it is judged,
+    so it stays right when cases are skipped or finish out of order.
+    """
+    if settings.JUDGE_EXECUTION_MODE == "batch" and executor.supports_batch:
+        return _execute_batch(executor, program, checker, code_key, cases, fail_fast)
+    judge_case = functools.partial(_judge_case, executor, program, checker, code_key)
+    if parallel:
+        return _execute_parallel(judge_case, cases, fail_fast)
+    return _execute_sequential(judge_case, cases, fail_fast)
+
+
+def sample_indexes(sample_flags):
+    """Indexes of the sample test cases: the ones flagged as samples, else the first one."""
+    return [i for i, sample in enumerate(sample_flags) if sample] or [0]
+
+
+def _after_samples(samples, results, count):
+    """Under ``samples_first``, the indexes still to run once the ``samples`` gave ``results``."""
+    if len(results) != len(samples) or any(_failed(r) for r in results):
+        return []
+    sample_set = set(samples)
+    return [i for i in range(count) if i not in sample_set]
+
+
+def _selected(policy, sample_flags, results):
+    """The ``results`` of every test case, cut down to what judging under ``policy`` would have run."""
+    if policy == JudgePolicy.FAIL_FAST:
+        failure = next((i for i, result in enumerate(results) if _failed(result)), len(results) - 1)
+        return results[:failure + 1]
+    if policy == JudgePolicy.SAMPLES_FIRST:
+        samples = sample_indexes(sample_flags)
+        ran = [results[i] for i in samples]
+        return ran + [results[i] for i in _after_samples(samples, ran, len(results))]
+    return results
+
+
+def _lookup(code, language, test_case_hashes, checker, policy, sample_flags):
+    """Look ``code`` up in the result cache: ``(compile_key, code_key, cached, done)``.
+
+    ``cached`` holds each test case's cached ``(result, stderr)`` or ``None``;
+    ``done`` is the final ``(results, error_output)`` when nothing needs to run,
+    holding the same results as a run under ``policy`` would.
+    """
+    cache = get_result_cache()
+    compile_key = code_hash(code, language)
+    # Verdicts depend on the checker too (exact matching keeps the plain key)
+    code_key = compile_key if checker.name == ExactChecker.name else code_hash(code, language, checker.cache_key())
+    compile_error = cache.get_compile_error(compile_key)
+    if compile_error is not None:
+        result, error_output = _compile_error_result(compile_error)
+        return compile_key, code_key, None, ([result], error_output)
+
+    cached = [cache.get_result(code_key, tc_hash) for tc_hash in test_case_hashes]
+    if all(hit is not None for hit in cached):
+        results = [dict(result, case=i, cached=True) for i, (result, _) in enumerate(cached)]
+        results = _selected(policy, sample_flags, results)
+        return compile_key, code_key, cached, (results, cached[results[-1]["case"]][1])
+    return compile_key, code_key, cached, None
+
+
+def _compile_failed(compile_key, program):
+    """Cache and report ``program``'s compile error."""
+    get_result_cache().set_compile_error(compile_key, program.compile_error)
+    result, error_output = _compile_error_result(program.compile_error)
+    return [result], error_output
+
+
+def _remember_compile_error(compile_key, results):
+    if results and results[-1]["status"] == COMPILE_ERROR:
+        get_result_cache().set_compile_error(compile_key, results[-1]["error_message"])
+
+
+def _judge(code, language, test_case_hashes, sample_flags, load_tests, parallel=None, policy=JudgePolicy.ALL,
+           checker=None):
+    """Judge ``code`` against test cases known by their content hashes.
+
+    ``load_tests(indexes)`` yields the test case dicts at ``indexes`` in
+    order. It is only asked for cache misses, and lazily, so a large suite is
+    never held in memory at once unless it runs in parallel.
+    """
+    if not test_case_hashes:
+        return [], None
+
+    checker = checker or ExactChecker()
+    with tracing.span("judge.lookup"):
+        compile_key, code_key, cached, done = _lookup(code, language, test_case_hashes, checker, policy, sample_flags)
+    if done:
+        return done
+
+    executor = get_executor()
+    try:
+        with _executor_call(executor, "prepare"):
+            program = executor.prepare(code, language)
+    except ExecutorError as e:
+        first_miss = next(i for i, hit in enumerate(cached) if hit is None)
+        result, error_output = _api_error_result(next(iter(load_tests([first_miss]))), e)
+        return [result], error_output
+    if program.compile_error is not None:
+        return _compile_failed(compile_key, program)
+
+    if parallel is None:
+        parallel = settings.JUDGE_PARALLEL
+
+    def run(indexes, fail_fast=False):
+        misses = [i for i in indexes if cached[i] is None]
+        tests = iter(load_tests(misses))
+        cases = ((i, next(tests) if cached[i] is None else None, test_case_hashes[i], cached[i]) for i in indexes)
+        return _run_cases(executor, program, checker, code_key, cases, parallel and len(misses) > 1, fail_fast)
+
+    if policy == JudgePolicy.SAMPLES_FIRST:
+        samples = sample_indexes(sample_flags)
+        results, error_output = run(samples)
+        rest = _after_samples(samples, results, len(test_case_hashes))
+        if rest:
+            more, error_output = run(rest)
+            results += more
+    else:
+        results, error_output = run(range(len(test_case_hashes)), fail_fast=policy == JudgePolicy.FAIL_FAST)
+
+    _remember_compile_error(compile_key, results)
+    return results, error_output
+
+
+async def _ajudge(code, language, test_case_hashes, sample_flags, load_tests, parallel=None, policy=JudgePolicy.ALL,
+                  checker=None):
+    """``_judge`` for async callers; ``load_tests(indexes)`` is an async iterable.
+
+    Executor calls are awaited on the running loop; result cache, test data
+    and checker work runs on worker threads. The batch execution mode does not
+    apply: every case is its own call.
+    """
+    if not test_case_hashes:
+        return [], None
+
+    checker = checker or ExactChecker()
+    in_thread = functools.partial(sync_to_async, thread_sensitive=False)
+    with tracing.span("judge.lookup"):
+        compile_key, code_key, cached, done = await in_thread(_lookup)(
+            code, language, test_case_hashes, checker, policy, sample_flags,
+        )
+    if done:
+        return done
+
+    executor = get_executor()
+    try:
+        with _executor_call(executor, "prepare"):
+            program = await executor.aprepare(code, language)
+    except ExecutorError as e:
+        first_miss = next(i for i, hit in enumerate(cached) if hit is None)
+        result, error_output = _api_error_result(await anext(aiter(load_tests([first_miss]))), e)
+        return [result], error_output
+    if program.compile_error is not None:
+        return await in_thread(_compile_failed)(compile_key, program)
+
+    if parallel is None:
+        parallel = settings.JUDGE_PARALLEL
+
+    async def run(indexes, fail_fast=False):
+        misses = [i for i in indexes if cached[i] is None]
+        tests = aiter(load_tests(misses))
+
+        async def cases():
+            for i in indexes:
+                yield i, (await anext(tests) if cached[i] is None else None), test_case_hashes[i], cached[i]
+
+        judge_case = functools.partial(_ajudge_case, executor, program, checker, code_key)
+        execute = _aexecute_parallel if parallel and len(misses) > 1 else _aexecute_sequential
+        return await execute(judge_case, cases(), fail_fast)
+
+    if policy == JudgePolicy.SAMPLES_FIRST:
+        samples = sample_indexes(sample_flags)
+        results, error_output = await run(samples)
+        rest = _after_samples(samples, results, len(test_case_hashes))
+        if rest:
+            more, error_output = await run(rest)
+            results += more
+    else:
+        results, error_output = await run(range(len(test_case_hashes)), fail_fast=policy == JudgePolicy.FAIL_FAST)
+
+    if results and results[-1]["status"] == COMPILE_ERROR:
+        await in_thread(_remember_compile_error)(compile_key, results)
+    return results, error_output
+
+
+# Helper function to execute code on the configured executor
+def execute_code(code, language, test_cases, parallel=None, test_case_hashes=None, policy=JudgePolicy.ALL,
+                 checker=None):
+    """Judge ``code`` against the test cases and return ``(results, error_output)``.
+
+    ``policy`` decides how many test cases run: all of them, up to the first
+    failure (``fail_fast``), or the sample cases first and the rest only if
+    every sample passed (``samples_first``; sample results come first).
+    Test cases that were not run have no entry in ``results``.
+
+    Deterministic verdicts come from the result cache when this exact code was
+    judged against the same test case before; the executor only sees the
+    misses. The code is prepared (compiled) once; a compile failure is
+    reported as a single ``Compile Error`` result. With ``parallel`` (defaults
+    to ``settings.JUDGE_PARALLEL``) test cases are fanned out over the shared
+    judge pool; results keep the test case order. With
+    ``settings.JUDGE_EXECUTION_MODE = "batch"`` executors that support it get
+    all test inputs in one ``run_batch`` call instead.
+
+    ``checker`` (see ``checkers.py``) decides whether an output is correct;
+    the default is exact matching.
+    """
+    test_cases = list(test_cases or [])
+    if test_case_hashes is None:
+        test_case_hashes = [test_case_hash(test) for test in test_cases]
+    return _judge(
+        code, language, test_case_hashes,
+        [test.get("sample") for test in test_cases],
+        lambda indexes: (test_cases[i] for i in indexes),
+        parallel=parallel,
+        policy=policy,
+        checker=checker,
+    )
+
+
+def stream_test_cases(pks, indexes):
+    """Yield the test cases ``pks[i]`` for ``indexes``, fetching ``JUDGE_BATCH_SIZE`` rows per query."""
+    size = settings.JUDGE_BATCH_SIZE
+    indexes = list(indexes)
+    for start in range(0, len(indexes), size):
+        chunk = [pks[i] for i in indexes[start:start + size]]
+        rows = TestCase.objects.only(
+            "input", "expected_output", "input_file", "expected_output_file", "is_sample", "weight"
+        ).in_bulk(chunk)
+        for pk in chunk:
+            yield rows[pk].as_dict()
+
+
+async def astream_test_cases(pks, indexes):
+    """``stream_test_cases`` through the async ORM."""
+    size = settings.JUDGE_BATCH_SIZE
+    indexes = list(indexes)
+    for start in range(0, len(indexes), size):
+        chunk = [pks[i] for i in indexes[start:start + size]]
+        rows = await TestCase.objects.only(
+            "input", "expected_output", "input_file", "expected_output_file", "is_sample", "weight"
+        ).ain_bulk(chunk)
+        for pk in chunk:
+            yield rows[pk].as_dict()
+
+
+def _observe(language, seconds, results):
+    """Count a judged submission's time and test cases in the metrics."""
+    metrics.JUDGE_SECONDS.observe(seconds, language=language)
+    cases = [result for result in results if "case" in result]  # Not compile or executor errors
+    cached = sum(1 for result in cases if result["cached"])
+    if cached:
+        metrics.JUDGE_TEST_CASES.inc(cached, language=language, source="cache")
+    if len(cases) > cached:
+        metrics.JUDGE_TEST_CASES.inc(len(cases) - cached, language=language, source="executor")
+
+
+def _mark_cases(results, pks, sample_flags):
+    """Tie each test case result to its ``TestCase`` row and say whether it is a sample."""
+    samples = set(sample_indexes(sample_flags)) if sample_flags else set()
+    for result in results:
+        if "case" in result:
+            result["test_case_id"] = pks[result["case"]]
+            result["sample"] = result["case"] in samples
+
+
+def judge_question(code, language, question, parallel=None):
+    """Judge ``code`` against ``question`` following its judging policy and checker.
+
+    Only the test case hashes and sample flags are read up front; inputs and
+    expected outputs are streamed from the ``TestCase`` table for the cases
+    that are not already in the result cache. Results are marked ``sample``
+    for the cases whose data the submitter may see (see ``visible_results``).
+    """
+    start = time.perf_counter()
+    rows = list(question.cases.order_by("position").values_list("pk", "content_hash", "is_sample"))
+    pks = [pk for pk, _, _ in rows]
+    results, error_output = _judge(
+        code, language,
+        [tc_hash for _, tc_hash, _ in rows],
+        [sample for _, _, sample in rows],
+        functools.partial(stream_test_cases, pks),
+        parallel=parallel,
+        policy=question.judge_policy,
+        checker=get_checker(question),
+    )
+    _mark_cases(results, pks, [sample for _, _, sample in rows])
+    _observe(language, time.perf_counter() - start, results)
+    return results, error_output
+
+
+async def ajudge_question(code, language, question, parallel=None):
+    """``judge_question`` for async callers (see ``_ajudge``)."""
+    start = time.perf_counter()
+    rows = [row async for row in question.cases.order_by("position").values_list("pk", "content_hash", "is_sample")]
+    pks = [pk for pk, _, _ in rows]
+    results, error_output = await _ajudge(
+        code, language,
+        [tc_hash for _, tc_hash, _ in rows],
+        [sample for _, _, sample in rows],
+        functools.partial(astream_test_cases, pks),
+        parallel=parallel,
+        policy=question.judge_policy,
+        checker=get_checker(question),
+    )
+    _mark_cases(results, pks, [sample for _, _, sample in rows])
+    _observe(language, time.perf_counter() - start, results)
+    return results, error_output
+
+
+def skipped_count(question, results):
+    """Number of ``question``'s test cases that were not run."""
+    return max(question.cases.count() - len(results or []), 0)
+
+
+async def askipped_count(question, results):
+    """``skipped_count`` through the async ORM."""
+    return max(await question.cases.acount() - len(results or []), 0)
+
+
+def has_api_error(results):
+    """True when judging stopped because the executor itself failed."""
+    return any(result.get("api_error") for result in results or [])
+
+
+def unavailable_for(results):
+    """Seconds until the judge may be back when judging stopped on an open circuit breaker, else ``None``."""
+    waits = [result["retry_after"] for result in results or [] if result.get("retry_after") is not None]
+    return max(waits) if waits else None
+
+
+def verdict_for(results):
+    """Return the submission status for a list of per-test-case results.
+
+    A time or memory limit on the first failing test case is the verdict;
+    any other failure is ``Rejected``.
+    """
+    if not results:
+        return "Pending"
+    if any(r["status"] == COMPILE_ERROR for r in results):
+        return COMPILE_ERROR
+    failed = next((r for r in results if _failed(r)), None)
+    if failed is None:
+        return "Accepted"
+    return failed["status"] if failed["status"] in LIMIT_STATUSES.values() else "Rejected"
+
+
+def is_hidden(result):
+    """True for the result of a test case whose data the submitter must not see (not a sample)."""
+    return "case" in result and not result.get("sample")
+
+
+def visible_results(results):
+    """``results`` as shown to the submitter: hidden test cases keep their verdict and resource use, not their data.
+
+    Input, expected and actual output go, and so does the error message,
+    which could echo the input through stderr or quote the expected output.
+    """
+    return [
+        dict(result, input="", expected_output="", actual_output="", error_message="", hidden=True)
+        if is_hidden(result) else result
+        for result in results or []
+    ]
+
+
+def visible_error(results, error_output):
+    """``error_output`` unless it came from a hidden test case (it is the last result's stderr)."""
+    return "" if results and is_hidden(results[-1]) else error_output
+
+
+def record_verdict(submission, results, error_output):
+    """Store the verdict, first output and error of a judged submission, and one row per test case run.
+
+    The stored output and error are what the submitter may see: none from a
+    hidden test case.
+
+    A submission's first verdict also updates the leaderboard, question
+    statistics and contest results, in the same transaction.
+    """
+    first_verdict = submission.status == Submission.Status.PENDING
+    submission.status = verdict_for(results)
+    shown = next((result for result in results or [] if not is_hidden(result)), None)
+    submission.output = shown["actual_output"] if shown and shown["actual_output"] else ""
+    submission.error = visible_error(results, error_output) or ""
+    with transaction.atomic():
+        submission.save(update_fields=["status", "output", "error"])
+        TestCaseResult.objects.bulk_create(
+            TestCaseResult.from_result(submission, position, result)
+            for position, result in enumerate(results or [])
+            if "case" in result
+        )
+        if first_verdict and submission.status != Submission.Status.PENDING and not has_api_error(results):
+            stats.record_submission(submission)
+            contests.record_submission(submission)
+
+
+def judge_submission(submission, parallel=None):
+    """Run ``submission`` against its question's test cases and store the verdict."""
+    results, error_output = judge_question(submission.code, submission.language, submission.question, parallel=parallel)
+    with tracing.span("judge.record"):
+        record_verdict(submission, results, error_output)
+    return results, error_output
+
+
+async def ajudge_submission(submission, parallel=None):
+    """``judge_submission`` for async callers: the executor calls are awaited, the verdict is stored on a thread."""
+    results, error_output = await ajudge_question(
+        submission.code, submission.language, submission.question, parallel=parallel,
+    )
+    with tracing.span("judge.record"):
+        await sync_to_async(record_verdict)(submission, results, error_output)
+    return results, error_output
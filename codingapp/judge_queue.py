@@ -0,0 +1,156 @@
+"""Database-table queue for background judging.
+
+Views enqueue a ``JudgeJob`` next to a ``Pending`` submission; workers started
+with ``manage.py run_judge_workers`` claim jobs, run the judge and write the
+verdict back. No broker is needed: the queue is the ``JudgeJob`` table.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .judge import JUDGE_ERROR_PREFIX, has_api_error, judge_question, record_verdict, skipped_count, unavailable_for
+from .models import JudgeJob, Submission, TestCase
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_submission(submission):
+    """Queue ``submission`` for background judging."""
+    return JudgeJob.objects.create(submission=submission)
+
+
+def create_queued_submission(**fields):
+    """Create a ``Pending`` submission and its queue entry in one transaction."""
+    with transaction.atomic():
+        submission = Submission.objects.create(status=Submission.Status.PENDING, **fields)
+        enqueue_submission(submission)
+    return submission
+
+
+def claimable_jobs(now=None):
+    """Jobs that are due, plus running jobs whose worker missed the visibility timeout.
+
+    A running job's ``available_at`` is the end of its visibility timeout.
+    """
+    now = now or timezone.now()
+    return JudgeJob.objects.filter(
+        state__in=[JudgeJob.State.QUEUED, JudgeJob.State.RUNNING], available_at__lte=now,
+    )
+
+
+def visibility_timeout(job):
+    """Seconds a worker may hold ``job``: ``JUDGE_VISIBILITY_TIMEOUT`` plus the time limit of every test case."""
+    cases = TestCase.objects.filter(
+        question_id=Submission.objects.filter(pk=job.submission_id).values("question_id")[:1]
+    ).count()
+    return settings.JUDGE_VISIBILITY_TIMEOUT + settings.JUDGE_TIMEOUT * cases
+
+
+def _give_up(job, now):
+    """Fail a job whose workers crashed or hung on every attempt, instead of reclaiming it forever."""
+    error = f"{JUDGE_ERROR_PREFIX}no verdict after {job.attempts} attempts"
+    logger.error("Giving up on submission %s: %s", job.submission_id, error)
+    with transaction.atomic():
+        if JudgeJob.objects.filter(pk=job.pk, state=job.state, attempts=job.attempts).update(
+            state=JudgeJob.State.FAILED, last_error=error, finished_at=now,
+        ):
+            Submission.objects.filter(pk=job.submission_id).update(error=error)
+
+
+def queue_depth():
+    return JudgeJob.objects.filter(state__in=[JudgeJob.State.QUEUED, JudgeJob.State.RUNNING]).count()
+
+
+def claim_job(worker):
+    """Claim the oldest due job for ``worker`` or return ``None``.
+
+    ``select_for_update(skip_locked=True)`` lets concurrent workers skip rows
+    another worker is claiming. The conditional ``update`` keeps the claim
+    exclusive on backends without row locks (SQLite). A timed-out job that
+    already used ``JUDGE_MAX_ATTEMPTS`` is failed rather than claimed.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            job = (
+                claimable_jobs(now)
+                .select_for_update(skip_locked=True)
+                .order_by("available_at", "id")
+                .first()
+            )
+            if job is None:
+                return None
+            if job.state == JudgeJob.State.RUNNING and job.attempts >= settings.JUDGE_MAX_ATTEMPTS:
+                _give_up(job, now)
+                continue
+            claimed = JudgeJob.objects.filter(pk=job.pk, state=job.state, attempts=job.attempts).update(
+                state=JudgeJob.State.RUNNING,
+                claimed_at=now,
+                available_at=now + timedelta(seconds=visibility_timeout(job)),
+                worker=worker,
+                attempts=F("attempts") + 1,
+            )
+        if not claimed:
+            return None
+        return JudgeJob.objects.select_related("submission__question").get(pk=job.pk)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter for the ``attempts``-th failed try."""
+    delay = min(settings.JUDGE_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JUDGE_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def process_job(job):
+    """Judge a claimed job and write the verdict back.
+
+    Returns ``True`` once the job is finished and ``False`` if it was put back
+    on the queue for a retry (or lost to another worker).
+    """
+    submission = job.submission
+    results, error_output = judge_question(submission.code, submission.language, submission.question)
+    now = timezone.now()
+    owned = JudgeJob.objects.filter(pk=job.pk, worker=job.worker, claimed_at=job.claimed_at)
+
+    unavailable = unavailable_for(results)
+    if unavailable is not None:
+        # The judge is known to be down: wait for its circuit breaker to let
+        # a probe through, without using up one of the job's attempts.
+        delay = unavailable * random.uniform(1.0, 1.5)
+        logger.info("Judge unavailable for submission %s, requeued for %.1fs", submission.pk, delay)
+        owned.update(
+            state=JudgeJob.State.QUEUED,
+            available_at=now + timedelta(seconds=delay),
+            attempts=F("attempts") - 1,
+            last_error=error_output or "",
+        )
+        return False
+
+    if has_api_error(results) and job.attempts < settings.JUDGE_MAX_ATTEMPTS:
+        delay = retry_delay(job.attempts)
+        logger.warning("Judge error on submission %s, retrying in %.1fs: %s", submission.pk, delay, error_output)
+        owned.update(
+            state=JudgeJob.State.QUEUED,
+            available_at=now + timedelta(seconds=delay),
+            last_error=error_output or "",
+        )
+        return False
+
+    with transaction.atomic():
+        # Another worker reclaimed the job after our visibility timeout ran out;
+        # its result wins.
+        if not owned.update(
+            state=JudgeJob.State.FAILED if has_api_error(results) else JudgeJob.State.DONE,
+            results=results,
+            skipped=skipped_count(submission.question, results),
+            last_error=error_output or "",
+            finished_at=now,
+        ):
+            return False
+        record_verdict(submission, results, error_output)
+    return True
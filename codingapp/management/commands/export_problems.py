@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from codingapp import problems
+from codingapp.models import Question
+
+
+class Command(BaseCommand):
+    help = "Export questions and their test cases as a problem bank zip that import_problems reads back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Zip file to write.")
+        parser.add_argument("--module", action="append", dest="modules", metavar="SLUG",
+                            help="Only this module; may be repeated.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        questions = Question.objects.all()
+        if options["modules"]:
+            questions = questions.filter(module__slug__in=options["modules"])
+        with open(options["output"], "wb") as output:
+            count, cases = problems.export_bank(questions, output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {count} questions with {cases} test cases in {time.perf_counter() - start:.1f}s."
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from codingapp import problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Import modules, questions and test cases from a problem bank directory or zip "
+        "(layout in codingapp/problems.py). Unchanged problems are skipped, so re-running is safe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("bank", help="Directory or zip file.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Problems written per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only validate the bank.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            if options["dry_run"]:
+                count, cases = problems.validate_bank(options["bank"])
+                self.stdout.write(self.style.SUCCESS(f"Valid bank: {count} problems with {cases} test cases."))
+                return
+            result = problems.import_bank(options["bank"], batch_size=options["batch_size"])
+        except (OSError, ValueError) as e:  # ProblemBankError and BadZipFile included
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} new and {result.updated} changed problems "
+            f"({result.test_cases} test cases), {result.unchanged} unchanged, "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
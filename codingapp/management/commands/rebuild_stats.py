@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from codingapp import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the leaderboard and question statistics from the full submission history."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        users, questions, solves = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt statistics for {users} users, {questions} questions and {solves} solves "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
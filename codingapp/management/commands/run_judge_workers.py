@@ -0,0 +1,93 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from codingapp.judge_queue import claim_job, process_job, queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_loop(index, stop, judged, poll_interval, drain):
+    """Claim and judge jobs until ``stop`` is set (or the queue is empty with ``drain``)."""
+    connections.close_all()  # never share the parent's DB connections across a fork
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent coordinates shutdown
+    worker = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    while not stop.is_set():
+        try:
+            job = claim_job(worker)
+        except OperationalError as e:  # e.g. "database is locked" on SQLite
+            logger.warning("Worker %s could not claim a job: %s", worker, e)
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if drain:
+                return
+            stop.wait(poll_interval)
+            continue
+        try:
+            if process_job(job):
+                with judged.get_lock():
+                    judged.value += 1
+        except Exception:
+            # Leave the job running; it becomes claimable again after the
+            # visibility timeout.
+            logger.exception("Worker %s failed on job %s", worker, job.pk)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of background judge workers that drain the JudgeJob queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.JUDGE_WORKERS, help="Number of worker processes.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--stats-interval", type=float, default=30.0, help="Seconds between throughput reports.")
+        parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        stop = multiprocessing.Event()
+        judged = multiprocessing.Value("i", 0)
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_worker_loop,
+                args=(index, stop, judged, options["poll_interval"], options["drain"]),
+                daemon=True,
+            )
+            for index in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} judge workers.")
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        started = last_report = time.monotonic()
+        last_count = 0
+        while any(process.is_alive() for process in processes):
+            for process in processes:
+                process.join(timeout=0.2)
+            now = time.monotonic()
+            if now - last_report >= options["stats_interval"]:
+                count = judged.value
+                self.stdout.write(
+                    f"judged {count} submissions, {(count - last_count) / (now - last_report):.2f}/s "
+                    f"over the last {now - last_report:.0f}s, queue depth {queue_depth()}"
+                )
+                last_report, last_count = now, count
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"Judged {judged.value} submissions in {elapsed:.1f}s "
+            f"({judged.value / elapsed if elapsed else 0:.2f} submissions/s)."
+        )
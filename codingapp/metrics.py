@@ -0,0 +1,260 @@
+"""Prometheus metrics for the judge pipeline, summed over every process.
+
+Each process counts into local totals, and a background thread adds them to
+the cache named by ``settings.METRICS_CACHE_ALIAS`` every
+``METRICS_FLUSH_INTERVAL`` seconds, so ``exposition`` (served at
+``/metrics``) shows web and judge worker processes together when that cache
+is Redis. Recording an observation takes a lock and a dict update; it never
+touches the cache.
+
+The values of each label are fixed when the metric is declared (anything
+else is counted as ``other``), so every series has a cache key known in
+advance and a scrape reads them all with one ``get_many``. Gauges are
+computed at scrape time instead.
+"""
+import bisect
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import SUPPORTED_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+OTHER = "other"  # Label value for anything not declared
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REGISTRY = []
+_pending = defaultdict(int)  # Cache key -> increment not flushed yet
+_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    """A metric with labels ``{name: allowed values}``; the values may be given by a callable."""
+    kind = None
+
+    def __init__(self, name, help, labels=None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels or ())
+        self._label_values = labels or {}
+        REGISTRY.append(self)
+
+    @functools.cached_property
+    def _allowed(self):
+        return [
+            {*(values() if callable(values) else values), OTHER}
+            for values in self._label_values.values()
+        ]
+
+    def _series(self, labels):
+        return tuple(
+            value if value in allowed else OTHER
+            for value, allowed in zip((labels[name] for name in self.label_names), self._allowed)
+        )
+
+    def all_series(self):
+        return itertools.product(*(sorted(allowed) for allowed in self._allowed))
+
+    def _key(self, series, part=""):
+        return f"metrics:{self.name}:{':'.join(series)}:{part}"
+
+    def keys(self):
+        return []
+
+    def render(self, values):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if settings.METRICS_ENABLED:
+            _add({self._key(self._series(labels)): amount})
+
+    def keys(self):
+        return [self._key(series) for series in self.all_series()]
+
+    def render(self, values):
+        lines = super().render(values)
+        for series in self.all_series():
+            value = values.get(self._key(series))
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.label_names, series)} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    """Observations in seconds; the sum is kept in whole microseconds so the cache can ``incr`` it."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, seconds, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        series = self._series(labels)
+        _add({
+            self._key(series, bisect.bisect_left(self.buckets, seconds)): 1,
+            self._key(series, "sum"): int(seconds * 1_000_000),
+            self._key(series, "count"): 1,
+        })
+
+    def keys(self):
+        parts = [*range(len(self.buckets) + 1), "sum", "count"]
+        return [self._key(series, part) for series in self.all_series() for part in parts]
+
+    def render(self, values):
+        lines = super().render(values)
+        for series in self.all_series():
+            count = values.get(self._key(series, "count"))
+            if count is None:
+                continue
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += values.get(self._key(series, index), 0)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, series, le=str(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, series, le='+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, series)} {values.get(self._key(series, 'sum'), 0) / 1_000_000}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, series)} {count}")
+        return lines
+
+
+class Gauge(Metric):
+    """A value read at scrape time by ``collect()``."""
+    kind = "gauge"
+
+    def __init__(self, name, help, collect):
+        super().__init__(name, help)
+        self.collect = collect
+
+    def render(self, values):
+        return [*super().render(values), f"{self.name} {self.collect()}"]
+
+
+def _add(increments):
+    with _lock:
+        for key, amount in increments.items():
+            _pending[key] += amount
+    if _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+def _start_flusher():
+    """Start this process's flush thread (again in a forked judge worker)."""
+    global _flusher_pid
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_forever, name="metrics-flush", daemon=True).start()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Could not flush metrics")
+
+
+def flush():
+    """Add this process's counts since the last flush to the shared totals."""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, defaultdict(int)
+    cache = caches[settings.METRICS_CACHE_ALIAS]
+    for key, amount in pending.items():
+        try:
+            cache.incr(key, amount)
+        except ValueError:  # first count of the series
+            if not cache.add(key, amount, None):
+                cache.incr(key, amount)
+
+
+def exposition():
+    """All metrics in the Prometheus text format, this process's latest counts included."""
+    flush()
+    values = caches[settings.METRICS_CACHE_ALIAS].get_many(
+        [key for metric in REGISTRY for key in metric.keys()]
+    )
+    return "\n".join(line for metric in REGISTRY for line in metric.render(values)) + "\n"
+
+
+def _view_names():
+    from django.urls import URLPattern, get_resolver
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLPattern):
+                if pattern.name:
+                    yield pattern.name
+            else:
+                yield from walk(pattern.url_patterns)
+
+    return walk(get_resolver().url_patterns)
+
+
+def _executor_names():
+    from .executors import EXECUTORS
+
+    return EXECUTORS
+
+
+def _queue_depth():
+    from .judge_queue import queue_depth  # judge_queue imports the judge, which records metrics
+
+    return queue_depth()
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to answer a request, by view.", {"view": _view_names},
+)
+JUDGE_SECONDS = Histogram(
+    "judge_submission_duration_seconds", "Time to judge a submission, by language.",
+    {"language": SUPPORTED_LANGUAGES}, buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+JUDGE_TEST_CASES = Counter(
+    "judge_test_cases_total", "Test cases judged, by language and by whether the executor or the result cache answered.",
+    {"language": SUPPORTED_LANGUAGES, "source": ("executor", "cache")},
+)
+EXECUTOR_SECONDS = Histogram(
+    "judge_executor_call_duration_seconds", "Time of one executor call, by executor and call.",
+    {"executor": _executor_names, "call": ("prepare", "run", "batch")},
+)
+EXECUTOR_ERRORS = Counter(
+    "judge_executor_errors_total", "Failed executor calls, by executor and kind (unavailable: circuit breaker open).",
+    {"executor": _executor_names, "kind": ("error", "unavailable")},
+)
+SANDBOX_LEASES = Counter(
+    "judge_sandbox_leases_total", "Warm sandbox leases, by language and result (miss: none free, started cold).",
+    {"language": SUPPORTED_LANGUAGES, "result": ("hit", "miss")},
+)
+SANDBOX_LEASE_SECONDS = Histogram(
+    "judge_sandbox_lease_wait_seconds", "Time waited for a warm sandbox, by language.",
+    {"language": SUPPORTED_LANGUAGES}, buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+QUEUE_DEPTH = Gauge("judge_queue_depth", "Submissions queued or being judged in the background.", _queue_depth)
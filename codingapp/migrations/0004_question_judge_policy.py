@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0003_submission_compile_error_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='judgejob',
+            name='skipped',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='judge_policy',
+            field=models.CharField(choices=[('all', 'Run all test cases'), ('fail_fast', 'Stop at the first failing test case'), ('samples_first', 'Run sample test cases first, then the full suite')], default='all', help_text='Sample test cases are the ones marked as samples (the first test case if none are).', max_length=20),
+        ),
+    ]
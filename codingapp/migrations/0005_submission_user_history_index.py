@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 02:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0004_question_judge_policy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', 'submitted_at', 'id'], name='submission_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 02:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0005_submission_user_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', 'question', 'submitted_at'], name='submission_user_question_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'submitted_at'], name='submission_status_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0006_submission_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestCase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('is_sample', models.BooleanField(default=False)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('input', models.TextField(blank=True)),
+                ('expected_output', models.TextField(blank=True)),
+                ('input_size', models.PositiveIntegerField(default=0)),
+                ('output_size', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(help_text='Key of cached verdicts for this test case.', max_length=64)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cases', to='codingapp.question')),
+            ],
+            options={
+                'ordering': ['question', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('question', 'position'), name='testcase_question_position_unique')],
+            },
+        ),
+    ]
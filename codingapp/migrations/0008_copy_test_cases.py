@@ -0,0 +1,56 @@
+import hashlib
+
+from django.db import migrations
+
+
+def _sha256(*parts):
+    # Same as codingapp.result_cache.test_case_hash, frozen for this migration
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def copy_json_to_rows(apps, schema_editor):
+    Question = apps.get_model("codingapp", "Question")
+    TestCase = apps.get_model("codingapp", "TestCase")
+    for question in Question.objects.only("id", "test_cases").iterator(chunk_size=100):
+        rows = []
+        for position, test in enumerate(question.test_cases or []):
+            test_input = str(test.get("input", ""))
+            expected_output = str(test.get("expected_output", ""))
+            rows.append(TestCase(
+                question_id=question.id,
+                position=position,
+                is_sample=bool(test.get("sample", False)),
+                weight=test.get("weight", 1),
+                input=test_input,
+                expected_output=expected_output,
+                input_size=len(test_input.encode("utf-8")),
+                output_size=len(expected_output.encode("utf-8")),
+                content_hash=_sha256(test_input, expected_output),
+            ))
+        TestCase.objects.bulk_create(rows)
+
+
+def copy_rows_to_json(apps, schema_editor):
+    Question = apps.get_model("codingapp", "Question")
+    TestCase = apps.get_model("codingapp", "TestCase")
+    for question in list(Question.objects.all()):
+        question.test_cases = [
+            {"input": case.input, "expected_output": case.expected_output, "sample": case.is_sample, "weight": case.weight}
+            for case in TestCase.objects.filter(question_id=question.id).order_by("position")
+        ]
+        question.save(update_fields=["test_cases"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0007_testcase'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_json_to_rows, copy_rows_to_json),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0008_copy_test_cases'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='question',
+            name='test_cases',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0009_remove_question_test_cases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='expected_output_file',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='input_file',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='testcase',
+            name='input_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='testcase',
+            name='output_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
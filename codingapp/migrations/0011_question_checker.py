@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0010_testcase_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='checker',
+            field=models.CharField(choices=[('exact', 'Exact match (surrounding whitespace ignored)'), ('tokens', 'Same tokens, any whitespace'), ('float', 'Tokens, numbers within a tolerance'), ('unordered_lines', 'Same lines in any order'), ('custom', 'Custom checker program')], default='exact', help_text='How program output is compared with the expected output.', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='checker_code',
+            field=models.TextField(blank=True, help_text='Custom checker: reads the input, expected output and program output from stdin, each as a line with its length in bytes followed by the data. Exit 0 to accept, 1 to reject; anything written to stderr marks a checker failure.'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='checker_language',
+            field=models.CharField(choices=[('python', 'Python'), ('c', 'C'), ('cpp', 'Cpp'), ('java', 'Java'), ('javascript', 'Javascript')], default='python', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='float_abs_tolerance',
+            field=models.FloatField(default=1e-06, help_text='Float checker: absolute tolerance.'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='float_rel_tolerance',
+            field=models.FloatField(default=1e-06, help_text='Float checker: relative tolerance.'),
+        ),
+    ]
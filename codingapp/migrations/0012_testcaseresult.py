@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 02:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0011_question_checker'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected'), ('Compile Error', 'Compile Error'), ('Time Limit Exceeded', 'Time Limit Exceeded'), ('Memory Limit Exceeded', 'Memory Limit Exceeded')], default='Pending', max_length=30),
+        ),
+        migrations.CreateModel(
+            name='TestCaseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('status', models.CharField(max_length=30)),
+                ('wall_time', models.FloatField(blank=True, null=True)),
+                ('cpu_time', models.FloatField(blank=True, null=True)),
+                ('memory_kb', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('exit_code', models.IntegerField(blank=True, null=True)),
+                ('signal', models.CharField(blank=True, max_length=20)),
+                ('output_bytes', models.PositiveBigIntegerField(default=0)),
+                ('cached', models.BooleanField(default=False, help_text='Served from the result cache; costs no judge time.')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='case_results', to='codingapp.submission')),
+                ('test_case', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='codingapp.testcase')),
+            ],
+            options={
+                'ordering': ['submission', 'position'],
+            },
+        ),
+    ]
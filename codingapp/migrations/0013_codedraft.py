@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 03:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0012_testcaseresult'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.TextField(blank=True)),
+                ('language', models.CharField(choices=[('python', 'Python'), ('c', 'C'), ('cpp', 'Cpp'), ('java', 'Java'), ('javascript', 'Javascript')], default='python', max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='code_drafts', to='codingapp.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='code_drafts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'question'), name='codedraft_user_question_uniq')],
+            },
+        ),
+    ]
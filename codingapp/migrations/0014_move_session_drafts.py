@@ -0,0 +1,57 @@
+import re
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations
+
+DRAFT_KEY = re.compile(r"(code|language)_(\d+)$")
+
+
+def move_session_drafts(apps, schema_editor):
+    """Copy the ``code_<pk>``/``language_<pk>`` session keys into CodeDraft rows and drop them from the sessions."""
+    Session = apps.get_model("sessions", "Session")
+    Question = apps.get_model("codingapp", "Question")
+    CodeDraft = apps.get_model("codingapp", "CodeDraft")
+    User = apps.get_model("auth", "User")
+    question_ids = set(Question.objects.values_list("id", flat=True))
+    user_ids = set(User.objects.values_list("id", flat=True))
+    store = SessionStore()
+
+    drafts = {}
+    # Oldest sessions first, so a user's most recently active session wins
+    for session in Session.objects.order_by("expire_date").iterator(chunk_size=500):
+        data = store.decode(session.session_data)
+        found = {key: DRAFT_KEY.match(key) for key in data}
+        found = {key: match for key, match in found.items() if match}
+        if not found:
+            continue
+        try:
+            user_id = int(data.get("_auth_user_id"))
+        except (TypeError, ValueError):
+            user_id = None
+        if user_id in user_ids:
+            for key, match in found.items():
+                kind, question_id = match.group(1), int(match.group(2))
+                if kind == "code" and data[key] and question_id in question_ids:
+                    drafts[user_id, question_id] = CodeDraft(
+                        user_id=user_id,
+                        question_id=question_id,
+                        code=data[key],
+                        language=data.get(f"language_{question_id}") or "python",
+                    )
+        for key in found:
+            del data[key]
+        session.session_data = store.encode(data)
+        session.save(update_fields=["session_data"])
+    CodeDraft.objects.bulk_create(drafts.values(), batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0013_codedraft'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_session_drafts, migrations.RunPython.noop),
+    ]
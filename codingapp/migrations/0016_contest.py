@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 03:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('codingapp', '0015_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('freeze_at', models.DateTimeField(blank=True, null=True)),
+                ('unfrozen', models.BooleanField(default=False, help_text='Reveal the final standings to everyone.')),
+                ('penalty_minutes', models.PositiveIntegerField(default=20, help_text='Penalty per failed attempt on a solved question.')),
+                ('compile_error_penalty', models.BooleanField(default=False, help_text='Count compile errors as failed attempts.')),
+                ('revision', models.PositiveBigIntegerField(default=0, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('questions', models.ManyToManyField(related_name='contests', to='codingapp.question')),
+            ],
+            options={
+                'ordering': ['-start_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wrong_attempts', models.PositiveIntegerField(default=0)),
+                ('wrong_before_freeze', models.PositiveIntegerField(default=0)),
+                ('frozen_attempts', models.PositiveIntegerField(default=0)),
+                ('solved_at', models.DateTimeField(blank=True, null=True)),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='codingapp.contest')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contest_results', to='codingapp.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contest_results', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='contest',
+            constraint=models.CheckConstraint(condition=models.Q(('end_at__gt', models.F('start_at'))), name='contest_ends_after_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='contestresult',
+            constraint=models.UniqueConstraint(fields=('contest', 'user', 'question'), name='contestresult_uniq'),
+        ),
+    ]
@@ -1,15 +1,34 @@
-from django.db import models
+import itertools
+import os
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.text import slugify  # Imported here for slug generation
 
+from .result_cache import test_case_hash
+from .testdata import blob_path
+
 def validate_test_cases(value):
-    """Validate that test_cases is a list of dictionaries with 'input' and 'expected_output'."""
+    """Validate that test_cases is a list of dictionaries with 'input' and 'expected_output'.
+
+    A test case may also set ``"sample": true`` to mark it as a public sample,
+    and ``input_file``/``expected_output_file`` to the digest of data kept in
+    the test data store (see ``testdata.py``).
+    """
     if not isinstance(value, list):
         raise ValidationError("Test cases must be a list.")
     for test in value:
         if not isinstance(test, dict) or "input" not in test or "expected_output" not in test:
             raise ValidationError("Each test case must be a dict with 'input' and 'expected_output' keys.")
+        for key in ("input_file", "expected_output_file"):
+            if test.get(key) and not os.path.exists(blob_path(test[key])):
+                raise ValidationError(f"Unknown test data file {test[key]!r}.")
+
+# Define choices statically
+SUPPORTED_LANGUAGES = ["python", "c", "cpp", "java", "javascript"]
+LANGUAGE_CHOICES = [(lang, lang.capitalize()) for lang in SUPPORTED_LANGUAGES]
 
 class Module(models.Model):
     """Model representing a module with questions."""
@@ -31,6 +50,18 @@ class Module(models.Model):
 
 class Question(models.Model):
     """Model representing a coding question with test cases."""
+    class JudgePolicy(models.TextChoices):
+        ALL = "all", "Run all test cases"
+        FAIL_FAST = "fail_fast", "Stop at the first failing test case"
+        SAMPLES_FIRST = "samples_first", "Run sample test cases first, then the full suite"
+
+    class Checker(models.TextChoices):
+        EXACT = "exact", "Exact match (surrounding whitespace ignored)"
+        TOKENS = "tokens", "Same tokens, any whitespace"
+        FLOAT = "float", "Tokens, numbers within a tolerance"
+        UNORDERED_LINES = "unordered_lines", "Same lines in any order"
+        CUSTOM = "custom", "Custom checker program"
+
     title = models.CharField(max_length=200)
     description = models.TextField()
     module = models.ForeignKey(
@@ -40,12 +71,79 @@ class Question(models.Model):
         null=True, 
         blank=True
     )
-    test_cases = models.JSONField(
-        default=list, 
-        validators=[validate_test_cases],
-        help_text="Managed via admin formset; do not edit manually."
+    judge_policy = models.CharField(
+        max_length=20,
+        choices=JudgePolicy.choices,
+        default=JudgePolicy.ALL,
+        help_text="Sample test cases are the ones marked as samples (the first test case if none are)."
     )
+    checker = models.CharField(
+        max_length=20,
+        choices=Checker.choices,
+        default=Checker.EXACT,
+        help_text="How program output is compared with the expected output."
+    )
+    float_abs_tolerance = models.FloatField(default=1e-6, help_text="Float checker: absolute tolerance.")
+    float_rel_tolerance = models.FloatField(default=1e-6, help_text="Float checker: relative tolerance.")
+    checker_code = models.TextField(
+        blank=True,
+        help_text="Custom checker: reads the input, expected output and program output from stdin, "
+                  "each as a line with its length in bytes followed by the data. "
+                  "Exit 0 to accept, 1 to reject; anything written to stderr marks a checker failure."
+    )
+    checker_language = models.CharField(max_length=50, choices=LANGUAGE_CHOICES, default="python")
+
+    _pending_test_cases = None
 
+    @property
+    def test_cases(self):
+        """The test cases as a list of dicts (``input``, ``expected_output``, ``sample``, ``weight``).
+
+        Kept for code written against the old JSON field; the judge streams
+        ``TestCase`` rows instead of building this list.
+        """
+        if self._pending_test_cases is not None:
+            return self._pending_test_cases
+        if not self.pk:
+            return []
+        return [case.as_dict() for case in self.cases.all()]
+
+    @test_cases.setter
+    def test_cases(self, value):
+        """Replace the test cases; the rows are written when the question is saved."""
+        validate_test_cases(value)
+        self._pending_test_cases = list(value)
+
+    def replace_test_cases(self, tests, batch_size=100):
+        """Replace the test cases with the dicts from the iterable ``tests``; returns how many.
+
+        Rows are written ``batch_size`` at a time, so a generator (such as a
+        zip import) is never held in memory as a whole.
+        """
+        count = 0
+        tests = iter(tests)
+        with transaction.atomic():
+            self.cases.all().delete()
+            while batch := list(itertools.islice(tests, batch_size)):
+                validate_test_cases(batch)
+                TestCase.objects.bulk_create(
+                    TestCase.from_dict(self, count + offset, test) for offset, test in enumerate(batch)
+                )
+                count += len(batch)
+        return count
+
+    def save(self, *args, **kwargs):
+        """Save the question and any test cases assigned through ``test_cases``."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self._pending_test_cases is not None:
+                self.replace_test_cases(self._pending_test_cases)
+                self._pending_test_cases = None
+
+    def clean(self):
+        super().clean()
+        if self.checker == self.Checker.CUSTOM and not self.checker_code.strip():
+            raise ValidationError({"checker_code": "A custom checker needs checker code."})
 
     def __str__(self):
         return self.title
@@ -53,9 +151,72 @@ class Question(models.Model):
     class Meta:
         unique_together = ['module', 'title']
 
-# Define choices statically
-SUPPORTED_LANGUAGES = ["python", "c", "cpp", "java", "javascript"]
-LANGUAGE_CHOICES = [(lang, lang.capitalize()) for lang in SUPPORTED_LANGUAGES]
+def _data_size(text, digest):
+    return os.path.getsize(blob_path(digest)) if digest else len(text.encode("utf-8"))
+
+class TestCase(models.Model):
+    """One test case of a question; hidden unless marked as a sample."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="cases")
+    position = models.PositiveIntegerField()
+    is_sample = models.BooleanField(default=False)
+    weight = models.PositiveIntegerField(default=1)
+    input = models.TextField(blank=True)
+    expected_output = models.TextField(blank=True)
+    # Digests of data kept in JUDGE_TESTDATA_DIR instead of the text fields above
+    input_file = models.CharField(max_length=64, blank=True)
+    expected_output_file = models.CharField(max_length=64, blank=True)
+    input_size = models.PositiveBigIntegerField(default=0)  # Bytes (UTF-8)
+    output_size = models.PositiveBigIntegerField(default=0)
+    content_hash = models.CharField(max_length=64, help_text="Key of cached verdicts for this test case.")
+
+    @classmethod
+    def from_dict(cls, question, position, test):
+        """Build an unsaved test case from a ``{"input", "expected_output", ...}`` dict."""
+        case = cls(
+            question=question,
+            position=position,
+            is_sample=bool(test.get("sample", False)),
+            weight=test.get("weight", 1),
+            input=test.get("input", ""),
+            expected_output=test.get("expected_output", ""),
+            input_file=test.get("input_file", ""),
+            expected_output_file=test.get("expected_output_file", ""),
+        )
+        case.fill_derived_fields()
+        return case
+
+    def fill_derived_fields(self):
+        self.input_size = _data_size(self.input, self.input_file)
+        self.output_size = _data_size(self.expected_output, self.expected_output_file)
+        self.content_hash = test_case_hash(self.as_dict())
+
+    def as_dict(self):
+        """The test case as the judge sees it; file-backed data is referenced by digest."""
+        test = {
+            "input": self.input,
+            "expected_output": self.expected_output,
+            "sample": self.is_sample,
+            "weight": self.weight,
+        }
+        if self.input_file:
+            test["input_file"] = self.input_file
+        if self.expected_output_file:
+            test["expected_output_file"] = self.expected_output_file
+        return test
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.question} #{self.position}"
+
+    class Meta:
+        ordering = ['question', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'position'], name='testcase_question_position_unique'),
+        ]
+
 
 class Submission(models.Model):
     """Model representing a user's code submission."""
@@ -63,6 +224,9 @@ class Submission(models.Model):
         PENDING = "Pending", "Pending"
         ACCEPTED = "Accepted", "Accepted"
         REJECTED = "Rejected", "Rejected"
+        COMPILE_ERROR = "Compile Error", "Compile Error"
+        TIME_LIMIT_EXCEEDED = "Time Limit Exceeded", "Time Limit Exceeded"
+        MEMORY_LIMIT_EXCEEDED = "Memory Limit Exceeded", "Memory Limit Exceeded"
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -74,7 +238,7 @@ class Submission(models.Model):
     )
     submitted_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(
-        max_length=10, 
+        max_length=30,
         choices=Status.choices, 
         default=Status.PENDING
     )
@@ -85,4 +249,219 @@ class Submission(models.Model):
         return f"{self.user.username} - {self.question.title} ({self.submitted_at})"
 
     class Meta:
-        ordering = ['-submitted_at']  # Added for consistency with admin sorting
\ No newline at end of file
+        ordering = ['-submitted_at']  # Added for consistency with admin sorting
+        indexes = [
+            # Keyset pagination of a user's history on (submitted_at, id)
+            models.Index(fields=['user', 'submitted_at', 'id'], name='submission_user_history_idx'),
+            # Last submission of a user for a question (question_detail)
+            models.Index(fields=['user', 'question', 'submitted_at'], name='submission_user_question_idx'),
+            # Admin status filter with the default newest-first ordering
+            models.Index(fields=['status', 'submitted_at'], name='submission_status_idx'),
+        ]
+
+class CodeDraft(models.Model):
+    """The code a user is writing for a question, autosaved from the editor.
+
+    Kept out of the session so that sessions stay small however many
+    questions a user has attempted.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="code_drafts")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="code_drafts")
+    code = models.TextField(blank=True)
+    language = models.CharField(max_length=50, choices=LANGUAGE_CHOICES, default="python")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def save_draft(cls, user, question_id, code, language):
+        """Insert or overwrite the draft of ``user`` for a question in one query."""
+        cls.objects.bulk_create(
+            [cls(user=user, question_id=question_id, code=code, language=language, updated_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=["user", "question"],
+            update_fields=["code", "language", "updated_at"],
+        )
+
+    @classmethod
+    async def asave_draft(cls, user, question_id, code, language):
+        """``save_draft`` through the async ORM."""
+        await cls.objects.abulk_create(
+            [cls(user=user, question_id=question_id, code=code, language=language, updated_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=["user", "question"],
+            update_fields=["code", "language", "updated_at"],
+        )
+
+    def __str__(self):
+        return f"Draft of {self.user_id} for question {self.question_id}"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "question"], name="codedraft_user_question_uniq")]
+
+
+class TestCaseResult(models.Model):
+    """Verdict and resource use of one test case run for a submission."""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="case_results")
+    test_case = models.ForeignKey(TestCase, on_delete=models.SET_NULL, blank=True, null=True, related_name="results")
+    position = models.PositiveIntegerField()  # Order in which the case was judged
+    status = models.CharField(max_length=30)
+    wall_time = models.FloatField(blank=True, null=True)  # Seconds
+    cpu_time = models.FloatField(blank=True, null=True)  # Seconds
+    memory_kb = models.PositiveBigIntegerField(blank=True, null=True)  # Peak resident set size
+    exit_code = models.IntegerField(blank=True, null=True)
+    signal = models.CharField(max_length=20, blank=True)
+    output_bytes = models.PositiveBigIntegerField(default=0)
+    cached = models.BooleanField(default=False, help_text="Served from the result cache; costs no judge time.")
+
+    @classmethod
+    def from_result(cls, submission, position, result):
+        """Build an unsaved row from a judge result dict."""
+        return cls(
+            submission=submission,
+            test_case_id=result.get("test_case_id"),
+            position=position,
+            status=result["status"],
+            wall_time=result.get("wall_time"),
+            cpu_time=result.get("cpu_time"),
+            memory_kb=result.get("memory_kb"),
+            exit_code=result.get("exit_code"),
+            signal=result.get("signal") or "",
+            output_bytes=result.get("output_bytes") or 0,
+            cached=result.get("cached", False),
+        )
+
+    def __str__(self):
+        return f"{self.submission_id} #{self.position}: {self.status}"
+
+    class Meta:
+        ordering = ['submission', 'position']
+
+
+class SolvedQuestion(models.Model):
+    """A user's first accepted submission for a question."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="solved_questions")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="solves")
+    submission = models.ForeignKey(Submission, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    solved_at = models.DateTimeField()
+    wrong_attempts = models.PositiveIntegerField(default=0)  # Judged, failed submissions before the solve
+    penalty_seconds = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} solved {self.question_id}"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "question"], name="solvedquestion_user_question_uniq")]
+
+
+class UserStats(models.Model):
+    """Per-user totals, maintained as verdicts are recorded (see ``stats.py``)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    submissions = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    solved = models.PositiveIntegerField(default=0)
+    penalty_seconds = models.PositiveBigIntegerField(default=0)
+    last_solved_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Stats of {self.user_id}"
+
+    class Meta:
+        indexes = [
+            # Leaderboard order: most solved, then least penalty, then who got there first
+            models.Index(fields=["-solved", "penalty_seconds", "last_solved_at"], name="userstats_leaderboard_idx"),
+        ]
+
+
+class QuestionStats(models.Model):
+    """Per-question totals, maintained as verdicts are recorded (see ``stats.py``)."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    submissions = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    solvers = models.PositiveIntegerField(default=0)
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / self.submissions if self.submissions else None
+
+    def __str__(self):
+        return f"Stats of question {self.question_id}"
+
+
+class Contest(models.Model):
+    """A timed set of questions, ranked ICPC-style (see ``contests.py``)."""
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    questions = models.ManyToManyField(Question, related_name="contests")
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    # From here on the public scoreboard only shows that frozen submissions are pending
+    freeze_at = models.DateTimeField(blank=True, null=True)
+    unfrozen = models.BooleanField(default=False, help_text="Reveal the final standings to everyone.")
+    penalty_minutes = models.PositiveIntegerField(default=20, help_text="Penalty per failed attempt on a solved question.")
+    compile_error_penalty = models.BooleanField(default=False, help_text="Count compile errors as failed attempts.")
+    # Bumped with each change to the results or question set; with updated_at, the scoreboards' version
+    revision = models.PositiveBigIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def is_running(self, now=None):
+        now = now or timezone.now()
+        return self.start_at <= now < self.end_at
+
+    def is_frozen(self, now=None):
+        """Whether the public scoreboard hides results right now."""
+        now = now or timezone.now()
+        return self.freeze_at is not None and self.freeze_at <= now and not self.unfrozen
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        ordering = ['-start_at']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_at__gt=models.F("start_at")), name="contest_ends_after_start"),
+        ]
+
+
+class ContestResult(models.Model):
+    """One participant's attempts at one contest question, maintained as verdicts are recorded."""
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name="results")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="contest_results")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="contest_results")
+    wrong_attempts = models.PositiveIntegerField(default=0)  # Failed attempts before the solve
+    wrong_before_freeze = models.PositiveIntegerField(default=0)
+    frozen_attempts = models.PositiveIntegerField(default=0)  # Attempts submitted after the freeze, up to the solve
+    solved_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.user_id} on {self.question_id} in contest {self.contest_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["contest", "user", "question"], name="contestresult_uniq"),
+        ]
+
+
+class JudgeJob(models.Model):
+    """Queue entry for a submission waiting to be judged by a background worker."""
+    class State(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, related_name="judge_job")
+    state = models.CharField(max_length=10, choices=State.choices, default=State.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # Not claimable before this (retry backoff, or a running job's visibility timeout)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True)
+    results = models.JSONField(default=list, blank=True)
+    skipped = models.PositiveIntegerField(default=0)  # Test cases not run under the question's judging policy
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Job for submission {self.submission_id} ({self.state})"
+
+    class Meta:
+        indexes = [models.Index(fields=["state", "available_at"])]
@@ -0,0 +1,64 @@
+"""Keyset (cursor) pagination for newest-first querysets.
+
+Pages are addressed by an opaque cursor holding the ``(submitted_at, id)`` of
+the last row shown, so fetching page N costs the same as page 1 and rows
+inserted meanwhile never shift a page.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(submitted_at, pk):
+    raw = f"{submitted_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return ``(submitted_at, id)`` from a cursor, or ``None`` if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submitted_at, pk = raw.split("|")
+        return datetime.fromisoformat(submitted_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """One page of rows plus the cursor of the next (older) page."""
+
+    def __init__(self, rows, next_cursor, is_first):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def keyset_page(queryset, cursor, size):
+    """Return the page of ``queryset`` (newest first by ``submitted_at, id``) after ``cursor``."""
+    position = decode_cursor(cursor)
+    if position:
+        submitted_at, pk = position
+        queryset = queryset.filter(Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=pk))
+    rows = list(queryset.order_by("-submitted_at", "-id")[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1].submitted_at, rows[-1].id)
+    return KeysetPage(rows, next_cursor, is_first=position is None)
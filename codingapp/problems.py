@@ -0,0 +1,368 @@
+"""Bulk import and export of problem banks.
+
+A bank is a directory, or a zip of one, laid out as::
+
+    <module>/module.json            optional: {"title": ..., "description": ...}
+    <module>/<problem>/statement.md the question's description
+    <module>/<problem>/problem.json optional: title and judging settings (``PROBLEM_FIELDS``),
+                                    plus "weights", one per test case in judging order
+    <module>/<problem>/tests/N.in   test cases as N.in / N.out pairs, samples named sample*
+    <module>/<problem>/tests/N.out
+
+Titles default to the directory names, and the modules may sit under any
+number of wrapping directories. ``import_bank`` first validates the whole
+bank from file names and the small files, without touching test data, so a
+broken bank writes nothing. It then imports ``batch_size`` problems per
+transaction with ``bulk_create``, streaming large test data into the test
+data store like a zip upload.
+
+Questions are matched by module and title. A problem whose statement,
+settings and test cases (by ``TestCase.content_hash``) hash the same as the
+question in the database is skipped, so importing a bank again writes
+nothing. Questions missing from the bank are left alone. ``export_bank``
+writes the same layout, one question at a time.
+"""
+import hashlib
+import itertools
+import json
+import os
+import posixpath
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import catalog, testdata
+from .models import Module, Question, TestCase
+
+PROBLEM_FIELDS = ("judge_policy", "checker", "float_abs_tolerance", "float_rel_tolerance", "checker_code",
+                  "checker_language")
+MAX_ERRORS = 50  # Reported at most; the rest are counted
+
+
+class ProblemBankError(ValueError):
+    """The bank is malformed; ``errors`` lists every problem found, as ``"path: message"``."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        shown = errors[:MAX_ERRORS]
+        more = f"\n... and {len(errors) - len(shown)} more" if len(errors) > len(shown) else ""
+        super().__init__("\n".join(shown) + more)
+
+
+@dataclass(frozen=True)
+class ImportResult:
+    created: int
+    updated: int
+    unchanged: int
+    test_cases: int  # Written, so 0 when nothing changed
+
+
+@dataclass
+class _Problem:
+    path: str
+    module: str  # Module title
+    title: str
+    fields: dict  # description and PROBLEM_FIELDS
+    pairs: list  # testdata.test_pairs
+    weights: list | None
+
+
+class _DirectorySource:
+    def __init__(self, root):
+        self.root = root
+
+    def names(self):
+        for directory, _, files in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root)
+            for name in files:
+                yield name if relative == "." else posixpath.join(relative.replace(os.sep, "/"), name)
+
+    def size(self, name):
+        return os.path.getsize(os.path.join(self.root, name))
+
+    def open(self, name):
+        return open(os.path.join(self.root, name), "rb")
+
+
+class _ZipSource:
+    def __init__(self, archive):
+        self.archive = archive
+
+    def names(self):
+        return (info.filename for info in self.archive.infolist() if not info.is_dir())
+
+    def size(self, name):
+        return self.archive.getinfo(name).file_size
+
+    def open(self, name):
+        return self.archive.open(name)
+
+
+@contextmanager
+def _open_source(bank):
+    """A source for a directory path, or a zip given as a path or a binary file object."""
+    if isinstance(bank, (str, os.PathLike)) and os.path.isdir(bank):
+        yield _DirectorySource(bank)
+    else:
+        with zipfile.ZipFile(bank) as archive:
+            yield _ZipSource(archive)
+
+
+def _read_json(source, name):
+    with source.open(name) as f:
+        value = json.loads(f.read().decode("utf-8"))
+    if not isinstance(value, dict):
+        raise ValueError("must hold a JSON object")
+    return value
+
+
+def _read_text(source, name):
+    with source.open(name) as f:
+        return f.read().decode("utf-8")
+
+
+def _problem(source, files, path, module, tests, errors):
+    """Validate the problem in directory ``path``; returns a ``_Problem`` or ``None`` after adding to ``errors``."""
+    meta = {}
+    if f"{path}/problem.json" in files:
+        try:
+            meta = _read_json(source, f"{path}/problem.json")
+        except ValueError as e:  # JSONDecodeError and UnicodeDecodeError included
+            errors.append(f"{path}/problem.json: {e}")
+            return None
+    unknown = set(meta) - {"title", "weights", *PROBLEM_FIELDS}
+    if unknown:
+        errors.append(f"{path}/problem.json: unknown keys {', '.join(sorted(unknown))}")
+        return None
+    try:
+        description = _read_text(source, f"{path}/statement.md")
+    except UnicodeDecodeError:
+        errors.append(f"{path}/statement.md: not UTF-8")
+        return None
+    title = meta.get("title") or posixpath.basename(path)
+    fields = {"description": description}
+    try:
+        for name in PROBLEM_FIELDS:
+            field = Question._meta.get_field(name)
+            fields[name] = field.to_python(meta[name]) if name in meta else field.get_default()
+        Question(title=title, **fields).full_clean(exclude=["module"], validate_unique=False)
+    except ValidationError as e:
+        errors.extend(f"{path}: {field}: {' '.join(messages)}" for field, messages in e.message_dict.items())
+        return None
+    try:
+        pairs = testdata.test_pairs(tests)
+    except ValueError as e:
+        errors.append(f"{path}/tests: {e}")
+        return None
+    if not pairs:
+        errors.append(f"{path}/tests: no test cases")
+        return None
+    weights = meta.get("weights")
+    if weights is not None and (
+        not isinstance(weights, list) or len(weights) != len(pairs)
+        or not all(isinstance(weight, int) and weight >= 1 for weight in weights)
+    ):
+        errors.append(f"{path}/problem.json: weights must be {len(pairs)} positive integers")
+        return None
+    return _Problem(path, module, title, fields, pairs, weights)
+
+
+def _scan(source):
+    """Validate the bank and return its problems in path order; raises ``ProblemBankError``."""
+    statements, tests, other = [], {}, set()
+    for name in source.names():
+        if posixpath.basename(name) == "statement.md":
+            statements.append(posixpath.dirname(name))
+        elif "/tests/" in name:
+            tests.setdefault(name.rsplit("/tests/", 1)[0], []).append(name)
+        else:
+            other.add(name)
+    errors, problems, seen, modules = [], [], {}, {}
+    for path in sorted(statements):
+        module_path = posixpath.dirname(path)
+        if not module_path:
+            errors.append(f"{path or '.'}: a problem must be inside a module directory")
+            continue
+        if module_path not in modules:
+            meta = {}
+            if f"{module_path}/module.json" in other:
+                try:
+                    meta = _read_json(source, f"{module_path}/module.json")
+                except ValueError as e:
+                    errors.append(f"{module_path}/module.json: {e}")
+            modules[module_path] = (meta.get("title") or posixpath.basename(module_path), meta.get("description"))
+        problem = _problem(source, other, path, modules[module_path][0], tests.pop(path, []), errors)
+        if problem is None:
+            continue
+        key = (problem.module, problem.title)
+        if key in seen:
+            errors.append(f"{path}: same module and title as {seen[key]}")
+            continue
+        seen[key] = path
+        problems.append(problem)
+    errors.extend(f"{path}/tests: no statement.md next to the tests" for path in sorted(tests))
+    if errors:
+        raise ProblemBankError(errors)
+    return problems, {title: description for title, description in modules.values()}
+
+
+def _problem_hash(fields, case_hashes):
+    content = json.dumps({"fields": fields, "cases": list(case_hashes)}, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _modules(descriptions):
+    """``{title: Module}``, creating missing modules and updating descriptions that changed."""
+    modules = {module.title: module for module in Module.objects.filter(title__in=descriptions)}
+    for title, description in descriptions.items():
+        module = modules.get(title)
+        if module is None:
+            modules[title] = Module.objects.create(title=title, description=description or "")
+        elif description is not None and module.description != description:
+            module.description = description
+            module.save(update_fields=["description"])
+    return modules
+
+
+def _import_batch(source, problems, modules):
+    """Import one batch of problems in one transaction; returns ``(created, updated, test cases)``."""
+    cases = {}
+    for problem in problems:
+        tests = testdata.read_pairs(problem.pairs, source.size, source.open)
+        cases[problem.path] = [
+            TestCase.from_dict(None, position, {**test, "weight": problem.weights[position] if problem.weights else 1})
+            for position, test in enumerate(tests)
+        ]
+
+    existing = {
+        (question.module_id, question.title): question
+        for question in Question.objects.filter(
+            module__in={modules[problem.module] for problem in problems},
+            title__in={problem.title for problem in problems},
+        )
+    }
+    stored_hashes = {
+        question_id: [content_hash for _, content_hash in rows]
+        for question_id, rows in itertools.groupby(
+            TestCase.objects.filter(question__in=existing.values())
+            .order_by("question_id", "position").values_list("question_id", "content_hash"),
+            key=lambda row: row[0],
+        )
+    }
+    new, changed, to_write = [], [], []
+    for problem in problems:
+        question = existing.get((modules[problem.module].pk, problem.title))
+        if question is not None:
+            stored = _problem_hash({name: getattr(question, name) for name in problem.fields},
+                                   stored_hashes.get(question.pk, []))
+            if stored == _problem_hash(problem.fields, (case.content_hash for case in cases[problem.path])):
+                continue
+            for name, value in problem.fields.items():
+                setattr(question, name, value)
+            changed.append(question)
+        else:
+            question = Question(module=modules[problem.module], title=problem.title, **problem.fields)
+            new.append(question)
+        for case in cases[problem.path]:
+            case.question = question
+            to_write.append(case)
+
+    if not (new or changed):
+        return 0, 0, 0
+    with transaction.atomic():
+        Question.objects.bulk_create(new)
+        if changed:
+            Question.objects.bulk_update(changed, ["description", *PROBLEM_FIELDS])
+            TestCase.objects.filter(question__in=changed).delete()
+        TestCase.objects.bulk_create(to_write, batch_size=1000)
+    return len(new), len(changed), len(to_write)
+
+
+def validate_bank(bank):
+    """Check the bank without writing anything; returns ``(problems, test cases)`` or raises ``ProblemBankError``."""
+    with _open_source(bank) as source:
+        problems, _ = _scan(source)
+    return len(problems), sum(len(problem.pairs) for problem in problems)
+
+
+def import_bank(bank, batch_size=100):
+    """Import the bank at a directory path or in a zip (path or file object); returns an ``ImportResult``.
+
+    Raises ``ProblemBankError`` (a ``ValueError``) if the bank is malformed,
+    before anything is written.
+    """
+    with _open_source(bank) as source:
+        problems, descriptions = _scan(source)
+        modules = _modules(descriptions)
+        created = updated = written = 0
+        for start in range(0, len(problems), batch_size):
+            batch_created, batch_updated, batch_written = _import_batch(
+                source, problems[start:start + batch_size], modules,
+            )
+            created += batch_created
+            updated += batch_updated
+            written += batch_written
+    if created or updated:
+        catalog.bump_generation()  # bulk_create and bulk_update send no signals
+    return ImportResult(created, updated, len(problems) - created - updated, written)
+
+
+def _write_data(archive, name, text, digest):
+    if digest:
+        archive.write(testdata.blob_path(digest), name)
+    else:
+        archive.writestr(name, text)
+
+
+def export_bank(questions, fileobj):
+    """Write the ``questions`` queryset as a zipped bank to ``fileobj``; returns ``(questions, test cases)``.
+
+    Questions and their test cases are read in two streamed queries in the
+    same order, and file-backed data is copied from the store, so memory holds
+    one question at a time. Samples are written first, the order
+    ``import_bank`` gives them.
+    """
+    questions = questions.select_related("module").order_by("pk")
+    groups = itertools.groupby(
+        TestCase.objects.filter(question__in=questions).order_by("question_id", "position").iterator(chunk_size=1000),
+        key=lambda case: case.question_id,
+    )
+    group = next(groups, None)
+    question_count = case_count = 0
+    modules, paths = set(), set()
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as archive:
+        for question in questions.iterator(chunk_size=1000):
+            cases = []
+            if group is not None and group[0] == question.pk:
+                cases = list(group[1])
+                group = next(groups, None)
+            module_path = question.module.slug or str(question.module.pk)
+            if module_path not in modules:
+                modules.add(module_path)
+                archive.writestr(f"{module_path}/module.json", json.dumps(
+                    {"title": question.module.title, "description": question.module.description or ""}, indent=2,
+                ))
+            path = f"{module_path}/{slugify(question.title) or question.pk}"
+            if path in paths:
+                path = f"{path}-{question.pk}"
+            paths.add(path)
+
+            samples = [case for case in cases if case.is_sample]
+            others = [case for case in cases if not case.is_sample]
+            meta = {"title": question.title, **{name: getattr(question, name) for name in PROBLEM_FIELDS}}
+            if any(case.weight != 1 for case in cases):
+                meta["weights"] = [case.weight for case in samples + others]
+            archive.writestr(f"{path}/problem.json", json.dumps(meta, indent=2))
+            archive.writestr(f"{path}/statement.md", question.description)
+            for prefix, group_cases in (("sample", samples), ("", others)):
+                for number, case in enumerate(group_cases, 1):
+                    name = f"{path}/tests/{prefix}{number}"
+                    _write_data(archive, f"{name}.in", case.input, case.input_file)
+                    _write_data(archive, f"{name}.out", case.expected_output, case.expected_output_file)
+            question_count += 1
+            case_count += len(cases)
+    return question_count, case_count
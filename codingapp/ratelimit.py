@@ -0,0 +1,123 @@
+"""Token-bucket rate limits kept in a Django cache.
+
+A bucket holds up to ``capacity`` requests and refills at ``capacity`` per
+``period``. Buckets are implemented as GCRA (the generic cell rate
+algorithm), which admits exactly what a token bucket admits but keeps state
+that fits the cache API: a base time, and a counter of requests admitted
+since then that is only ever changed with atomic ``incr``/``decr``. The base
+is only moved once the bucket has refilled completely.
+
+Limits are as shared as the cache named by ``settings.RATELIMIT_CACHE_ALIAS``:
+with Redis (``REDIS_URL``) every process draws from the same buckets, with
+the in-process default each process enforces the limits on its own.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Keys outlive any sensible bucket; a bucket whose counter expires starts full again
+KEY_TIMEOUT = 24 * 3600
+
+PERIODS = {
+    "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hour": 3600,
+    "d": 86400, "day": 86400,
+}
+
+
+def parse_rate(rate):
+    """Parse ``"10/minute"`` into ``(10, 60)``; an empty rate means no limit (``None``)."""
+    if not rate:
+        return None
+    count, _, period = rate.partition("/")
+    try:
+        return int(count), PERIODS[period.strip().lower()]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '10/minute'") from None
+
+
+class Bucket:
+    """One token bucket, named by ``key``."""
+
+    def __init__(self, key, capacity, period):
+        self.key = key
+        self.capacity = capacity
+        self.interval = period / capacity  # Seconds to refill one token
+
+    @classmethod
+    def from_rate(cls, key, rate):
+        parsed = parse_rate(rate)
+        return cls(key, *parsed) if parsed else None
+
+    def _counter_key(self, base):
+        return f"{self.key}:{base!r}"
+
+    def take(self, cache, now):
+        """Take a token; return ``0`` if there was one, else the seconds until there is.
+
+        ``n`` requests admitted since ``base`` have used the bucket up to
+        ``base + n * interval`` (the theoretical arrival time). A request is
+        admitted if that is at most ``capacity`` tokens ahead of ``now``.
+        """
+        base_key = f"{self.key}:base"
+        base = cache.get(base_key)
+        count = None
+        if base is not None:
+            try:
+                count = cache.incr(self._counter_key(base))
+            except ValueError:  # counter expired or was evicted
+                pass
+        if count is None or base + (count - 1) * self.interval < now:
+            # Full bucket: start counting again from now
+            cache.set_many({base_key: now, self._counter_key(now): 1}, KEY_TIMEOUT)
+            return 0
+        wait = base + (count - self.capacity) * self.interval - now
+        if wait > 0:
+            self._refund(cache, base)
+            return wait
+        return 0
+
+    def refund(self, cache):
+        """Give back a token taken by ``take`` (when another bucket turned the request away)."""
+        base = cache.get(f"{self.key}:base")
+        if base is not None:
+            self._refund(cache, base)
+
+    def _refund(self, cache, base):
+        try:
+            cache.decr(self._counter_key(base))
+        except ValueError:
+            pass
+
+
+def get_cache():
+    return caches[settings.RATELIMIT_CACHE_ALIAS]
+
+
+def take(buckets, now=None):
+    """Take a token from every bucket in ``buckets`` (``None`` entries are skipped).
+
+    Returns ``0`` when the request is admitted, else the seconds to wait; a
+    rejected request takes nothing from any bucket.
+    """
+    cache = get_cache()
+    now = time.time() if now is None else now
+    taken = []
+    for bucket in buckets:
+        if bucket is None:
+            continue
+        wait = bucket.take(cache, now)
+        if wait:
+            for other in taken:
+                other.refund(cache)
+            return wait
+        taken.append(bucket)
+    return 0
+
+
+def retry_seconds(wait):
+    """Whole seconds to advertise in ``Retry-After`` for a wait of ``wait`` seconds."""
+    return max(1, math.ceil(wait))
@@ -0,0 +1,123 @@
+"""Circuit breaking, adaptive timeouts and retry backoff for remote judge calls.
+
+A ``CircuitBreaker`` is closed while calls succeed. Once at least
+``threshold`` calls in a ``window`` have failed, and they make up at least
+``ratio`` of that window's calls, it opens: callers are turned away at once
+with ``CircuitOpen`` instead of waiting on a backend that is down. After
+``cooldown`` seconds it is half-open and lets a single probe call through;
+the probe closes it again on success and reopens it on failure.
+
+Breaker state lives in the cache named by ``settings.JUDGE_BREAKER_CACHE_ALIAS``,
+so every process sharing that cache (Redis with ``REDIS_URL``) trips and
+recovers together. A closed breaker costs one ``get`` and one ``incr`` per
+call.
+"""
+import random
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Far longer than any cooldown; an open breaker whose key expires simply closes
+KEY_TIMEOUT = 24 * 3600
+
+
+class CircuitOpen(Exception):
+    """The breaker is open; ``retry_after`` is the seconds until a probe may be tried."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"circuit open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """A circuit breaker shared through the cache, named by ``key``."""
+
+    def __init__(self, key, threshold, ratio, window, cooldown, probe_timeout):
+        self.key = key
+        self.threshold = threshold
+        self.ratio = ratio
+        self.window = window
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout  # A probe whose caller died is given up after this
+
+    @property
+    def cache(self):
+        return caches[settings.JUDGE_BREAKER_CACHE_ALIAS]
+
+    def _window_keys(self, now):
+        index = int(now // self.window)
+        return f"{self.key}:calls:{index}", f"{self.key}:failures:{index}"
+
+    def _incr(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:  # first call of the window
+            if self.cache.add(key, 1, self.window * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def state(self, now):
+        opened_at = self.cache.get(f"{self.key}:opened")
+        if opened_at is None:
+            return "closed"
+        return "open" if now < opened_at + self.cooldown else "half-open"
+
+    def acquire(self, now):
+        """Allow a call, or raise ``CircuitOpen``; return ``True`` if the call is the half-open probe."""
+        opened_at = self.cache.get(f"{self.key}:opened")
+        if opened_at is None:
+            return False
+        wait = opened_at + self.cooldown - now
+        if wait > 0:
+            raise CircuitOpen(wait)
+        # Half-open: the first caller to claim the probe key tries the backend
+        if self.cache.add(f"{self.key}:probe", now, self.probe_timeout):
+            return True
+        raise CircuitOpen(self.probe_timeout)
+
+    def record_success(self, now, probe=False):
+        if probe:
+            self.cache.delete_many([f"{self.key}:opened", f"{self.key}:probe", *self._window_keys(now)])
+            return
+        self._incr(self._window_keys(now)[0])
+
+    def record_failure(self, now, probe=False):
+        """Count a failed call; return ``True`` if it opened the breaker."""
+        if probe:
+            self.cache.set(f"{self.key}:opened", now, KEY_TIMEOUT)
+            self.cache.delete(f"{self.key}:probe")
+            return True
+        calls_key, failures_key = self._window_keys(now)
+        calls = self._incr(calls_key)
+        failures = self._incr(failures_key)
+        if failures >= self.threshold and failures >= self.ratio * calls:
+            # ``add`` so that processes tripping it together agree on when it opened
+            return self.cache.add(f"{self.key}:opened", now, KEY_TIMEOUT)
+        return False
+
+
+class LatencyTracker:
+    """The latencies of the last ``size`` successful calls, for percentile-based timeouts."""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q, min_samples=20):
+        """The ``q``-th percentile (0-100), or ``None`` until ``min_samples`` calls were seen."""
+        with self.lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff before retry number ``attempt`` (from 1)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -0,0 +1,155 @@
+"""Memoized judging results.
+
+A test case verdict only depends on the submitted code, its language, the
+executor, the run limits and the test case itself, so deterministic verdicts
+are cached under a content hash of all five. Lookups go through a bounded in-process LRU first
+and then the Django cache named by ``settings.JUDGE_RESULT_CACHE_ALIAS``,
+which judge workers on the same host share.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Verdicts that always come out the same for the same code and test case.
+# Runtime errors and exceeded limits are left out: a killed or starved run is
+# not reproducible.
+CACHEABLE_STATUSES = {"Accepted", "Rejected"}
+
+
+def normalize_code(code):
+    """Drop the one difference that cannot change behaviour: line endings.
+
+    Trailing whitespace stays: it can sit inside a string literal or heredoc.
+    """
+    return (code or "").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def run_limits():
+    """The limits a verdict depends on; changing one must not serve verdicts judged under another."""
+    return (
+        f"time={settings.JUDGE_TIMEOUT}:cpu={settings.JUDGE_CPU_LIMIT}:memory={settings.JUDGE_MEMORY_LIMIT_MB}"
+        f":output={settings.JUDGE_OUTPUT_LIMIT_KB}"
+    )
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def code_hash(code, language, *variant):
+    """Key of ``code`` for cached results; ``variant`` adds whatever else the verdicts depend on."""
+    return _sha256(settings.JUDGE_EXECUTOR, run_limits(), language, normalize_code(code), *variant)
+
+
+def test_case_hash(test):
+    if test.get("input_file") or test.get("expected_output_file"):
+        # File-backed data is identified by the digests of the files
+        return _sha256(
+            "files",
+            test.get("input_file") or test.get("input", ""),
+            test.get("expected_output_file") or test.get("expected_output", ""),
+        )
+    return _sha256(test.get("input", ""), test.get("expected_output", ""))
+
+
+class ResultCache:
+    """Two-level cache: a bounded in-process LRU in front of a Django cache."""
+
+    def __init__(self, alias, max_entries, timeout):
+        self.alias = alias
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _get(self, key):
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                self.hits += 1
+                self.local_hits += 1
+                return value
+        value = self.shared.get(key)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        self._remember(key, value)
+        return value
+
+    def _set(self, key, value):
+        self._remember(key, value)
+        self.shared.set(key, value, self.timeout)
+
+    def get_result(self, code_key, tc_hash):
+        """Return a cached ``(result, stderr)`` pair or ``None``."""
+        return self._get(f"judge:result:{code_key}:{tc_hash}")
+
+    def set_result(self, code_key, tc_hash, result, stderr):
+        if result["status"] in CACHEABLE_STATUSES:
+            # A copy: the judge goes on to annotate the result it returns
+            self._set(f"judge:result:{code_key}:{tc_hash}", (dict(result), stderr))
+
+    def get_compile_error(self, code_key):
+        return self._get(f"judge:compile:{code_key}")
+
+    def set_compile_error(self, code_key, message):
+        self._set(f"judge:compile:{code_key}", message)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "local_hits": self.local_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "local_entries": len(self._local),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self.hits = self.local_hits = self.misses = 0
+
+
+_result_cache = None
+_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide ``ResultCache``."""
+    global _result_cache
+    if _result_cache is None:
+        with _lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    settings.JUDGE_RESULT_CACHE_ALIAS,
+                    settings.JUDGE_RESULT_CACHE_SIZE,
+                    settings.JUDGE_RESULT_CACHE_TIMEOUT,
+                )
+    return _result_cache
@@ -0,0 +1,266 @@
+"""Warm sandboxes for the local executor, leased one run (or batch) at a time.
+
+Starting an interpreter for every test case costs more than most test cases
+take to run. A ``SandboxPool`` keeps ``JUDGE_POOL_SIZE_PER_CORE`` x CPU cores
+long-lived sandbox processes per language in each process, started ahead of
+need by a background thread. A sandbox is a zygote: a warm interpreter that
+has imported the modules solutions usually need and runs each request in a
+child forked from itself, so user code never touches the sandbox and
+nothing needs resetting between leases. The sandbox side is the ``--serve``
+mode of ``harness/python_batch.py``.
+
+A sandbox is retired after ``JUDGE_POOL_MAX_USES`` requests, when it dies or
+answers badly, or when it fails the ping sent to sandboxes idle for longer
+than ``JUDGE_POOL_HEALTH_INTERVAL`` seconds; the filler thread replaces it.
+``lease`` waits at most ``JUDGE_POOL_LEASE_TIMEOUT`` seconds for a sandbox
+and otherwise yields ``None``, and the caller starts a cold process as it
+would without a pool. Hits, misses and lease waits are counted in
+``metrics`` and ``stats()``.
+"""
+import json
+import logging
+import os
+import select
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+START_TIMEOUT = 10  # Seconds for a new sandbox to answer its first ping
+PING_TIMEOUT = 1
+
+
+class SandboxError(Exception):
+    """The sandbox died, hung or answered something unreadable; it is retired."""
+
+
+class Sandbox:
+    """One sandbox process speaking JSON lines over its stdin and stdout."""
+
+    def __init__(self, argv, cwd, env):
+        self.process = subprocess.Popen(
+            argv, cwd=cwd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.uses = 0
+        self.checked_at = time.monotonic()
+        self._buffer = b""
+
+    def request(self, message, timeout):
+        """Send ``message`` and return the answer; raises ``SandboxError`` after ``timeout`` seconds."""
+        try:
+            self.process.stdin.write(json.dumps(message).encode() + b"\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise SandboxError(f"Cannot write to the sandbox: {e}") from e
+        deadline = time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise SandboxError(f"No answer from the sandbox within {timeout:g}s")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise SandboxError(f"The sandbox exited ({self.process.poll()})")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise SandboxError(f"Unreadable answer from the sandbox: {line[:200]!r}") from e
+
+    def healthy(self, interval):
+        """True if the process is alive and, when unchecked for ``interval`` seconds, answers a ping."""
+        if self.process.poll() is not None:
+            return False
+        if time.monotonic() - self.checked_at < interval:
+            return True
+        try:
+            self.request({"ping": True}, PING_TIMEOUT)
+        except SandboxError:
+            return False
+        self.checked_at = time.monotonic()
+        return True
+
+    def close(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            stream.close()
+
+
+class SandboxPool:
+    """Up to ``size`` sandboxes started with ``argv``; ``lease()`` one at a time."""
+
+    def __init__(self, language, argv, size, max_uses, lease_timeout, health_interval, cwd=None):
+        self.language = language
+        self.argv = argv
+        self.size = size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self.health_interval = health_interval
+        self.cwd = cwd
+        self.env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8"}
+        self._reset()
+
+    def _reset(self):
+        """Start empty; also after a fork, where the parent's sandboxes, lock and filler thread are not ours."""
+        self._pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = []
+        self._count = 0  # Idle, leased and starting
+        self._closed = False
+        self.hits = self.misses = self.retired = 0
+        self._filler = threading.Thread(target=self._fill_forever, name=f"sandbox-pool-{self.language}", daemon=True)
+        self._filler.start()
+
+    def _fill_forever(self):
+        while True:
+            with self._condition:
+                while not self._closed and self._count >= self.size:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._count += 1
+            sandbox = None
+            try:
+                sandbox = Sandbox(self.argv, self.cwd, self.env)
+                sandbox.request({"ping": True}, START_TIMEOUT)
+            except (OSError, SandboxError) as e:
+                logger.warning("Cannot start a %s sandbox: %s", self.language, e)
+                if sandbox is not None:
+                    sandbox.close()
+                with self._condition:
+                    self._count -= 1
+                time.sleep(5)  # Do not spin while the runtime is missing or broken
+                continue
+            with self._condition:
+                if self._closed:
+                    sandbox.close()
+                    return
+                self._idle.append(sandbox)
+                self._condition.notify_all()
+
+    def _take(self):
+        """An idle sandbox that passes its health check, or ``None``, waiting up to the lease timeout."""
+        deadline = time.monotonic() + self.lease_timeout
+        while True:
+            with self._condition:
+                while not self._idle:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+                sandbox = self._idle.pop()  # Most recently used, so rarely due a ping
+            if sandbox.healthy(self.health_interval):  # Outside the lock: a ping takes a round trip
+                return sandbox
+            with self._condition:
+                self._retire(sandbox)
+
+    def _retire(self, sandbox):
+        """Close ``sandbox`` and let the filler replace it; call with the condition held."""
+        sandbox.close()
+        self._count -= 1
+        self.retired += 1
+        self._condition.notify_all()
+
+    @contextmanager
+    def lease(self):
+        """Yield a warm sandbox, or ``None`` when none is free within the lease timeout.
+
+        Raise ``SandboxError`` inside the block to retire the sandbox.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        started = time.perf_counter()
+        sandbox = self._take()
+        metrics.SANDBOX_LEASE_SECONDS.observe(time.perf_counter() - started, language=self.language)
+        metrics.SANDBOX_LEASES.inc(language=self.language, result="hit" if sandbox else "miss")
+        with self._condition:
+            if sandbox:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if sandbox is None:
+            yield None
+            return
+        try:
+            yield sandbox
+        except BaseException:
+            with self._condition:
+                self._retire(sandbox)  # Broken, or still busy with an abandoned request
+            raise
+        sandbox.uses += 1
+        with self._condition:
+            if self._closed or sandbox.uses >= self.max_uses:
+                self._retire(sandbox)
+            else:
+                self._idle.append(sandbox)
+                self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            leases = self.hits + self.misses
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / leases if leases else 0.0,
+                "retired": self.retired,
+            }
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            for sandbox in self._idle:
+                sandbox.close()
+            self._count -= len(self._idle)
+            self._idle = []
+            self._condition.notify_all()
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def pool_size():
+    """Sandboxes per language in each process: ``JUDGE_POOL_SIZE_PER_CORE`` x CPU cores, 0 when disabled."""
+    size = settings.JUDGE_POOL_SIZE_PER_CORE * (os.cpu_count() or 1)
+    return max(1, round(size)) if size > 0 else 0
+
+
+def get_pool(language, argv, cwd=None):
+    """This process's pool of sandboxes started with ``argv`` for ``language``, or ``None`` if it has none."""
+    if language not in settings.JUDGE_POOL_LANGUAGES or pool_size() <= 0:
+        return None
+    if language not in _pools:
+        with _lock:
+            if language not in _pools:
+                _pools[language] = SandboxPool(
+                    language, argv, pool_size(), settings.JUDGE_POOL_MAX_USES, settings.JUDGE_POOL_LEASE_TIMEOUT,
+                    settings.JUDGE_POOL_HEALTH_INTERVAL, cwd,
+                )
+    return _pools[language]
+
+
+def stats():
+    return {language: pool.stats() for language, pool in _pools.items()}
+
+
+def close_pools():
+    """Stop every pool of this process; the next ``get_pool`` starts afresh."""
+    with _lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,170 @@
+"""Leaderboard and per-question statistics, maintained incrementally.
+
+``record_submission`` folds each newly judged submission into ``UserStats``,
+``QuestionStats`` and ``SolvedQuestion`` inside the transaction that stores
+its verdict, so reading a statistic never scans ``Submission``.
+``manage.py rebuild_stats`` recomputes everything from the submission
+history with ``rebuild``.
+
+A user's first accepted submission for a question solves it. Its penalty is
+the time from their first judged submission for the question to the solve,
+plus ``PENALTY_PER_WRONG_ATTEMPT`` for each failed submission before it
+(compile errors are free). Submissions that the judge itself failed on are
+not counted at all.
+
+Verdicts arrive in any order (several workers, retries), so each one
+recounts the submitter's solve of the question from their submissions, as
+``rebuild`` does, and applies the difference to the totals.
+"""
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import QuestionStats, SolvedQuestion, Submission, UserStats
+
+Status = Submission.Status
+PENALTY_PER_WRONG_ATTEMPT = 20 * 60  # Seconds
+WRONG_STATUSES = [Status.REJECTED, Status.TIME_LIMIT_EXCEEDED, Status.MEMORY_LIMIT_EXCEEDED]
+
+
+def _upsert(model, key, initial, updates):
+    """Apply ``updates`` to the row matching ``key``, creating it with ``initial`` if there is none."""
+    if model.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **initial)
+    except IntegrityError:  # created concurrently by another verdict
+        model.objects.filter(**key).update(**updates)
+
+
+def record_submission(submission):
+    """Fold a submission's first verdict into the statistics; call inside the verdict's transaction."""
+    accepted = int(submission.status == Status.ACCEPTED)
+    counts = {"submissions": 1, "accepted": accepted}
+    increments = {"submissions": F("submissions") + 1, "accepted": F("accepted") + accepted}
+    _upsert(UserStats, {"user_id": submission.user_id}, counts, increments)
+    _upsert(QuestionStats, {"question_id": submission.question_id}, counts, increments)
+    _recount_solve(submission.user_id, submission.question_id)
+
+
+def counted():
+    """Submissions that count towards statistics: judged, and not failed by the judge itself."""
+    from .judge import JUDGE_ERROR_PREFIX  # judge imports this module
+
+    return Submission.objects.exclude(status=Status.PENDING).exclude(error__startswith=JUDGE_ERROR_PREFIX)
+
+
+def _solve(user_id, question_id, attempts):
+    """The unsaved ``SolvedQuestion`` for ``attempts`` (``(pk, status, submitted_at)`` in time order), or ``None``."""
+    first = None
+    wrong = 0
+    for pk, status, submitted_at in attempts:
+        first = first or submitted_at
+        if status == Status.ACCEPTED:
+            return SolvedQuestion(
+                user_id=user_id, question_id=question_id, submission_id=pk, solved_at=submitted_at,
+                wrong_attempts=wrong,
+                penalty_seconds=int((submitted_at - first).total_seconds()) + wrong * PENALTY_PER_WRONG_ATTEMPT,
+            )
+        if status in WRONG_STATUSES:
+            wrong += 1
+    return None
+
+
+def _recount_solve(user_id, question_id):
+    """Recount the user's solve of the question and move the totals by the change.
+
+    The ``UserStats`` row updated before this holds its lock until the
+    transaction ends, so one user's verdicts are recounted one at a time.
+    """
+    attempts = counted().filter(user_id=user_id, question_id=question_id).order_by(
+        "submitted_at", "id",
+    ).values_list("id", "status", "submitted_at")
+    new = _solve(user_id, question_id, attempts)
+    old = SolvedQuestion.objects.filter(user_id=user_id, question_id=question_id).first()
+    fields = ("submission_id", "solved_at", "wrong_attempts", "penalty_seconds")
+    if old is None and new is None:
+        return
+    if old is not None and new is not None and all(getattr(old, f) == getattr(new, f) for f in fields):
+        return
+
+    if new is None:
+        old.delete()
+    else:
+        SolvedQuestion.objects.update_or_create(
+            user_id=user_id, question_id=question_id, defaults={f: getattr(new, f) for f in fields},
+        )
+    solved = (new is not None) - (old is not None)
+    penalty = (new.penalty_seconds if new else 0) - (old.penalty_seconds if old else 0)
+    UserStats.objects.filter(user_id=user_id).update(
+        solved=F("solved") + solved,
+        penalty_seconds=F("penalty_seconds") + penalty,
+        last_solved_at=SolvedQuestion.objects.filter(user_id=user_id).aggregate(last=Max("solved_at"))["last"],
+    )
+    if solved:
+        QuestionStats.objects.filter(question_id=question_id).update(solvers=F("solvers") + solved)
+
+
+def leaderboard(limit=None):
+    """The top ``limit`` users by solved questions, then penalty; cached for ``STATS_CACHE_TIMEOUT`` seconds."""
+    limit = limit or settings.STATS_LEADERBOARD_SIZE
+    key = f"stats:leaderboard:{limit}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            UserStats.objects.filter(solved__gt=0)
+            .order_by("-solved", "penalty_seconds", "last_solved_at")
+            .values("user_id", "user__username", "solved", "penalty_seconds", "submissions", "accepted")[:limit]
+        )
+        cache.set(key, rows, settings.STATS_CACHE_TIMEOUT)
+    return rows
+
+
+def rebuild():
+    """Recompute all statistics from the submission history; returns ``(users, questions, solves)``.
+
+    Submissions are streamed in (user, question, time) order, so memory grows
+    with the number of users and questions, not submissions.
+    """
+    users = defaultdict(lambda: UserStats(submissions=0, accepted=0, solved=0, penalty_seconds=0))
+    questions = defaultdict(lambda: QuestionStats(submissions=0, accepted=0, solvers=0))
+    solves = []
+    rows = (
+        counted()
+        .order_by("user_id", "question_id", "submitted_at", "id")
+        .values_list("id", "user_id", "question_id", "status", "submitted_at")
+        .iterator(chunk_size=2000)
+    )
+    for (user_id, question_id), group in itertools.groupby(rows, key=lambda row: (row[1], row[2])):
+        user, question = users[user_id], questions[question_id]
+        attempts = [(pk, status, submitted_at) for pk, _, _, status, submitted_at in group]
+        accepted = sum(status == Status.ACCEPTED for _, status, _ in attempts)
+        user.submissions += len(attempts)
+        user.accepted += accepted
+        question.submissions += len(attempts)
+        question.accepted += accepted
+        solve = _solve(user_id, question_id, attempts)
+        if solve:
+            solves.append(solve)
+            user.solved += 1
+            user.penalty_seconds += solve.penalty_seconds
+            user.last_solved_at = max(user.last_solved_at or solve.solved_at, solve.solved_at)
+            question.solvers += 1
+
+    for user_id, user in users.items():
+        user.user_id = user_id
+    for question_id, question in questions.items():
+        question.question_id = question_id
+    with transaction.atomic():
+        SolvedQuestion.objects.all().delete()
+        UserStats.objects.all().delete()
+        QuestionStats.objects.all().delete()
+        UserStats.objects.bulk_create(users.values(), batch_size=1000)
+        QuestionStats.objects.bulk_create(questions.values(), batch_size=1000)
+        SolvedQuestion.objects.bulk_create(solves, batch_size=1000)
+    return len(users), len(questions), len(solves)
@@ -0,0 +1,168 @@
+"""Content-addressed files for large test case inputs and expected outputs.
+
+Test data bigger than ``JUDGE_TESTDATA_INLINE_LIMIT_KB`` is kept out of the
+database in ``JUDGE_TESTDATA_DIR``, named by the SHA-256 of its bytes, so the
+same data uploaded twice (or shared by several questions) is stored once.
+Everything here works on bounded chunks: uploads are hashed while they are
+copied, the judge hands the file itself to the sandbox as stdin, and outputs
+are compared through ``mmap`` without reading either side into a string.
+"""
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import zipfile
+
+from django.conf import settings
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = b" \t\n\r\x0b\x0c"
+PREVIEW_LENGTH = 1000  # Characters of file-backed data shown in results
+
+
+def blob_path(digest):
+    return os.path.join(settings.JUDGE_TESTDATA_DIR, digest[:2], digest)
+
+
+def store_blob(stream):
+    """Copy the binary ``stream`` into the store and return ``(digest, size)``."""
+    os.makedirs(settings.JUDGE_TESTDATA_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(prefix="upload-", dir=settings.JUDGE_TESTDATA_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := stream.read(CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        path = blob_path(digest.hexdigest())
+        if os.path.exists(path):
+            os.remove(temp_path)  # already stored
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(temp_path, 0o444)
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def read_preview(path, length=PREVIEW_LENGTH):
+    """First ``length`` characters of a file, marked when there is more."""
+    with open(path, "rb") as f:
+        data = f.read(length + 1)
+    text = data[:length].decode("utf-8", errors="replace")
+    return text + "…" if len(data) > length else text
+
+
+def _stripped_bounds(view, size):
+    """``(start, end)`` of ``view`` without leading and trailing whitespace."""
+    start, end = 0, size
+    while start < end and view[start] in WHITESPACE:
+        start += 1
+    while end > start and view[end - 1] in WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def _open_view(f):
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return b"", 0  # empty files cannot be mapped
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), size
+
+
+def files_match(actual_path, expected_path):
+    """True if both files hold the same bytes once surrounding whitespace is stripped.
+
+    Both files are memory-mapped and compared ``CHUNK_SIZE`` bytes at a time,
+    so memory use does not depend on the file sizes.
+    """
+    with open(actual_path, "rb") as actual_file, open(expected_path, "rb") as expected_file:
+        actual, actual_size = _open_view(actual_file)
+        expected, expected_size = _open_view(expected_file)
+        try:
+            a_start, a_end = _stripped_bounds(actual, actual_size)
+            e_start, e_end = _stripped_bounds(expected, expected_size)
+            if a_end - a_start != e_end - e_start:
+                return False
+            for offset in range(0, a_end - a_start, CHUNK_SIZE):
+                length = min(CHUNK_SIZE, a_end - a_start - offset)
+                if actual[a_start + offset:a_start + offset + length] != expected[e_start + offset:e_start + offset + length]:
+                    return False
+            return True
+        finally:
+            for view in (actual, expected):
+                if isinstance(view, mmap.mmap):
+                    view.close()
+
+
+def _load_member(name, size, open_member):
+    """Return ``(text, digest)`` for one file: small text stays inline, the rest is stored."""
+    if size <= settings.JUDGE_TESTDATA_INLINE_LIMIT_KB * 1024:
+        with open_member(name) as member:
+            data = member.read()
+        try:
+            return data.decode("utf-8"), ""
+        except UnicodeDecodeError:
+            pass  # binary data always goes to a file
+    with open_member(name) as member:
+        digest, _ = store_blob(member)
+    return "", digest
+
+
+def _is_sample(stem):
+    return stem.lower().startswith("sample")
+
+
+def _natural_key(stem):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", stem)]
+
+
+def test_pairs(names):
+    """``[(stem, input_name, output_name)]`` for the ``N.in``/``N.out`` files among ``names``, in judging order.
+
+    Pairs come in natural order of their names (``2`` before ``10``); names
+    starting with ``sample`` mark sample cases, which come first. Raises
+    ``ValueError`` if a file lacks its partner.
+    """
+    members = {}
+    for name in names:
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if ext in (".in", ".out") and stem:
+            members.setdefault(stem, {})[ext] = name
+    incomplete = sorted(stem for stem, pair in members.items() if len(pair) != 2)
+    if incomplete:
+        raise ValueError(f"Missing .in or .out file for: {', '.join(incomplete)}")
+    return [
+        (stem, members[stem][".in"], members[stem][".out"])
+        for stem in sorted(members, key=lambda stem: (not _is_sample(stem), _natural_key(stem)))
+    ]
+
+
+def read_pairs(pairs, size, open_member):
+    """Yield test case dicts for ``test_pairs`` output, reading files through ``size(name)`` and ``open_member(name)``.
+
+    Inputs or outputs larger than the inline limit are streamed into the store
+    and referenced by digest.
+    """
+    for stem, input_name, output_name in pairs:
+        test_input, input_file = _load_member(input_name, size(input_name), open_member)
+        expected_output, output_file = _load_member(output_name, size(output_name), open_member)
+        test = {"input": test_input, "expected_output": expected_output, "sample": _is_sample(stem)}
+        if input_file:
+            test["input_file"] = input_file
+        if output_file:
+            test["expected_output_file"] = output_file
+        yield test
+
+
+def read_zip(fileobj):
+    """Yield test case dicts for the ``N.in``/``N.out`` pairs of a zip archive (see ``test_pairs``)."""
+    with zipfile.ZipFile(fileobj) as archive:
+        pairs = test_pairs(archive.namelist())
+        yield from read_pairs(pairs, lambda name: archive.getinfo(name).file_size, archive.open)
@@ -0,0 +1,133 @@
+"""Per-request timing of the hot path and a slow-request log.
+
+``RequestTimingMiddleware`` gives every request a ``Trace`` and records its
+duration in ``metrics.REQUEST_SECONDS``. Code on the request's path adds
+spans to it with ``span(name)`` (or ``record`` for a duration it measured
+itself): the editor queries, judge stages, every executor call and template
+rendering. Every database query is recorded as a ``db`` span through an
+execute wrapper installed on each connection. The trace follows the request
+into ``sync_to_async`` threads and the judge pool; outside a request
+``span`` does nothing.
+
+A request slower than ``SLOW_REQUEST_SECONDS`` is logged with its spans
+summed by name, so the log says where the time went.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """The spans of one request, as ``(name, seconds)`` in the order they ended."""
+
+    def __init__(self):
+        self.spans = []
+
+    def totals(self):
+        """``{name: (count, seconds)}``, slowest first. Concurrent spans add up to more than the request took."""
+        totals = {}
+        for name, seconds in self.spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + seconds)
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+    def summary(self):
+        return ", ".join(
+            f"{name} {seconds * 1000:.1f} ms" + (f" ({count}x)" if count > 1 else "")
+            for name, (count, seconds) in self.totals().items()
+        )
+
+
+def record(name, seconds):
+    """Add a span measured by the caller to the current request's trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.spans.append((name, seconds))  # list.append is atomic, so pool threads may share the trace
+
+
+@contextmanager
+def span(name):
+    """Time the ``with`` block as a span of the current request."""
+    if _current.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper recording each query as a ``db`` span."""
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record("db", time.perf_counter() - start)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` handler putting ``time_query`` on every new connection."""
+    if time_query not in connection.execute_wrappers:
+        # First, so a temporary ``connection.execute_wrapper()`` still pops its own wrapper
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class RequestTimingMiddleware:
+    """Trace each request, time it per view and log slow ones; place it first in ``MIDDLEWARE``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED and not settings.SLOW_REQUEST_SECONDS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        trace = Trace()
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+            self.finish(request, trace, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        trace = Trace()
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _current.reset(token)
+            self.finish(request, trace, time.perf_counter() - start)
+
+    def finish(self, request, trace, seconds):
+        match = request.resolver_match
+        metrics.REQUEST_SECONDS.observe(seconds, view=match.url_name if match and match.url_name else metrics.OTHER)
+        threshold = settings.SLOW_REQUEST_SECONDS
+        if threshold and seconds >= threshold:
+            logger.warning(
+                "Slow request %s %s took %.1f ms: %s", request.method, request.path, seconds * 1000, trace.summary(),
+                extra={"duration": seconds, "spans": trace.totals()},
+            )
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
@@ -6,8 +7,19 @@ urlpatterns = [
     # Core Routes
     path('', views.home, name='home'),
     path('dashboard/', views.user_dashboard, name='dashboard'),
+    path('dashboard/submissions.json', views.submission_history_json, name='submission_history_json'),
+    path('dashboard/submissions.csv', views.submission_history_csv, name='submission_history_csv'),
     path('questions/', views.question_list, name='question_list'),
-    path('questions/<int:pk>/', views.question_detail, name='question_detail'),  # Fixed to map to question_detail
+    path('questions/<int:pk>/', views.aquestion_detail if settings.ASYNC_VIEWS else views.question_detail,
+         name='question_detail'),
+    path('questions/<int:pk>/draft/', views.save_draft, name='save_draft'),
+    path('submissions/<int:pk>/status/', views.submission_status, name='submission_status'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('contests/', views.contest_list, name='contest_list'),
+    path('contests/<int:pk>/', views.contest_detail, name='contest_detail'),
+    path('contests/<int:pk>/scoreboard/stream/', views.contest_scoreboard_stream, name='contest_scoreboard_stream'),
+    path('judge/cache-stats/', views.judge_cache_stats, name='judge_cache_stats'),
+    path('metrics', views.metrics_endpoint, name='metrics'),  # No trailing slash: Prometheus' default path
 
     # Authentication Routes
     path('register/', views.register, name='register'),
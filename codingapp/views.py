@@ -1,20 +1,45 @@
-import requests
+import csv
+import itertools
 import logging
-from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import JsonResponse
-from .models import Question, Submission, Module
+from django.db.models.functions import Substr
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_POST
+from .models import CodeDraft, Contest, Question, Submission, Module, JudgeJob, UserStats
+from . import catalog, contests, metrics, sandbox_pool, stats
+from .admission import JudgeBusy, aadmit, admit
+from .catalog import CatalogPaginator, catalog_page
 from .forms import ModuleForm, QuestionForm
+from .judge import (
+    ajudge_submission, askipped_count, judge_submission, skipped_count, visible_error, visible_results,
+)
+from .judge_queue import create_queued_submission
+from .pagination import keyset_page
+from .result_cache import get_result_cache
+from .tracing import span
 from django.contrib import messages
 
-# Piston API Configuration
-PISTON_API_URL = "https://emkc.org/api/v2/piston/execute"
-
 # Supported Languages (simplified since Piston uses these directly)
 SUPPORTED_LANGUAGES = ["python", "c", "cpp", "java", "javascript"]
 
+# Page sizes and dashboard preview lengths
+SUBMISSIONS_PER_PAGE = 25
+CSV_EXPORT_CHUNK_SIZE = 2000
+QUESTIONS_PER_PAGE = 50
+CODE_PREVIEW_LENGTH = 100
+OUTPUT_PREVIEW_LENGTH = 50
+DRAFT_MAX_LENGTH = 100_000  # Characters of autosaved code
+
 # Logger for debugging
 logger = logging.getLogger(__name__)
 
@@ -22,60 +47,21 @@ logger = logging.getLogger(__name__)
 def is_admin(user):
     return user.is_staff
 
-# Helper function to execute code via Piston API
-def execute_code(code, language, test_cases):
-    results = []
-    error_output = None
-
-    for test in test_cases or []:
-        test_input = test.get("input", "")
-        expected_output = test.get("expected_output", "")
-
-        submission_data = {
-            "language": language,
-            "version": "*",
-            "files": [{"name": "solution", "content": code}],
-            "stdin": test_input
-        }
-
-        try:
-            response = requests.post(PISTON_API_URL, json=submission_data, timeout=10)
-            response.raise_for_status()
-            result_data = response.json()
-
-            actual_output = result_data.get("run", {}).get("stdout", "").strip()
-            error_output = result_data.get("run", {}).get("stderr", "").strip()
-
-            status = "Accepted" if actual_output == expected_output else "Rejected" if not error_output else "Error"
-            results.append({
-                "input": test_input,
-                "expected_output": expected_output,
-                "actual_output": actual_output,
-                "status": status,
-                "error_message": error_output if status == "Error" else ""
-            })
-        except requests.exceptions.RequestException as e:
-            error_output = f"API error: {e}"
-            results.append({
-                "input": test_input,
-                "expected_output": expected_output,
-                "actual_output": "",
-                "status": "Error",
-                "error_message": error_output
-            })
-            break
-
-    return results, error_output
-
 # Module-related views
+# The catalog pages below render their lists inside {% cache %} blocks, so
+# their querysets are only evaluated when the cached fragment is missing.
+@catalog_page
 def module_list(request):
-    modules = Module.objects.all()
-    return render(request, 'codingapp/module_list.html', {'modules': modules})
+    modules = Module.objects.only('id', 'title')
+    return render(request, 'codingapp/module_list.html', {'modules': modules, **catalog.context(request)})
 
+@catalog_page
 def module_detail(request, module_id):
-    module = get_object_or_404(Module, id=module_id)
-    questions = module.questions.all()  # Fetch questions explicitly
-    return render(request, 'codingapp/module_detail.html', {'module': module, 'questions': questions})
+    module = catalog.cached(request, f'module:{module_id}', lambda: get_object_or_404(Module, id=module_id))
+    questions = module.questions.only('id', 'title', 'module_id')  # Test data is never needed here
+    return render(request, 'codingapp/module_detail.html', {
+        'module': module, 'questions': questions, **catalog.context(request),
+    })
 
 @staff_member_required
 def add_module(request):
@@ -129,10 +115,71 @@ def home(request):
         return redirect('dashboard')
     return redirect('login')
 
+def submission_history(user):
+    """A user's submissions with just the columns (and text previews) the history views show."""
+    return (
+        Submission.objects.filter(user=user)
+        .select_related('question')
+        .only('id', 'submitted_at', 'language', 'status', 'question__id', 'question__title')
+        .annotate(
+            code_preview=Substr('code', 1, CODE_PREVIEW_LENGTH + 1),
+            output_preview=Substr('output', 1, OUTPUT_PREVIEW_LENGTH + 1),
+            error_preview=Substr('error', 1, OUTPUT_PREVIEW_LENGTH + 1),
+        )
+    )
+
 @login_required
 def user_dashboard(request):
-    user_submissions = Submission.objects.filter(user=request.user).order_by('-submitted_at')
-    return render(request, 'codingapp/dashboard.html', {'user_submissions': user_submissions})
+    # Keyset pagination: latency stays flat however long the history is
+    page = keyset_page(submission_history(request.user), request.GET.get('cursor'), SUBMISSIONS_PER_PAGE)
+    return render(request, 'codingapp/dashboard.html', {'user_submissions': page, 'page': page})
+
+@login_required
+def submission_history_json(request):
+    """Next page of the dashboard history, for infinite scroll."""
+    page = keyset_page(submission_history(request.user), request.GET.get('cursor'), SUBMISSIONS_PER_PAGE)
+    return JsonResponse({
+        "results": [
+            {
+                "id": submission.id,
+                "submitted_at": submission.submitted_at.isoformat(),
+                "question_id": submission.question.id,
+                "question_title": submission.question.title,
+                "question_url": reverse('question_detail', args=[submission.question.id]),
+                "language": submission.language,
+                "status": submission.status,
+                "code_preview": truncatechars(submission.code_preview, CODE_PREVIEW_LENGTH),
+                "output_preview": truncatechars(submission.output_preview or "", OUTPUT_PREVIEW_LENGTH),
+                "error_preview": truncatechars(submission.error_preview or "", OUTPUT_PREVIEW_LENGTH),
+            }
+            for submission in page
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+class Echo:
+    """File-like object whose write() hands the line back, for streaming csv output."""
+    def write(self, value):
+        return value
+
+@login_required
+def submission_history_csv(request):
+    """Stream the user's full submission history as CSV without loading it into memory."""
+    rows = (
+        Submission.objects.filter(user=request.user)
+        .order_by('-submitted_at', '-id')
+        .values_list('submitted_at', 'question__title', 'language', 'status', 'code', 'output', 'error')
+        .iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
+    writer = csv.writer(Echo())
+    header = ['submitted_at', 'question', 'language', 'status', 'code', 'output', 'error']
+    lines = itertools.chain(
+        [writer.writerow(header)],
+        (writer.writerow([submitted_at.isoformat(), *rest]) for submitted_at, *rest in rows),
+    )
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="submissions-{request.user.username}.csv"'
+    return response
 
 def register(request):
     if request.method == "POST":
@@ -144,117 +191,263 @@ def register(request):
         form = UserCreationForm()
     return render(request, 'codingapp/register.html', {'form': form})
 
+@catalog_page
 def question_list(request):
-    questions = Question.objects.all()
-    return render(request, 'codingapp/question_list.html', {'questions': questions})
+    questions = (
+        Question.objects.select_related('module')
+        .only('id', 'title', 'module__id', 'module__title')
+        .order_by('id')
+    )
+    page = CatalogPaginator(request, 'questions', questions, QUESTIONS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'codingapp/question_list.html', {
+        'questions': page, 'page_obj': page, **catalog.context(request),
+    })
+
+class _Attempt:
+    """A visit to a question page: the code in the editor and, after a POST, what became of the submission.
+
+    The sync and async views fill one in the same way; only their ORM and judge calls differ.
+    """
+
+    def __init__(self, question, code, language):
+        self.question = question
+        self.code = code
+        self.language = language
+        self.error = None
+        self.error_output = None
+        self.results = None
+        self.pending_submission = None  # Set when judging is queued
+        self.skipped = 0  # Test cases not run under the question's judging policy
+        self.busy = None  # Set when the submission was turned away
+
+    def read_post(self, request):
+        """Take the code and language from the form; ``False`` when there is no code to submit."""
+        self.code = request.POST.get("code", "").strip()
+        self.language = request.POST.get("language", "python")
+        if self.language not in SUPPORTED_LANGUAGES:
+            self.language = "python"  # Fallback to default
+        if not self.code:
+            self.error = "Code cannot be empty"
+        return bool(self.code)
+
+    def submission_fields(self, request):
+        return {"question": self.question, "user": request.user, "code": self.code, "language": self.language}
+
+    def flash(self, request):
+        """Tell the user what became of the submission."""
+        if self.busy:
+            messages.error(request, str(self.busy))
+        elif self.pending_submission:
+            messages.info(request, "Code submitted! Judging in the background...")
+        elif self.error_output:
+            self.error = "Error executing code"
+            messages.error(request, self.error)
+        else:
+            messages.success(request, "Code submitted successfully!")
+
+    def context(self):
+        return {
+            "question": self.question,
+            "code": self.code,
+            "selected_language": self.language,
+            "results": visible_results(self.results),
+            "error": self.error,
+            "error_output": visible_error(self.results, self.error_output),
+            "pending_submission": self.pending_submission,
+            "skipped": self.skipped,
+        }
 
 @login_required
 def question_detail(request, pk):
-    question = get_object_or_404(Question, pk=pk)
-    code = request.session.get(f'code_{pk}', '')
-    selected_language = request.session.get(f'language_{pk}', 'python')
-
-    # Fallback to last submission if no session data
-    if not code and request.user.is_authenticated:
-        last_submission = Submission.objects.filter(user=request.user, question=question).order_by('-submitted_at').first()
-        if last_submission:
-            code = last_submission.code or ""
-            selected_language = last_submission.language or "python"
+    question = get_object_or_404(Question.objects.select_related('stats'), pk=pk)
+    with span("editor_code"):
+        attempt = _Attempt(question, *_editor_code(request, question))
 
-    error = None  # Always initialize error
-    error_output = None  # Always initialize error_output
-    results = None  # Always initialize results
-
-    if request.method == "POST":
-        code = request.POST.get("code", "").strip()
-        selected_language = request.POST.get("language", "python")
+    if request.method == "POST" and attempt.read_post(request):
+        CodeDraft.save_draft(request.user, pk, attempt.code, attempt.language)
+        try:
+            with admit(request):
+                if settings.JUDGE_ASYNC:
+                    # Judged by `run_judge_workers`; the page polls submission_status
+                    attempt.pending_submission = create_queued_submission(**attempt.submission_fields(request))
+                else:
+                    submission = Submission.objects.create(**attempt.submission_fields(request))
+                    attempt.results, attempt.error_output = judge_submission(submission)
+                    attempt.skipped = skipped_count(question, attempt.results)
+        except JudgeBusy as e:
+            attempt.busy = e
+        attempt.flash(request)
+
+    return _question_page(request, attempt)
+
+# Async version of the view above, for the ASGI app (settings.ASYNC_VIEWS): while a submission
+# is judged inside the request the executor calls are awaited, so it ties up no worker thread.
+@login_required
+async def aquestion_detail(request, pk):
+    request.user = await request.auser()  # Templates and rate limits read it synchronously
+    question = await aget_object_or_404(Question.objects.select_related('stats'), pk=pk)
+    with span("editor_code"):
+        attempt = _Attempt(question, *await _aeditor_code(request, question))
+
+    if request.method == "POST" and attempt.read_post(request):
+        await CodeDraft.asave_draft(request.user, pk, attempt.code, attempt.language)
+        try:
+            async with aadmit(request):
+                if settings.JUDGE_ASYNC:
+                    attempt.pending_submission = await sync_to_async(create_queued_submission)(
+                        **attempt.submission_fields(request)
+                    )
+                else:
+                    submission = await Submission.objects.acreate(**attempt.submission_fields(request))
+                    attempt.results, attempt.error_output = await ajudge_submission(submission)
+                    attempt.skipped = await askipped_count(question, attempt.results)
+        except JudgeBusy as e:
+            attempt.busy = e
+        attempt.flash(request)
+
+    return _question_page(request, attempt)
+
+# The question page's former submit views, the same pages under their old names
+submit_solution = question_detail
+asubmit_solution = aquestion_detail
+
+def leaderboard(request):
+    rows = stats.leaderboard()
+    own = None
+    if request.user.is_authenticated:
+        own = UserStats.objects.filter(user=request.user).first()
+    return render(request, 'codingapp/leaderboard.html', {
+        'rows': rows,
+        'own': own,
+        'on_board': own is not None and any(row['user_id'] == request.user.pk for row in rows),
+    })
 
-        if selected_language not in SUPPORTED_LANGUAGES:
-            selected_language = "python"  # Fallback to default
+def contest_list(request):
+    return render(request, 'codingapp/contest_list.html', {
+        'contests': Contest.objects.only('id', 'title', 'start_at', 'end_at'),
+        'now': timezone.now(),
+    })
 
-        if not code:
-            error = "Code cannot be empty"
-        else:
-            # Save to session
-            request.session[f'code_{pk}'] = code
-            request.session[f'language_{pk}'] = selected_language
-            request.session.modified = True
-
-            # Execute code and get results
-            results, error_output = execute_code(code, selected_language, question.test_cases)
-            if error_output:
-                error = "Error executing code"
-            
-            # Save submission
-            submission = Submission.objects.create(
-                question=question,
-                user=request.user,
-                code=code,
-                language=selected_language,
-                status=results[0]["status"] if results and results[0]["status"] else "Pending",
-                output=results[0]["actual_output"] if results and results[0]["actual_output"] else "",
-                error=error_output or ""
-            )
-            messages.success(request, "Code submitted successfully!") if not error else messages.error(request, error)
-
-    return render(request, "codingapp/question_detail.html", {
-        "question": question,
-        "code": code,
-        "selected_language": selected_language,
-        "results": results,
-        "error": error,  # Always included
-        "error_output": error_output,  # Always included
+def contest_detail(request, pk):
+    contest = get_object_or_404(Contest, pk=pk)
+    snapshot = contests.scoreboard(contest.pk, contests.board_view(request.user))
+    return render(request, 'codingapp/contest_detail.html', {
+        'contest': contest,
+        # The question set stays hidden until the contest starts
+        'show_questions': request.user.is_staff or snapshot.data['status'] != 'upcoming',
+        'scoreboard': snapshot.data,
     })
 
+async def contest_scoreboard_stream(request, pk):
+    """The contest's scoreboard as Server-Sent Events: a ``scoreboard`` event whenever it changes."""
+    view = contests.board_view(await request.auser())
+    try:
+        snapshot = await contests.ascoreboard(pk, view)  # Usually this process's copy: no query per viewer
+    except Contest.DoesNotExist:
+        raise Http404
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up by each viewer: send the current board and let the client reconnect
+        frames = [contests.retry_frame(), snapshot.frame]
+    else:
+        frames = contests.stream(pk, view, request.headers.get('Last-Event-ID'))
+    return StreamingHttpResponse(frames, content_type='text/event-stream', headers=headers)
+
+def _editor_code(request, question):
+    """The code and language to open the editor with: the user's draft, else their last submission."""
+    draft = CodeDraft.objects.filter(user=request.user, question=question).only('code', 'language').first()
+    if draft:
+        return draft.code, draft.language
+    last_submission = (
+        Submission.objects.filter(user=request.user, question=question)
+        .only('code', 'language')
+        .order_by('-submitted_at')
+        .first()
+    )
+    if last_submission:
+        return last_submission.code or "", last_submission.language or "python"
+    return "", "python"
+
+async def _aeditor_code(request, question):
+    """``_editor_code`` through the async ORM."""
+    draft = await CodeDraft.objects.filter(user=request.user, question=question).only('code', 'language').afirst()
+    if draft:
+        return draft.code, draft.language
+    last_submission = await (
+        Submission.objects.filter(user=request.user, question=question)
+        .only('code', 'language')
+        .order_by('-submitted_at')
+        .afirst()
+    )
+    if last_submission:
+        return last_submission.code or "", last_submission.language or "python"
+    return "", "python"
+
 @login_required
-def submit_solution(request, pk):
-    question = get_object_or_404(Question, pk=pk)
-    code = request.session.get(f'code_{pk}', '')
-    selected_language = request.session.get(f'language_{pk}', 'python')
+@require_POST
+def save_draft(request, pk):
+    """Autosave endpoint for the editor: stores the user's draft for question ``pk``."""
+    code = request.POST.get("code", "")
+    language = request.POST.get("language", "python")
+    if language not in SUPPORTED_LANGUAGES:
+        return JsonResponse({"error": "Unsupported language"}, status=400)
+    if len(code) > DRAFT_MAX_LENGTH:
+        return JsonResponse({"error": f"Drafts are limited to {DRAFT_MAX_LENGTH} characters"}, status=413)
+    if not Question.objects.filter(pk=pk).exists():
+        return JsonResponse({"error": "Not found"}, status=404)
+    CodeDraft.save_draft(request.user, pk, code, language)
+    return JsonResponse({"saved": True})
+
+def _question_page(request, attempt):
+    """Render the question page for ``attempt``; a turned-away submission gets its status code (see ``_busy_aware``)."""
+    with span("render"):
+        response = render(request, "codingapp/question_detail.html", attempt.context())
+    return _busy_aware(attempt.busy, response)
+
+def _busy_aware(busy, response):
+    """Give the page for a turned-away submission its 429/503 status and ``Retry-After``."""
+    if busy:
+        response.status_code = busy.status
+        response["Retry-After"] = str(busy.retry_after)
+    return response
 
-    error = None  # Always initialize error
-    error_output = None  # Always initialize error_output
-    results = None  # Always initialize results
+@login_required
+def submission_status(request, pk):
+    """Lightweight JSON endpoint polled by the question page while a submission is judged."""
+    submission = get_object_or_404(
+        Submission.objects.select_related('judge_job').only(
+            'id', 'user_id', 'status', 'output', 'error',
+            'judge_job__state', 'judge_job__results', 'judge_job__attempts', 'judge_job__skipped'
+        ),
+        pk=pk,
+        user=request.user
+    )
+    try:
+        job = submission.judge_job
+    except JudgeJob.DoesNotExist:
+        job = None
+    return JsonResponse({
+        "id": submission.id,
+        "status": submission.status,
+        "done": job is None or job.state in (JudgeJob.State.DONE, JudgeJob.State.FAILED),
+        "attempts": job.attempts if job else 0,
+        "output": submission.output or "",
+        "error": submission.error or "",
+        "results": visible_results(job.results) if job else [],
+        "skipped": job.skipped if job else 0,
+    })
 
-    if request.method == "POST":
-        code = request.POST.get("code", "").strip()
-        selected_language = request.POST.get("language", "python")
 
-        if selected_language not in SUPPORTED_LANGUAGES:
-            selected_language = "python"
+def metrics_endpoint(request):
+    """Prometheus scrape target; with ``METRICS_TOKEN`` set it needs ``Authorization: Bearer <token>``."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-        if not code:
-            error = "Code cannot be empty"
-        else:
-            # Save submission
-            submission = Submission.objects.create(
-                question=question,
-                user=request.user,
-                code=code,
-                language=selected_language
-            )
-            results, error_output = execute_code(code, selected_language, question.test_cases)
-            submission.status = "Accepted" if all(r["status"] == "Accepted" for r in results) else "Rejected" if results else "Pending"
-            submission.output = results[0]["actual_output"] if results and results[0]["actual_output"] else ""
-            submission.error = error_output or ""
-            submission.save()
-
-            # Update session
-            request.session[f'code_{pk}'] = code
-            request.session[f'language_{pk}'] = selected_language
-            request.session.modified = True
-
-            if error_output:
-                error = "Error executing code"
-                messages.error(request, error)
-            else:
-                messages.success(request, "Code submitted successfully!")
-
-    return render(request, "codingapp/question_detail.html", {
-        "question": question,
-        "code": code,
-        "selected_language": selected_language,
-        "results": results,
-        "error": error,  # Always included
-        "error_output": error_output,  # Always included
-    })
\ No newline at end of file
+@staff_member_required
+def judge_cache_stats(request):
+    """Hit and miss counters of this process's judging result cache and warm sandbox pools."""
+    return JsonResponse({**get_result_cache().stats(), "sandbox_pools": sandbox_pool.stats()})